@@ -0,0 +1,198 @@
+import importlib
+import os
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.exception_handlers import http_exception_handler
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from starlette.exceptions import HTTPException as StarletteHTTPException
+
+from artifacts import artifact_store_from_env
+from compression import CompressionMiddleware, asset_cache_from_env, compression_options_from_env
+from html_optimize import html_optimizer_from_env
+from http_pool import build_http_client
+from llm_service import llm_service_from_env
+from metrics import RequestMetricsMiddleware, log, register_stats
+from model_routing import model_router_from_env
+from schemas import response_class_options
+from shared_state import shared_state_from_env
+from similar import description_index_from_env
+from routers import artifacts, ops
+
+
+# Route groups create_app() can mount; each is imported only when asked for.
+ROUTER_MODULES = {
+    "generate": "routers.generate",
+    "rectify": "routers.rectify",
+    "jobs": "routers.jobs",
+    "deploy": "routers.deploy",
+}
+
+
+async def http_error_response(request: Request, exc: StarletteHTTPException):
+    """HTTPException as {"detail", "error"}: both shapes the frontends and older clients read."""
+    if exc.status_code < 200 or exc.status_code in (204, 304):
+        return await http_exception_handler(request, exc)
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail, "error": exc.detail},
+        headers=getattr(exc, "headers", None),
+    )
+
+
+def _file_endpoint(path: str, cache_control: str = None):
+    async def serve_file(request: Request):
+        return request.app.state.assets.file_response(request, path, cache_control)
+    return serve_file
+
+
+def _static_endpoint(directory: str):
+    root = os.path.realpath(directory)
+
+    async def serve_static(path: str, request: Request):
+        full_path = os.path.realpath(os.path.join(root, path))
+        if not full_path.startswith(root + os.sep) or not os.path.isfile(full_path):
+            raise HTTPException(status_code=404, detail="Not Found")
+        return request.app.state.assets.file_response(request, full_path)
+    return serve_static
+
+
+# ================================================================
+#   APP FACTORY
+# ================================================================
+def create_app(
+    routers: tuple = ("generate", "rectify"),
+    index_page: str = None,
+    files: dict = None,
+    cors_origins: tuple = ("*",),
+) -> FastAPI:
+    """
+    Builds one app from the shared services and the requested route groups
+    (see ROUTER_MODULES); /…/stats, /metrics and /artifacts are always mounted.
+
+    Nothing here talks to the network or validates credentials: the pooled
+    HTTP client and job workers start in the lifespan hook, the openai SDK
+    loads on the first LLM call, and GitHub settings are only needed by
+    the deploy routes. Startup timings are served at /startup/stats.
+    """
+    unknown = set(routers) - set(ROUTER_MODULES)
+    if unknown:
+        raise ValueError(f"Unknown routers: {sorted(unknown)}")
+
+    created = time.perf_counter()
+    # Cache entries, limiter buckets and leases seen by every worker (see shared_state.py)
+    shared = shared_state_from_env()
+    llm = llm_service_from_env(shared)
+    # Description -> tier -> model / max_tokens / prompt variant (see model_routing.py)
+    models = model_router_from_env(llm.model)
+    # Every generated page, stored once by content hash (see artifacts.py)
+    artifact_store = artifact_store_from_env()
+    # Past descriptions -> artifacts, for near-duplicate reuse (see similar.py)
+    similar_index = description_index_from_env()
+    # Minified, deduped pages for deploys and previews (see html_optimize.py)
+    optimizer = html_optimizer_from_env()
+
+    sessions = None
+    if "rectify" in routers:
+        from rectify_sessions import sessions_from_env
+        # Server-side rectify sessions (current code + feedback history)
+        sessions = sessions_from_env()
+
+    deployer = None
+    if "deploy" in routers:
+        from github_deploy import deployer_from_env
+        deployer = deployer_from_env()
+
+    job_queue = None
+    if "jobs" in routers:
+        from jobs import job_queue_from_env
+        from routers.jobs import run_generate_job
+        # Bounded worker pool; JOB_DB_PATH switches the store to SQLite (see jobs.py)
+        job_queue = job_queue_from_env(lambda job: run_generate_job(llm, models, artifact_store, similar_index, job))
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        started = time.perf_counter()
+        # One pooled client for the whole app lifetime (keep-alive, HTTP/2).
+        app.state.http_client = build_http_client()
+        llm.bind(app.state.http_client)
+        if deployer is not None:
+            deployer.bind(app.state.http_client)
+        if job_queue is not None:
+            await job_queue.start()
+
+        app.state.startup["lifespan_seconds"] = round(time.perf_counter() - started, 4)
+        log("Startup complete", **app.state.startup)
+        if not llm.configured:
+            log("LLM endpoint not configured; LLM routes will return 503", level="warning")
+        if deployer is not None and not deployer.configured:
+            log("GitHub deploy not configured; /deploy will return 503", level="warning")
+        try:
+            yield
+        finally:
+            if job_queue is not None:
+                await job_queue.stop()
+            await app.state.http_client.aclose()
+
+    # orjson for JSON responses when installed (schemas.py)
+    app = FastAPI(lifespan=lifespan, **response_class_options())
+    app.state.shared = shared
+    app.state.llm = llm
+    app.state.models = models
+    app.state.artifacts = artifact_store
+    app.state.similar = similar_index
+    app.state.optimizer = optimizer
+    # UI files and artifact previews, precompressed once, with ETags (compression.py)
+    app.state.assets = asset_cache_from_env()
+    app.state.sessions = sessions
+    app.state.deployer = deployer
+    app.state.job_queue = job_queue
+
+    # br/gzip for JSON and streamed NDJSON; innermost so CORS and metrics see the final response
+    app.add_middleware(CompressionMiddleware, **compression_options_from_env())
+    if cors_origins:
+        app.add_middleware(
+            CORSMiddleware,
+            allow_origins=list(cors_origins),
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+        )
+    # Per-phase latency histograms, X-Request-ID and JSON access logs (metrics.py)
+    app.add_middleware(RequestMetricsMiddleware)
+    app.add_exception_handler(StarletteHTTPException, http_error_response)
+
+    if os.path.isdir("static"):
+        app.add_api_route("/static/{path:path}", _static_endpoint("static"), methods=["GET"], include_in_schema=False)
+    if index_page:
+        # The page itself is always revalidated; an unchanged one costs a 304.
+        app.add_api_route("/", _file_endpoint(index_page, "no-cache"), methods=["GET"], include_in_schema=False)
+    for url, path in (files or {}).items():
+        app.add_api_route(url, _file_endpoint(path), methods=["GET"], include_in_schema=False)
+
+    app.include_router(ops.router)
+    app.include_router(artifacts.router)
+    for name in routers:
+        app.include_router(importlib.import_module(ROUTER_MODULES[name]).router)
+
+    llm.register_metrics()
+    register_stats("shared_state", shared.stats)
+    register_stats("model_routing", models.stats)
+    register_stats("artifacts", artifact_store.stats)
+    register_stats("similar", similar_index.stats)
+    register_stats("html_optimize", optimizer.stats)
+    register_stats("assets", app.state.assets.stats)
+    if sessions is not None:
+        register_stats("rectify_sessions", sessions.stats)
+    if job_queue is not None:
+        register_stats("jobs", job_queue.stats)
+
+    app.state.startup = {
+        "routers": list(routers),
+        "create_seconds": round(time.perf_counter() - created, 4),
+        "lifespan_seconds": None,
+    }
+    register_stats("app_startup", lambda: app.state.startup)
+    return app
@@ -0,0 +1,214 @@
+import hashlib
+import os
+import sqlite3
+import time
+import uuid
+from typing import Optional
+
+from http_pool import env_int
+from metrics import current_request
+from sqlite_db import connect, write
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+# ================================================================
+#   CONTENT-ADDRESSED ARTIFACT STORE
+# ================================================================
+class ArtifactStore:
+    """
+    Keeps every generated page once, by SHA-256 of its content, in a
+    SQLite file. Each generate/rectify result adds a small metadata row
+    (description, model, timing, tokens, parent) pointing at the blob, so
+    regenerating identical HTML costs no extra space and rectify rounds
+    form a lineage. Deployments are recorded per (blob, target) so the
+    same blob is never uploaded twice.
+
+    The store is bounded: every PRUNE_EVERY writes, artifacts older than
+    `retention_seconds` are dropped and, past `max_artifacts`, the oldest
+    down to LOW_WATER of it, with the blobs only they pointed at (0 turns
+    either limit off). Between passes a write costs no extra queries.
+    Deployment records are kept, so a dropped blob is still never
+    uploaded twice.
+    """
+
+    ARTIFACT_COLUMNS = (
+        "id", "hash", "kind", "description", "model", "parent_id",
+        "seconds", "prompt_tokens", "completion_tokens", "created_at",
+    )
+    PRUNE_EVERY = 100
+    LOW_WATER = 0.9
+
+    def __init__(self, path: str = ":memory:", max_artifacts: int = 10000, retention_seconds: int = 0):
+        self.max_artifacts = max_artifacts
+        self.retention_seconds = retention_seconds
+        self._db = connect(
+            path,
+            "CREATE TABLE IF NOT EXISTS artifact_blobs ("
+            " hash TEXT PRIMARY KEY, content TEXT NOT NULL, size INTEGER NOT NULL, created_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS artifacts ("
+            " id TEXT PRIMARY KEY, hash TEXT NOT NULL, kind TEXT NOT NULL, description TEXT, model TEXT,"
+            " parent_id TEXT, seconds REAL, prompt_tokens INTEGER, completion_tokens INTEGER, created_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS artifacts_by_hash ON artifacts (hash, created_at);"
+            "CREATE INDEX IF NOT EXISTS artifacts_by_created ON artifacts (created_at);"
+            "CREATE TABLE IF NOT EXISTS artifact_deployments ("
+            " hash TEXT NOT NULL, target TEXT NOT NULL, repo_url TEXT, pages_url TEXT, filename TEXT, path TEXT,"
+            " deployed_at REAL NOT NULL, PRIMARY KEY (hash, target));",
+        )
+        self._db.row_factory = sqlite3.Row
+        self._puts = 0
+        self.counters = {"stored": 0, "deduplicated": 0, "deploys_skipped": 0, "evicted": 0}
+
+    # ---------------- artifacts ----------------
+    async def put(
+        self,
+        content: str,
+        kind: str,
+        description: Optional[str] = None,
+        model: Optional[str] = None,
+        parent_id: Optional[str] = None,
+        seconds: Optional[float] = None,
+        tokens: Optional[dict] = None,
+    ) -> dict:
+        digest = content_hash(content)
+        now = time.time()
+        prune = self._puts % self.PRUNE_EVERY == 0  # the first write after startup, then every PRUNE_EVERY
+        self._puts += 1
+        tokens = tokens or {}
+        artifact = {
+            "id": uuid.uuid4().hex,
+            "hash": digest,
+            "kind": kind,
+            "description": description,
+            "model": model,
+            "parent_id": parent_id,
+            "seconds": round(seconds, 4) if seconds is not None else None,
+            "prompt_tokens": tokens.get("prompt"),
+            "completion_tokens": tokens.get("completion"),
+            "created_at": now,
+        }
+
+        def insert():
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO artifact_blobs (hash, content, size, created_at) VALUES (?, ?, ?, ?)",
+                (digest, content, len(content.encode("utf-8")), now),
+            )
+            self._db.execute(
+                f"INSERT INTO artifacts ({', '.join(self.ARTIFACT_COLUMNS)}) VALUES ({', '.join('?' * len(self.ARTIFACT_COLUMNS))})",
+                [artifact[col] for col in self.ARTIFACT_COLUMNS],
+            )
+            return cursor.rowcount, self._prune(now) if prune else 0
+
+        # Retried without blocking the event loop while another worker writes (sqlite_db.py)
+        stored, evicted = await write(self._db, insert)
+        self.counters["stored" if stored else "deduplicated"] += 1
+        self.counters["evicted"] += evicted
+        return artifact
+
+    def _prune(self, now: float) -> int:
+        evicted = []  # (id, hash) rows; both lookups below use artifacts_by_created
+        if self.retention_seconds > 0:
+            cutoff = now - self.retention_seconds
+            evicted += self._db.execute("SELECT id, hash FROM artifacts WHERE created_at < ?", (cutoff,)).fetchall()
+            self._db.execute("DELETE FROM artifacts WHERE created_at < ?", (cutoff,))
+        if self.max_artifacts > 0:
+            overflow = self._db.execute("SELECT COUNT(*) FROM artifacts").fetchone()[0] - self.max_artifacts
+            if overflow > 0:
+                # down to the low-water mark, so the next passes find nothing to do
+                excess = overflow + self.max_artifacts - int(self.max_artifacts * self.LOW_WATER)
+                oldest = self._db.execute("SELECT id, hash FROM artifacts ORDER BY created_at LIMIT ?", (excess,)).fetchall()
+                self._db.executemany("DELETE FROM artifacts WHERE id = ?", [(row[0],) for row in oldest])
+                evicted += oldest
+        # only the evicted rows' blobs, and only if no remaining artifact shares them
+        self._db.executemany(
+            "DELETE FROM artifact_blobs WHERE hash = ? AND NOT EXISTS (SELECT 1 FROM artifacts WHERE hash = ?)",
+            [(digest, digest) for digest in {row[1] for row in evicted}],
+        )
+        return len(evicted)
+
+    def get(self, artifact_id: str) -> Optional[dict]:
+        row = self._db.execute("SELECT * FROM artifacts WHERE id = ?", (artifact_id,)).fetchone()
+        return dict(row) if row else None
+
+    def content(self, digest: str) -> Optional[str]:
+        row = self._db.execute("SELECT content FROM artifact_blobs WHERE hash = ?", (digest,)).fetchone()
+        return row[0] if row else None
+
+    def latest_for(self, content: str) -> Optional[dict]:
+        """Newest artifact whose output is exactly `content` (used to find a rectify round's parent)."""
+        row = self._db.execute(
+            "SELECT * FROM artifacts WHERE hash = ? ORDER BY created_at DESC LIMIT 1",
+            (content_hash(content),),
+        ).fetchone()
+        return dict(row) if row else None
+
+    def lineage(self, artifact_id: str, limit: int = 100) -> list:
+        """The artifact and its ancestors, newest first."""
+        chain = []
+        while artifact_id and len(chain) < limit:
+            artifact = self.get(artifact_id)
+            if artifact is None:
+                break
+            chain.append(artifact)
+            artifact_id = artifact["parent_id"]
+        return chain
+
+    # ---------------- deployments ----------------
+    def deployment(self, digest: str, target: str) -> Optional[dict]:
+        row = self._db.execute(
+            "SELECT repo_url, pages_url, filename, path FROM artifact_deployments WHERE hash = ? AND target = ?",
+            (digest, target),
+        ).fetchone()
+        if row is None:
+            return None
+        self.counters["deploys_skipped"] += 1
+        return dict(row)
+
+    async def record_deployment(self, digest: str, target: str, info: dict):
+        await write(self._db, lambda: self._db.execute(
+            "INSERT OR REPLACE INTO artifact_deployments"
+            " (hash, target, repo_url, pages_url, filename, path, deployed_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (digest, target, info["repo_url"], info["pages_url"], info["filename"], info["path"], time.time()),
+        ))
+
+    def stats(self) -> dict:
+        artifacts = self._db.execute("SELECT COUNT(*) FROM artifacts").fetchone()[0]
+        blobs, blob_bytes = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifact_blobs").fetchone()
+        deployed = self._db.execute("SELECT COUNT(*) FROM artifact_deployments").fetchone()[0]
+        return {"artifacts": artifacts, "blobs": blobs, "blob_bytes": blob_bytes, "deployed_blobs": deployed, **self.counters}
+
+
+async def record_artifact(
+    store: ArtifactStore,
+    content: str,
+    kind: str,
+    description: Optional[str] = None,
+    parent_code: Optional[str] = None,
+) -> dict:
+    """
+    Saves `content` with the current request's model, elapsed time and
+    tokens (see metrics.py). The parent is the newest artifact whose
+    output equals `parent_code`, i.e. the page a rectify round started from.
+    """
+    parent = store.latest_for(parent_code) if parent_code else None
+    context = current_request()
+    return await store.put(
+        content,
+        kind,
+        description=description if description is not None else (parent or {}).get("description"),
+        model=context.model if context else None,
+        parent_id=parent["id"] if parent else None,
+        seconds=time.perf_counter() - context.started if context else None,
+        tokens=context.tokens if context else None,
+    )
+
+
+def artifact_store_from_env() -> ArtifactStore:
+    # ":memory:" keeps artifacts for the process lifetime only
+    return ArtifactStore(
+        os.getenv("ARTIFACT_DB_PATH", "artifacts.db"),
+        max_artifacts=env_int("ARTIFACT_MAX_ROWS", 10000),
+        retention_seconds=env_int("ARTIFACT_RETENTION_SECONDS", 30 * 86400),
+    )
@@ -0,0 +1,157 @@
+"""
+Load-test harness for the generator apps.
+
+Drives /generate, /rectify and /deploy at fixed concurrency levels and
+reports RPS, p50/p95/p99 latency and error rate per route. Run it against
+an app that points at bench/mock_llm_server.py:
+
+    python bench/mock_llm_server.py --port 9000 &
+    LLMFOUNDRY_API_ENDPOINT=http://127.0.0.1:9000/v1 LLMFOUNDRY_API_KEY=x \\
+    GITHUB_API_URL=http://127.0.0.1:9000 GITHUB_TOKEN=x GITHUB_USERNAME=me GITHUB_REPO=out \\
+        uvicorn github_main:app --port 8000 &
+    python bench/loadtest.py --base-url http://127.0.0.1:8000 --routes generate,rectify,deploy \\
+        --concurrency 1,8,32 --requests 200
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+
+import httpx
+
+
+SAMPLE_HTML = (
+    "<!DOCTYPE html>\n<html lang=\"en\">\n<head>\n<meta charset=\"UTF-8\"></meta>\n"
+    "<style>body { font-family: sans-serif; }</style>\n</head>\n<body>\n"
+    + "".join(f"<div class=\"card\"><h2>Item {i}</h2><button>Go</button></div>\n" for i in range(200))
+    + "</body>\n<script>\nconsole.log('ready');\n</script>\n</html>"
+)
+
+
+# ================================================================
+#   REQUEST BUILDERS
+# ================================================================
+def build_request(route: str, i: int, unique: bool, stream: bool) -> tuple:
+    suffix = f" #{uuid.uuid4().hex[:8]}" if unique else ""
+    if route == "generate":
+        body = {"description": f"Create a todo list app{suffix}"}
+    elif route == "rectify":
+        body = {"code": SAMPLE_HTML, "feedback": f"Make the buttons blue{suffix}"}
+    elif route == "deploy":
+        # filenames are timestamped to the second, so keep descriptions distinct
+        body = {"code": SAMPLE_HTML, "description": f"Load test app {i} {uuid.uuid4().hex[:8]}"}
+    else:
+        raise ValueError(f"Unknown route: {route}")
+
+    if stream and route in ("generate", "rectify"):
+        body["stream"] = "ndjson"
+    if unique:
+        body["cache"] = False
+    return f"/{route}", body
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+# ================================================================
+#   RUNNER
+# ================================================================
+async def one_request(client: httpx.AsyncClient, path: str, body: dict) -> dict:
+    start = time.perf_counter()
+    first_byte = None
+    try:
+        async with client.stream("POST", path, json=body) as response:
+            async for _ in response.aiter_bytes():
+                if first_byte is None:
+                    first_byte = time.perf_counter() - start
+            status = response.status_code
+        error = None if status < 400 else f"HTTP {status}"
+    except Exception as e:
+        status, error = 0, type(e).__name__
+    elapsed = time.perf_counter() - start
+    return {"latency": elapsed, "ttfb": first_byte if first_byte is not None else elapsed, "status": status, "error": error}
+
+
+async def run_level(base_url: str, route: str, concurrency: int, total: int, unique: bool, stream: bool, timeout: float) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    results = []
+    counter = iter(range(total))
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def worker():
+            for i in counter:
+                path, body = build_request(route, i, unique, stream)
+                results.append(await one_request(client, path, body))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+
+    ok = [r for r in results if r["error"] is None]
+    latencies = [r["latency"] for r in ok]
+    ttfbs = [r["ttfb"] for r in ok]
+    errors = {}
+    for r in results:
+        if r["error"]:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+
+    return {
+        "route": route,
+        "concurrency": concurrency,
+        "requests": len(results),
+        "errors": sum(errors.values()),
+        "error_rate": round(sum(errors.values()) / len(results), 4) if results else 0.0,
+        "error_kinds": errors,
+        "rps": round(len(ok) / wall, 2) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1) if latencies else 0.0,
+        "ttfb_p50_ms": round(percentile(ttfbs, 50) * 1000, 1),
+        "wall_s": round(wall, 2),
+    }
+
+
+def print_table(rows: list):
+    columns = ["route", "concurrency", "requests", "errors", "error_rate", "rps", "p50_ms", "p95_ms", "p99_ms", "ttfb_p50_ms"]
+    widths = {c: max(len(c), *(len(str(r[c])) for r in rows)) for c in columns}
+    print("  ".join(c.rjust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(str(row[c]).rjust(widths[c]) for c in columns))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Load test /generate, /rectify and /deploy")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--routes", default="generate,rectify", help="comma separated: generate,rectify,deploy")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=100, help="requests per route and level")
+    parser.add_argument("--unique", action="store_true", help="unique prompts + cache bypass (measure upstream path)")
+    parser.add_argument("--stream", action="store_true", help="use the streaming mode of /generate and /rectify")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    rows = []
+    for route in args.routes.split(","):
+        for level in (int(c) for c in args.concurrency.split(",")):
+            row = await run_level(args.base_url, route.strip(), level, args.requests, args.unique, args.stream, args.timeout)
+            rows.append(row)
+            print(f"{row['route']:>9} c={row['concurrency']:<4} rps={row['rps']:<8} p50={row['p50_ms']}ms p99={row['p99_ms']}ms errors={row['errors']}")
+
+    print()
+    print_table(rows)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,336 @@
+"""
+OpenAI-compatible stand-in for the LLM endpoint plus a fake GitHub API,
+so the apps can be load-tested without paying for real completions.
+
+    python bench/mock_llm_server.py --port 9000
+
+Point the apps at it:
+
+    API_ENDPOINT=http://127.0.0.1:9000/v1/chat/completions      # main.py
+    LLMFOUNDRY_API_ENDPOINT=http://127.0.0.1:9000/v1            # github_main.py / Mllms-main.py
+    GITHUB_API_URL=http://127.0.0.1:9000                        # deploy_to_github
+
+Behaviour is set with MOCK_* env vars and can be overridden per request
+with X-Mock-* headers (e.g. X-Mock-Latency: 2, X-Mock-Error-Rate: 0.1).
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+app = FastAPI(title="mock-llm")
+
+
+# ================================================================
+#   CONFIG
+# ================================================================
+DEFAULTS = {
+    "latency": float(os.getenv("MOCK_LATENCY", "0.5")),              # seconds before the first token
+    "tokens_per_second": float(os.getenv("MOCK_TOKENS_PER_SECOND", "200")),
+    "html_bytes": int(os.getenv("MOCK_HTML_BYTES", "20000")),        # approx size of the canned page
+    "error_rate": float(os.getenv("MOCK_ERROR_RATE", "0")),
+    "error_status": int(os.getenv("MOCK_ERROR_STATUS", "500")),
+    "fence": os.getenv("MOCK_FENCE", "true").lower() in ("1", "true", "yes"),
+    "github_latency": float(os.getenv("MOCK_GITHUB_LATENCY", "0.2")),
+}
+
+CHARS_PER_TOKEN = 4
+CHUNK_TOKENS = 4  # tokens per streamed chunk
+
+
+def setting(request: Request, name: str):
+    header = request.headers.get("x-mock-" + name.replace("_", "-"))
+    if header is None:
+        return DEFAULTS[name]
+    kind = type(DEFAULTS[name])
+    if kind is bool:
+        return header.lower() in ("1", "true", "yes")
+    return kind(header)
+
+
+# ================================================================
+#   CANNED HTML
+# ================================================================
+HTML_HEAD = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8"></meta>
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>Mock App</title>
+<style>
+  body { font-family: system-ui, sans-serif; margin: 0; padding: 24px; background: #f5f7fb; }
+  .card { background: #fff; border-radius: 12px; padding: 16px; margin-bottom: 12px; box-shadow: 0 1px 4px rgba(0,0,0,.08); }
+  button { padding: 8px 14px; border: 0; border-radius: 8px; background: #4f46e5; color: #fff; cursor: pointer; }
+</style>
+</head>
+<body>
+<h1>Mock App</h1>
+"""
+
+HTML_SECTION = """<div class="card" id="card-{n}">
+  <h2>Section {n}</h2>
+  <p>This block is filler content produced by the mock LLM server to reach a realistic page size.</p>
+  <button onclick="toggle({n})">Toggle</button>
+</div>
+"""
+
+HTML_TAIL = """</body>
+<script>
+  function toggle(n) {
+    const el = document.getElementById('card-' + n);
+    el.style.opacity = el.style.opacity === '0.5' ? '1' : '0.5';
+  }
+</script>
+</html>"""
+
+
+def canned_html(size: int, fence: bool) -> str:
+    sections = []
+    total = len(HTML_HEAD) + len(HTML_TAIL)
+    n = 1
+    while total < size:
+        section = HTML_SECTION.format(n=n)
+        sections.append(section)
+        total += len(section)
+        n += 1
+    html = HTML_HEAD + "".join(sections) + HTML_TAIL
+    return f"```html\n{html}\n```" if fence else html
+
+
+# Provider-style prompt caching: prefixes of >= 1024 tokens are cached in
+# 128-token steps, so repeated prompts report prompt_tokens_details.cached_tokens.
+CACHE_MIN_TOKENS = 1024
+CACHE_STEP_TOKENS = 128
+SEEN_PREFIXES = set()
+
+
+def cached_prefix_tokens(messages: list) -> int:
+    prompt = json.dumps(messages, sort_keys=True)
+    step = CACHE_STEP_TOKENS * CHARS_PER_TOKEN
+    cached = 0
+    for end in range(CACHE_MIN_TOKENS * CHARS_PER_TOKEN, len(prompt) + 1, step):
+        digest = hashlib.sha1(prompt[:end].encode("utf-8")).hexdigest()
+        if digest in SEEN_PREFIXES:
+            cached = end // CHARS_PER_TOKEN
+        SEEN_PREFIXES.add(digest)
+    return cached
+
+
+def usage_for(messages: list, completion: str) -> dict:
+    prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // CHARS_PER_TOKEN
+    completion_tokens = len(completion) // CHARS_PER_TOKEN
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": min(cached_prefix_tokens(messages), prompt_tokens)},
+    }
+
+
+# ================================================================
+#   CHAT COMPLETIONS
+# ================================================================
+@app.post("/chat/completions")
+@app.post("/v1/chat/completions")
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "gpt-4o-mini")
+    messages = body.get("messages", [])
+
+    if random.random() < setting(request, "error_rate"):
+        status = setting(request, "error_status")
+        headers = {"retry-after": "1"} if status == 429 else {}
+        return JSONResponse(
+            status_code=status,
+            content={"error": {"message": f"mock error {status}", "type": "mock_error"}},
+            headers=headers,
+        )
+
+    completion = canned_html(setting(request, "html_bytes"), setting(request, "fence"))
+    finish_reason = "stop"
+    if body.get("max_tokens") and len(completion) > body["max_tokens"] * CHARS_PER_TOKEN:
+        # like a real upstream: cut off at the limit
+        completion = completion[: body["max_tokens"] * CHARS_PER_TOKEN]
+        finish_reason = "length"
+    tokens_per_second = max(setting(request, "tokens_per_second"), 1e-6)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+    created = int(time.time())
+
+    await asyncio.sleep(setting(request, "latency"))
+
+    if body.get("stream"):
+        chunk_chars = CHUNK_TOKENS * CHARS_PER_TOKEN
+        chunk_delay = CHUNK_TOKENS / tokens_per_second
+
+        async def events():
+            for i in range(0, len(completion), chunk_chars):
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": completion[i:i + chunk_chars]}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(chunk_delay)
+            final = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}],
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            if (body.get("stream_options") or {}).get("include_usage"):
+                usage = {**final, "choices": [], "usage": usage_for(messages, completion)}
+                yield f"data: {json.dumps(usage)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    # Non-streaming: simulate the full generation time.
+    await asyncio.sleep(len(completion) / CHARS_PER_TOKEN / tokens_per_second)
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": completion}, "finish_reason": finish_reason}],
+        "usage": usage_for(messages, completion),
+    }
+
+
+# ================================================================
+#   FAKE GITHUB (CONTENTS + GIT DATA API)
+# ================================================================
+GIT = {"refs": {}, "commits": {}, "trees": {}, "blobs": {}, "files": {}}
+
+
+def sha_of(data) -> str:
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def head_of(branch: str) -> str:
+    if branch not in GIT["refs"]:
+        tree_sha = sha_of({"tree": []})
+        GIT["trees"][tree_sha] = {}
+        commit_sha = sha_of({"root": branch})
+        GIT["commits"][commit_sha] = {"sha": commit_sha, "tree": {"sha": tree_sha}, "parents": []}
+        GIT["refs"][branch] = commit_sha
+    return GIT["refs"][branch]
+
+
+async def github_delay(request: Request):
+    await asyncio.sleep(setting(request, "github_latency"))
+    if random.random() < setting(request, "error_rate"):
+        return JSONResponse(status_code=setting(request, "error_status"), content={"message": "mock error"})
+    return None
+
+
+@app.put("/repos/{owner}/{repo}/contents/{path:path}")
+async def put_contents(owner: str, repo: str, path: str, request: Request):
+    error = await github_delay(request)
+    if error:
+        return error
+    body = await request.json()
+    if path in GIT["files"] and not body.get("sha"):
+        return JSONResponse(status_code=422, content={"message": "\"sha\" wasn't supplied."})
+    blob_sha = sha_of({"path": path, "content": body["content"]})
+    GIT["files"][path] = blob_sha
+    return JSONResponse(
+        status_code=201,
+        content={"content": {"path": path, "sha": blob_sha}, "commit": {"sha": sha_of({"file": path})}},
+    )
+
+
+@app.get("/repos/{owner}/{repo}/git/ref/heads/{branch:path}")
+async def get_ref(owner: str, repo: str, branch: str, request: Request):
+    error = await github_delay(request)
+    return error or {"ref": f"refs/heads/{branch}", "object": {"sha": head_of(branch), "type": "commit"}}
+
+
+@app.get("/repos/{owner}/{repo}/git/commits/{sha}")
+async def get_commit(owner: str, repo: str, sha: str, request: Request):
+    error = await github_delay(request)
+    if error:
+        return error
+    commit = GIT["commits"].get(sha)
+    return commit or JSONResponse(status_code=404, content={"message": "Not Found"})
+
+
+@app.post("/repos/{owner}/{repo}/git/blobs")
+async def create_blob(owner: str, repo: str, request: Request):
+    error = await github_delay(request)
+    if error:
+        return error
+    body = await request.json()
+    sha = sha_of(body)
+    GIT["blobs"][sha] = body["content"]
+    return JSONResponse(status_code=201, content={"sha": sha})
+
+
+@app.post("/repos/{owner}/{repo}/git/trees")
+async def create_tree(owner: str, repo: str, request: Request):
+    error = await github_delay(request)
+    if error:
+        return error
+    body = await request.json()
+    entries = dict(GIT["trees"].get(body.get("base_tree"), {}))
+    entries.update({entry["path"]: entry["sha"] for entry in body["tree"]})
+    sha = sha_of(entries)
+    GIT["trees"][sha] = entries
+    return JSONResponse(status_code=201, content={"sha": sha})
+
+
+@app.post("/repos/{owner}/{repo}/git/commits")
+async def create_commit(owner: str, repo: str, request: Request):
+    error = await github_delay(request)
+    if error:
+        return error
+    body = await request.json()
+    sha = sha_of({**body, "at": time.time()})
+    GIT["commits"][sha] = {"sha": sha, "tree": {"sha": body["tree"]}, "parents": body["parents"]}
+    return JSONResponse(status_code=201, content={"sha": sha})
+
+
+@app.patch("/repos/{owner}/{repo}/git/refs/heads/{branch:path}")
+async def update_ref(owner: str, repo: str, branch: str, request: Request):
+    error = await github_delay(request)
+    if error:
+        return error
+    body = await request.json()
+    commit = GIT["commits"].get(body["sha"])
+    if commit is None or (not body.get("force") and head_of(branch) not in commit["parents"]):
+        return JSONResponse(status_code=422, content={"message": "Update is not a fast forward"})
+    GIT["refs"][branch] = body["sha"]
+    return {"ref": f"refs/heads/{branch}", "object": {"sha": body["sha"], "type": "commit"}}
+
+
+@app.get("/_mock/state")
+async def mock_state():
+    return {
+        "defaults": DEFAULTS,
+        "refs": GIT["refs"],
+        "files": len(GIT["files"]),
+        "blobs": len(GIT["blobs"]),
+        "commits": len(GIT["commits"]),
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible + GitHub API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
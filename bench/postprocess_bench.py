@@ -0,0 +1,77 @@
+"""
+Micro-benchmark for the HTML post-processor (html_post.py) on large outputs.
+
+Compares the old post-processing (two str.replace passes + strip, and the
+code[8:-3] slice from main.py) with HtmlPostProcessor run one-shot and fed
+token-sized chunks as it is behind a streamed response.
+
+    python bench/postprocess_bench.py --sizes 20000,200000,2000000
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from html_post import HtmlPostProcessor, postprocess_html  # noqa: E402
+
+
+def old_clean_html(raw_output: str) -> str:
+    if "```html" in raw_output:
+        raw_output = raw_output.replace("```html", "")
+    if "```" in raw_output:
+        raw_output = raw_output.replace("```", "")
+    return raw_output.strip()
+
+
+def old_clean_code(code: str) -> str:
+    return code[8:-3] if "```html" in code else code
+
+
+def sample_output(size: int) -> str:
+    section = '<div class="card"><h2>Item</h2><p>Filler text for the benchmark.</p><button>Go</button></div>\n'
+    body = section * max(1, size // len(section))
+    html = (
+        "<!DOCTYPE html>\n<html lang=\"en\">\n<head>\n<meta charset=\"UTF-8\"></meta>\n"
+        "<style>body { margin: 0; }</style>\n</head>\n<body>\n"
+        + body
+        + "</body>\n<script>\nconsole.log('ready');\n</script>\n</html>"
+    )
+    return f"Here is your app:\n\n```html\n{html}\n```\n\nLet me know if you want changes."
+
+
+def chunked(raw: str, chunk_size: int) -> str:
+    processor = HtmlPostProcessor()
+    parts = [processor.feed(raw[i:i + chunk_size]) for i in range(0, len(raw), chunk_size)]
+    parts.append(processor.flush())
+    return "".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML post-processing")
+    parser.add_argument("--sizes", default="20000,200000,2000000", help="comma separated output sizes in bytes")
+    parser.add_argument("--chunk", type=int, default=16, help="chunk size for the streamed variant (~4 tokens)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'size':>9}  {'variant':<22} {'ms/op':>9} {'MB/s':>9}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        raw = sample_output(size)
+        assert postprocess_html(raw)[0] == chunked(raw, args.chunk)
+
+        variants = {
+            "old clean_html": lambda: old_clean_html(raw),
+            "old clean_code (slice)": lambda: old_clean_code(raw),
+            "postprocess one-shot": lambda: postprocess_html(raw),
+            f"postprocess {args.chunk}B chunks": lambda: chunked(raw, args.chunk),
+        }
+        for name, fn in variants.items():
+            number = max(1, 2_000_000 // len(raw))
+            best = min(timeit.repeat(fn, number=number, repeat=args.repeat)) / number
+            print(f"{len(raw):>9}  {name:<22} {best * 1000:>9.3f} {len(raw) / best / 1e6:>9.1f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Micro-benchmark for request/response JSON on routes that carry a whole page
+(/rectify, /deploy, rectify sessions), at typical 20-100 KB payloads.
+
+Decode compares what request.json() did (json.loads) with orjson and with
+schemas.read_model, which parses and validates in one pass
+(model_validate_json).
+Encode compares FastAPI's path for a returned dict (jsonable_encoder +
+json.dumps) with a response_model serialized by pydantic's dump_json (the
+fallback without orjson) and by FastJSONResponse (orjson), and with
+generate's raw text/html mode.
+
+    python bench/serialization_bench.py --sizes 20000,50000,100000
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from schemas import FastJSONResponse, RectifyRequest, RectifyResponse, orjson  # noqa: E402
+
+
+def sample_page(size: int) -> str:
+    # Quotes, newlines, backslashes and non-ASCII: everything JSON has to escape.
+    section = (
+        '<div class="card" data-id="42"><h2>Café ☕ "Item"</h2>\n'
+        "<p>Filler text, with 'quotes' and a tab\tfor the benchmark.</p>\n"
+        '<button onclick="go(\'next\')">Go →</button></div>\n'
+        '<script>const re = /\\d+\\.\\d+/g; console.log("ok\\n");</script>\n'
+    )
+    body = section * max(1, size // len(section))
+    return (
+        '<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="UTF-8"></meta>\n'
+        "<style>body { margin: 0; }</style>\n</head>\n<body>\n" + body + "</body>\n</html>"
+    )
+
+
+def stdlib_response(data: dict) -> bytes:
+    # FastAPI without response_model: jsonable_encoder, then JSONResponse.render
+    return json.dumps(jsonable_encoder(data), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def model_response(data: dict) -> bytes:
+    # FastAPI with response_model and no response class: validate, then dump_json in Rust
+    return RectifyResponse.model_validate(data).model_dump_json(exclude_unset=True).encode("utf-8")
+
+
+def fast_response(data: dict) -> bytes:
+    # FastAPI with response_model and FastJSONResponse: validate, dump to Python, orjson
+    return FastJSONResponse(RectifyResponse.model_validate(data).model_dump(exclude_unset=True)).body
+
+
+def variants(page: str) -> list:
+    request = json.dumps({"code": page, "feedback": "Make the buttons blue", "stream": False}).encode("utf-8")
+    response = {"code": page, "mode": "full", "problems": [], "artifact_id": "0" * 32}
+
+    rows = [
+        ("decode json.loads", lambda: json.loads(request)["code"]),
+        ("decode read_model", lambda: RectifyRequest.model_validate_json(request).code),
+        ("encode jsonable+json", lambda: stdlib_response(response)),
+        ("encode dump_json", lambda: model_response(response)),
+        ("encode text/html", lambda: page.encode("utf-8")),
+    ]
+    if orjson is not None:
+        rows.insert(1, ("decode orjson", lambda: orjson.loads(request)["code"]))
+        rows.insert(5, ("encode FastJSONResponse", lambda: fast_response(response)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON decode/encode of page-sized payloads")
+    parser.add_argument("--sizes", default="20000,50000,100000", help="comma-separated page sizes in characters")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'size':>9}  {'variant':<24} {'us/op':>9} {'MB/s':>9}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        page = sample_page(size)
+        payload = len(page.encode("utf-8"))
+        for name, fn in variants(page):
+            number = max(10, 2_000_000 // payload)
+            best = min(timeit.repeat(fn, number=number, repeat=args.repeat)) / number
+            print(f"{payload:>9}  {name:<24} {best * 1e6:>9.1f} {payload / best / 1e6:>9.1f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
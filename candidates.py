@@ -0,0 +1,115 @@
+import asyncio
+import os
+from typing import Awaitable, Callable
+
+from html_post import without_raw_text
+from http_pool import env_int
+from metrics import log
+from rectify_edits import CHECKED_TAGS, tag_balance
+
+
+MAX_CANDIDATES = env_int("MAX_CANDIDATES", 5)
+
+# Spread around the usual 0.7 so candidates differ without going off the rails.
+DEFAULT_TEMPERATURES = (0.7, 1.0, 0.4, 0.9, 0.55, 1.1, 0.3, 0.8)
+
+MIN_PAGE_CHARS = 1000  # anything shorter is almost never a working app
+
+
+def candidate_temperatures(n: int) -> list:
+    """CANDIDATE_TEMPERATURES (comma separated) overrides the spread; cycled when n is larger."""
+    configured = os.getenv("CANDIDATE_TEMPERATURES")
+    temperatures = [float(t) for t in configured.split(",")] if configured else list(DEFAULT_TEMPERATURES)
+    return [temperatures[i % len(temperatures)] for i in range(n)]
+
+
+def candidate_count(body: dict) -> int:
+    """{"candidates": N} in the request body, clamped to 1..MAX_CANDIDATES."""
+    try:
+        n = int(body.get("candidates") or 1)
+    except (TypeError, ValueError):
+        return 1
+    return max(1, min(n, MAX_CANDIDATES))
+
+
+# ================================================================
+#   SCORING
+# ================================================================
+def score_candidate(html: str, problems: list) -> tuple:
+    """
+    Cheap structural score (higher is better) and the reasons for each
+    deduction: post-processor repairs, unbalanced skeleton tags, missing
+    <style>/<script>, and pages too short to be a working app. Larger
+    pages get a small bonus as they are usually more complete.
+    """
+    score = 100
+    notes = []
+
+    score -= 10 * len(problems)
+    notes += problems
+
+    # "<div>" inside a script that builds markup is not structure
+    structure = without_raw_text(html)
+    for tag in CHECKED_TAGS:
+        if tag_balance(structure, tag) != 0:
+            score -= 10
+            notes.append(f"unbalanced <{tag}>")
+
+    low = html.lower()
+    for tag in ("<style", "<script"):
+        if tag not in low:
+            score -= 10
+            notes.append(f"no {tag}>")
+
+    if len(html) < MIN_PAGE_CHARS:
+        score -= 30
+        notes.append(f"only {len(html)} chars")
+    score += min(10, len(html) // 2000)
+
+    return score, notes
+
+
+# ================================================================
+#   FAN-OUT + SELECTION
+# ================================================================
+async def generate_candidates(generate: Callable[[float], Awaitable[tuple]], n: int) -> list:
+    """
+    Runs generate(temperature) -> (html, problems) for n temperatures
+    concurrently and returns the candidates ranked best first. Failed
+    candidates are dropped; if all fail, the first error is raised.
+    """
+    temperatures = candidate_temperatures(n)
+    results = await asyncio.gather(*(generate(t) for t in temperatures), return_exceptions=True)
+
+    candidates, errors = [], []
+    for temperature, result in zip(temperatures, results):
+        if isinstance(result, Exception):
+            errors.append(result)
+            continue
+        html, problems = result
+        score, notes = score_candidate(html, problems)
+        candidates.append({"code": html, "problems": problems, "score": score, "notes": notes, "temperature": temperature})
+
+    if not candidates:
+        raise errors[0]
+    if errors:
+        log("Some candidates failed", level="warning", failed=len(errors), requested=n, error=str(errors[0]))
+
+    # stable sort: on a tie the earlier (more conservative) temperature wins
+    candidates.sort(key=lambda c: c["score"], reverse=True)
+    return candidates
+
+
+def candidates_response(candidates: list, ranked: bool = False) -> dict:
+    """The best candidate in the usual {"code", "problems"} shape, plus all of them when `ranked`."""
+    best = candidates[0]
+    response = {
+        "code": best["code"],
+        "problems": best["problems"],
+        "score": best["score"],
+        "temperature": best["temperature"],
+        "candidates_ok": len(candidates),
+    }
+    if ranked:
+        response["candidates"] = candidates
+    return response
@@ -0,0 +1,275 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import anyio.to_thread
+from fastapi import Request
+from fastapi.responses import Response
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+
+from http_pool import env_int
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+
+# Encodings we can produce; on equal q-values the earlier one wins.
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def accepted_encodings(accept_encoding: str) -> list:
+    """Encodings from ENCODINGS the client accepts, most preferred first."""
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+
+    accepted = []
+    for encoding in ENCODINGS:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > 0:
+            accepted.append((weight, encoding))
+    # sorted() is stable, so ties keep the ENCODINGS order (br before gzip)
+    return [encoding for _, encoding in sorted(accepted, key=lambda pair: -pair[0])]
+
+
+# ================================================================
+#   RESPONSE COMPRESSION MIDDLEWARE (BROTLI / GZIP)
+# ================================================================
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app, minimum_size: int, quality: int = 5, thread_minimum_size: int = 64 * 1024):
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(quality=quality)
+        self.thread_minimum_size = thread_minimum_size
+        self.flush_chunks = None  # decided on the first body chunk
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if self.flush_chunks is None:
+            # Streams (NDJSON, no Content-Length) flush every chunk so tokens reach the
+            # client at once; a fixed-length body sent in pieces compresses better unflushed.
+            self.flush_chunks = "content-length" not in Headers(raw=self.initial_message["headers"])
+        if len(body) >= self.thread_minimum_size:
+            # Brotli on a large body would stall every other request on this worker.
+            return await anyio.to_thread.run_sync(self._compress, body, more_body)
+        return self._compress(body, more_body)
+
+    def _compress(self, body: bytes, more_body: bool) -> bytes:
+        if not more_body:
+            return self.compressor.process(body) + self.compressor.finish()
+        if self.flush_chunks:
+            return self.compressor.process(body) + self.compressor.flush()
+        return self.compressor.process(body)
+
+
+class CompressionMiddleware:
+    """
+    Starlette's GZipMiddleware with brotli added: picks br or gzip from
+    Accept-Encoding. Bodies under `minimum_size`, SSE streams and responses
+    that already carry Content-Encoding (precompressed assets) pass through.
+    Dynamic responses use fast levels; static assets are compressed once at
+    the maximum level by AssetCache instead. Bodies of `thread_minimum_size`
+    or more are compressed in a worker thread (Starlette does the same for
+    gzip at 128 KiB).
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 500,
+        gzip_level: int = 6,
+        brotli_quality: int = 5,
+        thread_minimum_size: int = 64 * 1024,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.thread_minimum_size = thread_minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encodings = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        preferred = encodings[0] if encodings else None
+        if preferred == "br":
+            responder = BrotliResponder(self.app, self.minimum_size, self.brotli_quality, self.thread_minimum_size)
+        elif preferred == "gzip":
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=self.gzip_level)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+
+        async def send_with_vary(message):
+            # AssetCache responses already say Vary: Accept-Encoding; the responders add it again.
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                if "vary" in headers:
+                    headers["vary"] = ", ".join(dict.fromkeys(v.strip() for v in headers["vary"].split(",")))
+            await send(message)
+
+        await responder(scope, receive, send_with_vary)
+
+
+def compression_options_from_env() -> dict:
+    return {
+        "minimum_size": env_int("COMPRESS_MIN_SIZE", 500),
+        "gzip_level": env_int("GZIP_LEVEL", 6),
+        "brotli_quality": env_int("BROTLI_QUALITY", 5),
+        "thread_minimum_size": env_int("COMPRESS_THREAD_MIN_SIZE", 64 * 1024),
+    }
+
+
+# ================================================================
+#   PRECOMPRESSED ASSETS WITH STRONG ETAGS
+# ================================================================
+def encode_variants(body: bytes, digest: Optional[str] = None, precompressed: Optional[dict] = None) -> dict:
+    """
+    The body in every encoding we serve, at maximum compression, plus its
+    SHA-256 for the ETag. Variants that come out no smaller are dropped.
+    """
+    variants = {"identity": body, "etag": digest or hashlib.sha256(body).hexdigest()}
+    precompressed = precompressed or {}
+    for encoding in ENCODINGS:
+        if encoding in precompressed:
+            encoded = precompressed[encoding]
+        elif encoding == "br":
+            encoded = brotli.compress(body, quality=11)
+        else:
+            encoded = gzip.compress(body, compresslevel=9, mtime=0)
+        if len(encoded) < len(body):
+            variants[encoding] = encoded
+    return variants
+
+
+def _read_precompressed(path: str, mtime_ns: int) -> dict:
+    """`<file>.br` / `<file>.gz` built ahead of time, used if not older than the file."""
+    found = {}
+    for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+        try:
+            if os.stat(path + suffix).st_mtime_ns >= mtime_ns:
+                with open(path + suffix, "rb") as f:
+                    found[encoding] = f.read()
+        except OSError:
+            continue
+    return found
+
+
+def etag_matches(if_none_match: str, digest: str) -> bool:
+    """True if any validator names this content (in any encoding, see AssetCache.response)."""
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag.strip('"').partition("-")[0] == digest:
+            return True
+    return False
+
+
+class AssetCache:
+    """
+    Serves UI files and stored artifacts from memory in every encoding.
+    Files are re-read only when their mtime or size changes; artifact blobs
+    never change (they are content addressed), so they sit in a small LRU.
+    Each representation gets a strong ETag "<sha256>[-<encoding>]" and a
+    matching If-None-Match is answered with 304 and no body.
+    """
+
+    def __init__(self, max_blobs: int = 128, static_max_age: int = 3600):
+        self.max_blobs = max_blobs
+        self.static_max_age = static_max_age
+        self._files = {}
+        self._blobs = OrderedDict()
+        self.counters = {
+            "responses": 0,
+            "not_modified": 0,
+            "encoded": 0,
+            "bytes_sent": 0,
+            "bytes_uncompressed": 0,
+        }
+
+    def file_variants(self, path: str) -> dict:
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        cached = self._files.get(path)
+        if cached is None or cached["version"] != version:
+            with open(path, "rb") as f:
+                body = f.read()
+            cached = {"version": version, **encode_variants(body, precompressed=_read_precompressed(path, stat.st_mtime_ns))}
+            self._files[path] = cached
+            self.counters["encoded"] += 1
+        return cached
+
+    def blob_variants(self, digest: str, load: Callable[[], Optional[bytes]]) -> Optional[dict]:
+        cached = self._blobs.get(digest)
+        if cached is not None:
+            self._blobs.move_to_end(digest)
+            return cached
+        body = load()
+        if body is None:
+            return None
+        cached = encode_variants(body, digest=digest)
+        self._blobs[digest] = cached
+        self.counters["encoded"] += 1
+        while len(self._blobs) > self.max_blobs:
+            self._blobs.popitem(last=False)
+        return cached
+
+    def response(self, request: Request, variants: dict, media_type: str, cache_control: str) -> Response:
+        encoding = next(
+            (e for e in accepted_encodings(request.headers.get("accept-encoding", "")) if e in variants),
+            None,
+        )
+        etag = f'"{variants["etag"]}-{encoding}"' if encoding else f'"{variants["etag"]}"'
+        headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        self.counters["responses"] += 1
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, variants["etag"]):
+            self.counters["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+
+        body = variants[encoding or "identity"]
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        self.counters["bytes_sent"] += len(body)
+        self.counters["bytes_uncompressed"] += len(variants["identity"])
+        return Response(body, media_type=media_type, headers=headers)
+
+    def file_response(self, request: Request, path: str, cache_control: Optional[str] = None) -> Response:
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if cache_control is None:
+            cache_control = f"public, max-age={self.static_max_age}"
+        return self.response(request, self.file_variants(path), media_type, cache_control)
+
+    def stats(self) -> dict:
+        return {
+            "encodings": list(ENCODINGS),
+            "files": len(self._files),
+            "blobs": len(self._blobs),
+            **self.counters,
+        }
+
+
+def asset_cache_from_env() -> AssetCache:
+    return AssetCache(
+        max_blobs=env_int("ASSET_CACHE_BLOBS", 128),
+        static_max_age=env_int("STATIC_MAX_AGE", 3600),
+    )
@@ -0,0 +1,200 @@
+import asyncio
+import base64
+import hashlib
+import random
+import time
+from typing import Optional
+
+import httpx
+
+from http_pool import env_float, env_int
+from metrics import log, phase
+
+
+GITHUB_TIMEOUT = httpx.Timeout(env_float("GITHUB_TIMEOUT", 30.0), connect=10.0)
+GITHUB_MAX_RETRIES = env_int("GITHUB_MAX_RETRIES", 3)
+GITHUB_BACKOFF_BASE = env_float("GITHUB_BACKOFF_BASE", 0.5)
+GITHUB_BACKOFF_MAX = env_float("GITHUB_BACKOFF_MAX", 30.0)
+
+
+# ================================================================
+#   RETRY POLICY
+# ================================================================
+def is_secondary_rate_limit(response: httpx.Response) -> bool:
+    """GitHub signals (secondary) rate limits with 403/429 plus Retry-After or a rate-limit message."""
+    if response.status_code not in (403, 429):
+        return False
+    if response.status_code == 429 or "retry-after" in response.headers:
+        return True
+    if response.headers.get("x-ratelimit-remaining") == "0":
+        return True
+    return "rate limit" in response.text.lower()
+
+
+def is_retryable(response: httpx.Response) -> bool:
+    return response.status_code >= 500 or is_secondary_rate_limit(response)
+
+
+def retry_delay(response: Optional[httpx.Response], attempt: int) -> float:
+    """Honors Retry-After / x-ratelimit-reset, otherwise full-jitter exponential backoff."""
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), GITHUB_BACKOFF_MAX)
+
+        reset = response.headers.get("x-ratelimit-reset")
+        if reset and reset.isdigit() and response.headers.get("x-ratelimit-remaining") == "0":
+            return min(max(int(reset) - time.time(), 0.0), GITHUB_BACKOFF_MAX)
+
+    return random.uniform(0, min(GITHUB_BACKOFF_BASE * (2 ** attempt), GITHUB_BACKOFF_MAX))
+
+
+# ================================================================
+#   REQUEST WITH RETRIES
+# ================================================================
+async def github_request(
+    client: httpx.AsyncClient,
+    method: str,
+    url: str,
+    token: str,
+    max_retries: int = GITHUB_MAX_RETRIES,
+    **kwargs,
+) -> httpx.Response:
+    """
+    Sends a GitHub REST request on the shared async client. Retries on
+    5xx, secondary rate limits and transport errors with backoff, and
+    returns the last response for the caller to check.
+    """
+    headers = {
+        "Authorization": f"token {token}",
+        "Accept": "application/vnd.github.v3+json",
+        **kwargs.pop("headers", {}),
+    }
+    kwargs.setdefault("timeout", GITHUB_TIMEOUT)
+
+    for attempt in range(max_retries + 1):
+        try:
+            with phase("github_api"):
+                response = await client.request(method, url, headers=headers, **kwargs)
+        except httpx.TransportError as e:
+            if attempt == max_retries:
+                raise
+            log("GitHub request failed, retrying", level="warning", method=method, url=url, error=repr(e))
+            await asyncio.sleep(retry_delay(None, attempt))
+            continue
+
+        if attempt == max_retries or not is_retryable(response):
+            return response
+
+        log("GitHub request failed, retrying", level="warning", method=method, url=url, status=response.status_code)
+        await asyncio.sleep(retry_delay(response, attempt))
+
+
+# ================================================================
+#   CONTENTS API: ONE FILE
+# ================================================================
+def git_blob_sha(data: bytes) -> str:
+    """The sha git (and the Contents API) gives a file with this content."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+async def put_file(client: httpx.AsyncClient, contents_url: str, token: str, payload: dict) -> httpx.Response:
+    """
+    Contents API PUT with retries. A PUT retried after a 5xx or timeout may
+    already have been applied, and the retry then fails with 409/422 (the
+    file exists, or its sha moved). If the file on the branch now holds
+    exactly our content, the earlier attempt landed: the GET response (200)
+    is returned in place of the failure.
+    """
+    response = await github_request(client, "PUT", contents_url, token, json=payload)
+    if response.status_code not in (409, 422):
+        return response
+
+    current = await github_request(client, "GET", contents_url, token, params={"ref": payload["branch"]})
+    expected = git_blob_sha(base64.b64decode(payload["content"]))
+    if current.status_code == 200 and current.json().get("sha") == expected:
+        log("GitHub PUT was already applied", level="warning", url=contents_url, status=response.status_code)
+        return current
+    return response
+
+
+# ================================================================
+#   GIT DATA API: MANY FILES IN ONE COMMIT
+# ================================================================
+GITHUB_BLOB_CONCURRENCY = env_int("GITHUB_BLOB_CONCURRENCY", 8)
+
+
+class GitHubError(Exception):
+    def __init__(self, step: str, response: httpx.Response):
+        self.step = step
+        self.status_code = response.status_code
+        self.text = response.text
+        super().__init__(f"{step} failed: {response.status_code} {response.text}")
+
+
+async def _github_json(client, method, url, token, step, expected=(200, 201), **kwargs) -> dict:
+    response = await github_request(client, method, url, token, **kwargs)
+    if response.status_code not in expected:
+        raise GitHubError(step, response)
+    return response.json()
+
+
+async def commit_files(
+    client: httpx.AsyncClient,
+    api_url: str,
+    owner: str,
+    repo: str,
+    branch: str,
+    token: str,
+    files: dict,
+    message: str,
+    max_attempts: int = 3,
+) -> str:
+    """
+    Writes {path: text} to `branch` as a single commit and returns its sha.
+
+    Blobs are uploaded concurrently, then one tree, one commit and one ref
+    update are made. If the branch moved meanwhile (non fast-forward), the
+    tree/commit are rebuilt on the new head, reusing the uploaded blobs.
+    """
+    repo_url = f"{api_url}/repos/{owner}/{repo}"
+    semaphore = asyncio.Semaphore(GITHUB_BLOB_CONCURRENCY)
+
+    async def upload_blob(text: str) -> str:
+        async with semaphore:
+            blob = await _github_json(
+                client, "POST", f"{repo_url}/git/blobs", token, "create blob",
+                json={"content": base64.b64encode(text.encode("utf-8")).decode("utf-8"), "encoding": "base64"},
+            )
+        return blob["sha"]
+
+    paths = list(files)
+    blob_shas = await asyncio.gather(*(upload_blob(files[path]) for path in paths))
+    tree_entries = [
+        {"path": path, "mode": "100644", "type": "blob", "sha": sha}
+        for path, sha in zip(paths, blob_shas)
+    ]
+
+    for attempt in range(max_attempts):
+        ref = await _github_json(client, "GET", f"{repo_url}/git/ref/heads/{branch}", token, "get ref", expected=(200,))
+        head_sha = ref["object"]["sha"]
+        head = await _github_json(client, "GET", f"{repo_url}/git/commits/{head_sha}", token, "get commit", expected=(200,))
+
+        tree = await _github_json(
+            client, "POST", f"{repo_url}/git/trees", token, "create tree",
+            json={"base_tree": head["tree"]["sha"], "tree": tree_entries},
+        )
+        commit = await _github_json(
+            client, "POST", f"{repo_url}/git/commits", token, "create commit",
+            json={"message": message, "tree": tree["sha"], "parents": [head_sha]},
+        )
+
+        update = await github_request(
+            client, "PATCH", f"{repo_url}/git/refs/heads/{branch}", token,
+            json={"sha": commit["sha"], "force": False},
+        )
+        if update.status_code == 200:
+            return commit["sha"]
+        if update.status_code != 422 or attempt == max_attempts - 1:
+            raise GitHubError("update ref", update)
+        log("Branch moved during commit, retrying on new head", level="warning", branch=branch)
@@ -0,0 +1,186 @@
+import base64
+import os
+import re
+from datetime import datetime
+from typing import Optional
+
+import httpx
+from fastapi import HTTPException
+
+from github_api import GitHubError, commit_files, put_file
+from metrics import timed
+
+
+# ================================================================
+#   FILENAME HELPERS FOR GITHUB DEPLOY
+# ================================================================
+def slugify(text: str) -> str:
+    text = text.strip().lower()
+    if not text:
+        return "app"
+    text = re.sub(r"[^a-z0-9]+", "-", text)
+    text = re.sub(r"-+", "-", text).strip("-")
+    return text or "app"
+
+
+def generate_filename(description: str) -> str:
+    slug = slugify(description)
+    ts = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+    return f"{slug}-{ts}.html"
+
+
+# ================================================================
+#   DEPLOY TARGET (REPO + BRANCH + PAGES URL)
+# ================================================================
+class GitHubDeployer:
+    """
+    Deploys generated pages as new files under generated/ in one repo.
+    Credentials are only checked when a deploy is requested, so an app
+    without GITHUB_* settings still serves generate and rectify.
+    """
+
+    def __init__(
+        self,
+        token: Optional[str],
+        username: Optional[str],
+        repo: Optional[str],
+        branch: str = "main",
+        api_url: str = "https://api.github.com",
+        pages_base_url: Optional[str] = None,
+    ):
+        self.token = token
+        self.username = username
+        self.repo = repo
+        self.branch = branch
+        self.api_url = api_url.rstrip("/")
+        self.pages_base_url = pages_base_url or f"https://{username}.github.io/{repo}"
+        self.http_client = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.token and self.username and self.repo)
+
+    @property
+    def target(self) -> str:
+        """Where a blob lands; deployments are deduplicated per target."""
+        return f"{self.api_url}/{self.username}/{self.repo}@{self.branch}"
+
+    @property
+    def repo_url(self) -> str:
+        return f"https://github.com/{self.username}/{self.repo}"
+
+    def bind(self, http_client: httpx.AsyncClient):
+        """Use the app's pooled client (called from the lifespan hook)."""
+        self.http_client = http_client
+
+    def _require_config(self):
+        if not self.configured:
+            raise HTTPException(
+                status_code=503,
+                detail="GitHub deploy not configured: set GITHUB_TOKEN, GITHUB_USERNAME and GITHUB_REPO",
+            )
+
+    def deployment_info(self, filename: str) -> dict:
+        return {
+            "repo_url": self.repo_url,
+            # Link to that specific file on GitHub Pages (if enabled)
+            "pages_url": f"{self.pages_base_url}/generated/{filename}",
+            "filename": filename,
+            "path": f"generated/{filename}",
+        }
+
+    # ---------------- single file (Contents API) ----------------
+    @timed("deploy")
+    async def deploy(self, html_code: str, description: str) -> dict:
+        """
+        Creates a NEW file in the repo under generated/<slug>-<timestamp>.html.
+        Does NOT touch any existing index.html.
+        """
+        self._require_config()
+        filename = generate_filename(description or "app")
+        path = f"generated/{filename}"
+        contents_url = f"{self.api_url}/repos/{self.username}/{self.repo}/contents/{path}"
+
+        # We always create new files with unique names → no need for SHA check
+        # (put_file still recognizes its own earlier attempt if a retry conflicts).
+        payload = {
+            "message": f"chore: deploy generated app {filename}",
+            "content": base64.b64encode(html_code.encode("utf-8")).decode("utf-8"),
+            "branch": self.branch,
+        }
+
+        try:
+            put_resp = await put_file(self.http_client, contents_url, self.token, payload)
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=502, detail=f"Failed to reach GitHub: {e!r}")
+
+        if put_resp.status_code not in (200, 201):
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to deploy to GitHub: {put_resp.status_code} {put_resp.text}",
+            )
+
+        return self.deployment_info(filename)
+
+    # ---------------- many files, one commit (Git Data API) ----------------
+    @timed("deploy")
+    async def deploy_batch(self, items: list) -> dict:
+        """
+        Deploys many {code, description} items as new files under generated/
+        in a single commit: blobs are uploaded concurrently, then one tree,
+        one commit and one branch ref update.
+        """
+        self._require_config()
+        files = {}
+        filenames = []
+        for item in items:
+            filename = generate_filename(item.get("description") or "app")
+            # Same description + same second → keep names unique inside the batch.
+            base, n = filename[: -len(".html")], 2
+            while f"generated/{filename}" in files:
+                filename = f"{base}-{n}.html"
+                n += 1
+            files[f"generated/{filename}"] = item["code"]
+            filenames.append(filename)
+
+        try:
+            commit_sha = await commit_files(
+                self.http_client,
+                self.api_url,
+                self.username,
+                self.repo,
+                self.branch,
+                self.token,
+                files,
+                message=f"chore: deploy {len(files)} generated apps",
+            )
+        except GitHubError as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to deploy to GitHub: {e.step}: {e.status_code} {e.text}",
+            )
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=502, detail=f"Failed to reach GitHub: {e!r}")
+
+        deployments = [self.deployment_info(filename) for filename in filenames]
+        return {
+            "repo_url": self.repo_url,
+            "commit_sha": commit_sha,
+            "files": [
+                {"pages_url": d["pages_url"], "filename": d["filename"], "path": d["path"]}
+                for d in deployments
+            ],
+        }
+
+
+def deployer_from_env() -> GitHubDeployer:
+    username = os.getenv("GITHUB_USERNAME")
+    repo = os.getenv("GITHUB_REPO")  # e.g. "ai-app-generator-output"
+    return GitHubDeployer(
+        token=os.getenv("GITHUB_TOKEN"),
+        username=username,
+        repo=repo,
+        branch=os.getenv("GITHUB_BRANCH", "main"),  # optional, defaults to main
+        api_url=os.getenv("GITHUB_API_URL", "https://api.github.com"),
+        pages_base_url=os.getenv("GITHUB_PAGES_BASE_URL"),
+    )
@@ -0,0 +1,322 @@
+"""
+Output optimization for generated pages, applied to what leaves the server
+(GitHub deploys and /artifacts/{id}/html previews). Stored artifacts keep
+the model's source, since rectify edits it by anchored diffs and finds a
+round's parent by exact content.
+
+In one pass over the document it:
+- minifies inline <style> (rcssmin if installed, else a string-safe squeeze)
+- minifies inline scripts (rjsmin if installed, else drops indentation and
+  blank lines when the script has no multi-line strings)
+- strips HTML comments and indentation outside <pre>/<textarea>
+- drops repeated identical external <script src> and <link> tags
+- adds `defer` to external scripts no inline script after them can depend on
+- adds <link rel="preconnect"> for third-party origins the page loads or fetches
+"""
+import hashlib
+import re
+from typing import Optional
+from urllib.parse import urlsplit
+
+from http_pool import env_bool, env_int
+from metrics import log, timed
+
+try:
+    import rcssmin
+except ImportError:  # builtin CSS squeeze
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:  # whitespace-only JS
+    rjsmin = None
+
+
+# Bump when a rule changes what optimize() outputs; part of output_key().
+RULES_VERSION = 1
+
+# Comments and raw-text elements, whichever comes first; everything between is markup.
+TOKEN = re.compile(
+    r"<!--.*?-->|<(script|style|pre|textarea)\b([^>]*)>(.*?)</\1\s*>",
+    re.IGNORECASE | re.DOTALL,
+)
+# A raw-text element that was never closed: leave the rest of the document alone.
+RAW_OPEN = re.compile(r"<(?:script|style|pre|textarea)\b", re.IGNORECASE)
+ATTR = re.compile(r"""([^\s=/>"']+)(?:\s*=\s*("[^"]*"|'[^']*'|[^\s>]+))?""")
+LINK = re.compile(r"<link\b[^>]*>", re.IGNORECASE)
+NEWLINE_SPACE = re.compile(r"[ \t\r\f]*\n\s*")
+HEAD_OPEN = re.compile(r"<head\b[^>]*>", re.IGNORECASE)
+META_CHARSET = re.compile(r"<meta\b[^>]*charset[^>]*>(?:\s*</meta>)?", re.IGNORECASE)
+
+CSS_SKIP = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|/\*.*?\*/', re.DOTALL)
+CSS_SPACE = re.compile(r"\s+")
+CSS_PUNCT = re.compile(r" ?([{};,>]) ?")
+CSS_COLON = re.compile(r": ")
+
+FETCH_URL = re.compile(r"""fetch\(\s*["'`]((?:https?:)?//[^"'`\s/]+)""")
+CREDENTIALS_INCLUDE = re.compile(r"""credentials\s*:\s*["']include["']""")
+
+CLASSIC_TYPES = ("", "text/javascript", "application/javascript")
+JS_TYPES = CLASSIC_TYPES + ("module",)
+DEDUPED_RELS = ("stylesheet", "preload", "modulepreload", "icon")
+# Origin the page already has a preconnect/dns-prefetch hint for.
+HINTED = None
+
+
+def _attrs(text: str) -> dict:
+    return {name.lower(): (value or "").strip("\"'") for name, value in ATTR.findall(text)}
+
+
+def _origin(url: str) -> Optional[str]:
+    if url.startswith("//"):
+        url = "https:" + url
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.netloc:
+        return None
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def minify_css(css: str) -> str:
+    if rcssmin is not None:
+        return rcssmin.cssmin(css)
+    out = []
+    pos = 0
+    for match in CSS_SKIP.finditer(css):
+        out.append(_squeeze_css(css[pos:match.start()]))
+        if not match.group().startswith("/*"):
+            out.append(match.group())  # strings are kept byte for byte
+        pos = match.end()
+    out.append(_squeeze_css(css[pos:]))
+    return "".join(out).strip()
+
+
+def _squeeze_css(css: str) -> str:
+    # "a > b" / "x ;}" / "margin: 0"; "+", "-" and spaces before ":" matter (calc, "a :hover")
+    css = CSS_PUNCT.sub(r"\1", CSS_SPACE.sub(" ", css))
+    return CSS_COLON.sub(":", css).replace(";}", "}")
+
+
+def minify_js(js: str) -> str:
+    if rjsmin is not None:
+        return rjsmin.jsmin(js)
+    if "`" in js or "\\\n" in js:
+        return js  # template literals and line continuations can span lines
+    return "\n".join(line.strip() for line in js.splitlines() if line.strip())
+
+
+# ================================================================
+#   OPTIMIZER
+# ================================================================
+class HtmlOptimizer:
+    """
+    optimize(html) returns (html, report), where the report gives the bytes
+    before and after and what was changed. Totals are kept for
+    /optimize/stats. With `enabled` off pages pass through untouched.
+    """
+
+    def __init__(self, enabled: bool = True, defer_scripts: bool = True, max_preconnect: int = 3):
+        self.enabled = enabled
+        self.defer_scripts = defer_scripts
+        self.max_preconnect = max_preconnect
+        self.counters = {
+            "pages": 0,
+            "bytes_in": 0,
+            "bytes_out": 0,
+            "duplicates_removed": 0,
+            "scripts_deferred": 0,
+            "preconnects_added": 0,
+        }
+
+    @timed("optimize")
+    def optimize(self, html: str) -> tuple:
+        if not self.enabled:
+            return html, None
+        report = {"duplicates_removed": 0, "scripts_deferred": 0, "preconnects_added": 0}
+        parts = self._split(html)
+
+        # A deferred script runs after every inline classic script, so only
+        # those with no inline classic script after them can be deferred.
+        last_inline = max(
+            (
+                i for i, part in enumerate(parts)
+                if part[0] == "script" and not part[2].get("src") and part[2].get("type", "").lower() in CLASSIC_TYPES
+            ),
+            default=-1,
+        )
+        can_defer = self.defer_scripts and "document.write" not in html
+
+        seen = set()
+        origins = {}
+        out = []
+        for i, part in enumerate(parts):
+            kind = part[0]
+            if kind == "markup":
+                text = self._markup(part[1], seen, origins, report)
+                if out and not out[-1]:
+                    text = text.lstrip()  # after a dropped duplicate script
+                out.append(text)
+            elif kind == "verbatim":
+                out.append(part[1])
+            elif kind == "style":
+                out.append(f"<style{part[1]}>{minify_css(part[3])}</style>")
+            elif kind == "script":
+                out.append(self._script(part, i > last_inline and can_defer, seen, origins, report))
+
+        optimized = self._add_preconnects("".join(out).strip(), origins, report)
+        report["bytes_before"] = len(html.encode("utf-8"))
+        report["bytes_after"] = len(optimized.encode("utf-8"))
+        report["bytes_saved"] = report["bytes_before"] - report["bytes_after"]
+        self._count(report)
+        return optimized, report
+
+    def output_key(self, digest: str) -> str:
+        """
+        Identifies optimize()'s output for the source with SHA-256 `digest`
+        without running it: the digest plus everything that shapes the output
+        (settings, rules version, minifier versions). Used as cache key and ETag.
+        """
+        if not self.enabled:
+            return digest
+        config = (
+            digest, RULES_VERSION, self.defer_scripts, self.max_preconnect,
+            getattr(rcssmin, "__version__", None), getattr(rjsmin, "__version__", None),
+        )
+        return hashlib.sha256(repr(config).encode("utf-8")).hexdigest()
+
+    # ---------------- parsing ----------------
+    def _split(self, html: str) -> list:
+        """[("markup" | "verbatim", text) | ("style" | "script", attr_text, attrs, body)]"""
+        parts = []
+        pos = 0
+        for match in TOKEN.finditer(html):
+            if RAW_OPEN.search(html, pos, match.start()):
+                break  # an unclosed element before this match
+            self._append_markup(parts, html[pos:match.start()])
+            pos = match.end()
+            tag = (match.group(1) or "").lower()
+            if not tag:
+                if match.group().startswith("<!--[if"):
+                    parts.append(("verbatim", match.group()))  # conditional comment
+            elif tag in ("script", "style"):
+                attr_text = match.group(2).rstrip()
+                parts.append((tag, attr_text, _attrs(attr_text), match.group(3)))
+            else:
+                parts.append(("verbatim", match.group()))
+        rest = html[pos:]
+        unclosed = RAW_OPEN.search(rest)
+        if unclosed is None:
+            self._append_markup(parts, rest)
+        else:
+            self._append_markup(parts, rest[:unclosed.start()])
+            parts.append(("verbatim", rest[unclosed.start():]))
+        return parts
+
+    @staticmethod
+    def _append_markup(parts: list, text: str):
+        # markup around a dropped comment is one run of whitespace, not two
+        if parts and parts[-1][0] == "markup":
+            parts[-1] = ("markup", parts[-1][1] + text)
+        else:
+            parts.append(("markup", text))
+
+    # ---------------- parts ----------------
+    def _markup(self, text: str, seen: set, origins: dict, report: dict) -> str:
+        def link(match):
+            attrs = _attrs(match.group()[5:-1])
+            rel = attrs.get("rel", "").lower()
+            href = attrs.get("href", "")
+            if rel in ("preconnect", "dns-prefetch"):
+                origins[_origin(href)] = HINTED
+                return match.group()
+            if not href or not any(r in rel.split() for r in DEDUPED_RELS):
+                return match.group()
+            key = ("link", rel, href)
+            if key in seen:
+                report["duplicates_removed"] += 1
+                return ""
+            seen.add(key)
+            self._note_origin(origins, href, attrs)
+            return match.group()
+
+        return NEWLINE_SPACE.sub("\n", LINK.sub(link, text))
+
+    def _script(self, part: tuple, deferrable: bool, seen: set, origins: dict, report: dict) -> str:
+        _, attr_text, attrs, body = part
+        kind = attrs.get("type", "").lower()
+        src = attrs.get("src")
+        if not src:
+            if kind not in JS_TYPES:
+                return f"<script{attr_text}>{body}</script>"  # JSON, templates, ...
+            for url in FETCH_URL.findall(body):
+                mode = "use-credentials" if CREDENTIALS_INCLUDE.search(body) else "anonymous"
+                self._note_origin(origins, url, {"crossorigin": mode})
+            return f"<script{attr_text}>{minify_js(body)}</script>"
+
+        key = ("script", src, kind)
+        if key in seen:
+            report["duplicates_removed"] += 1
+            return ""
+        seen.add(key)
+        self._note_origin(origins, src, attrs)
+        if deferrable and kind in CLASSIC_TYPES and not {"defer", "async", "nomodule"} & attrs.keys():
+            report["scripts_deferred"] += 1
+            attr_text += " defer"
+        return f"<script{attr_text}>{body}</script>"
+
+    @staticmethod
+    def _note_origin(origins: dict, url: str, attrs: dict):
+        origin = _origin(url)
+        if origin is None or origin in origins:
+            return
+        # The hint has to match the fetch's CORS mode; "" = plain <script>/<link> (no-cors)
+        crossorigin = attrs.get("crossorigin")
+        if crossorigin is None:
+            origins[origin] = ""
+        else:
+            origins[origin] = "use-credentials" if crossorigin.lower() == "use-credentials" else "anonymous"
+
+    def _add_preconnects(self, html: str, origins: dict, report: dict) -> str:
+        wanted = [(origin, mode) for origin, mode in origins.items() if origin and mode is not HINTED][:self.max_preconnect]
+        head = HEAD_OPEN.search(html)
+        if not wanted or head is None:
+            return html
+        # after <meta charset>, which has to stay within the first 1024 bytes
+        head_end = html.lower().find("</head>", head.end())
+        charset = META_CHARSET.search(html, head.end(), head_end if head_end != -1 else len(html))
+        at = charset.end() if charset else head.end()
+        hints = "".join(
+            f'\n<link rel="preconnect" href="{origin}"' + (f' crossorigin="{mode}"' if mode else "") + ">"
+            for origin, mode in wanted
+        )
+        report["preconnects_added"] = len(wanted)
+        return html[:at] + hints + html[at:]
+
+    # ---------------- stats ----------------
+    def _count(self, report: dict):
+        self.counters["pages"] += 1
+        self.counters["bytes_in"] += report["bytes_before"]
+        self.counters["bytes_out"] += report["bytes_after"]
+        for name in ("duplicates_removed", "scripts_deferred", "preconnects_added"):
+            self.counters[name] += report[name]
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "css_minifier": "rcssmin" if rcssmin is not None else "builtin",
+            "js_minifier": "rjsmin" if rjsmin is not None else "whitespace",
+            "bytes_saved": self.counters["bytes_in"] - self.counters["bytes_out"],
+            **self.counters,
+        }
+
+
+def log_optimization(report: Optional[dict], **fields):
+    if report is not None:
+        log("html optimized", **report, **fields)
+
+
+def html_optimizer_from_env() -> HtmlOptimizer:
+    return HtmlOptimizer(
+        enabled=env_bool("HTML_OPTIMIZE", True),
+        defer_scripts=env_bool("HTML_OPTIMIZE_DEFER", True),
+        max_preconnect=env_int("HTML_PRECONNECT_MAX", 3),
+    )
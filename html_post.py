@@ -0,0 +1,280 @@
+import re
+from typing import Optional
+
+from metrics import timed
+
+
+# Tags a generated document can open with; "<b>" in chatter does not count.
+DOC_START = re.compile(r"<(?:!doctype|html|head|meta|title|link|style|script|body|!--)", re.IGNORECASE)
+OPENING_FENCE = re.compile(r"```[^\n]*\n?")
+# A fence at the start of a line closes the document; inline ``` (e.g. in JS) is kept.
+CLOSING_FENCE = re.compile(r"\n[ \t]*```")
+# Skeleton tags, counted as they stream past (the lookahead needs the next char).
+SKELETON_TAG = re.compile(r"<(/?)(html|head|body|script|style)(?=[\s>/])")
+# Raw-text elements: a </html> or fence inside one (e.g. in a JS string) does not end the document.
+RAW_TEXT_OPEN = re.compile(r"<(script|style|textarea)(?=[\s>/])")
+
+HTML_END = "</html>"
+DOCTYPE = "<!doctype"
+DOCTYPE_TAG = "<!DOCTYPE html>\n"
+
+PREAMBLE, DOCUMENT, TRAILER = range(3)
+TAG_TAIL = 16      # chars of emitted text kept so tags split across chunks are still seen
+LONGEST_TAG = len("</textarea")
+REPORT_CHARS = 60  # how much dropped chatter is quoted in a problem
+
+
+def _without_fences(text: str) -> str:
+    return text.replace("```html", "").replace("```", "").strip()
+
+
+def _quote(text: str) -> str:
+    text = " ".join(text.split())
+    return repr(text if len(text) <= REPORT_CHARS else text[:REPORT_CHARS] + "...")
+
+
+# ================================================================
+#   SINGLE-PASS HTML POST-PROCESSOR
+# ================================================================
+class HtmlPostProcessor:
+    """
+    Turns raw model output into the final HTML document while it streams.
+
+    feed(chunk) returns the text that is safe to emit now and flush()
+    returns the rest. Along the way it:
+    - drops chatter and the opening fence before the document's first tag
+    - ends the document at </html> or at a closing ``` line and drops what follows,
+      unless a <script>/<style>/<textarea> is still open
+    - adds <!DOCTYPE html> when it is missing
+    - closes <script>/<style>/<body>/<html> left open by a cut-off completion
+    - strips leading/trailing whitespace
+    Every repair or dropped piece is described in `problems`.
+
+    Each chunk is scanned a constant number of times with C-level
+    find/regex calls, and only a few characters are held back between
+    chunks (a possible partial </html> or fence).
+    """
+
+    def __init__(self):
+        self.problems = []
+        self._state = PREAMBLE
+        self._pending = ""
+        self._scanned = 0     # preamble chars already searched for the document start
+        self._ws = ""         # trailing whitespace held until more text arrives
+        self._tail = ""
+        self._tags = {}
+        self._raw = None      # open <script>/<style>/<textarea>, if any
+        self._ended = False   # cut at the document's own </html>
+        self._trailer = ""
+
+    # ---------------- public ----------------
+    def feed(self, chunk: str) -> str:
+        if self._state == TRAILER:
+            self._note_trailer(chunk)
+            return ""
+        if (
+            self._state == DOCUMENT
+            and not self._pending
+            and "<" not in chunk and "\n" not in chunk and "`" not in chunk
+            and "<" not in self._tail[-LONGEST_TAG:]
+        ):
+            # fast path for most token-sized chunks: nothing here can end the
+            # document or complete a skeleton tag
+            return self._emit(chunk, scan=False)
+        buf, self._pending = self._pending + chunk, ""
+        if self._state == PREAMBLE:
+            return self._preamble(buf, final=False)
+        return self._document(buf)
+
+    def flush(self) -> str:
+        buf, self._pending = self._pending, ""
+        out = ""
+        if self._state == PREAMBLE:
+            out = self._preamble(buf, final=True)
+            if self._state == PREAMBLE:
+                self.problems.append("no HTML document found in the output")
+                return _without_fences(buf)
+            buf, self._pending = self._pending, ""
+
+        if self._state == DOCUMENT:
+            out += self._emit(buf)
+
+        out += self._close_open_tags()
+        self._check_skeleton()
+        trailer = _without_fences(self._trailer)
+        if trailer:
+            self.problems.append(f"dropped trailing text: {_quote(trailer)}")
+        self._ws = ""
+        return out
+
+    # ---------------- states ----------------
+    def _preamble(self, buf: str, final: bool) -> str:
+        start = self._find_start(buf)
+        if start is None or (len(buf) - start < len(DOCTYPE) and not final):
+            self._pending = buf
+            return ""
+
+        leading = _without_fences(buf[:start])
+        if leading:
+            self.problems.append(f"dropped leading text: {_quote(leading)}")
+
+        self._state = DOCUMENT
+        prefix = ""
+        if not buf[start:start + len(DOCTYPE)].lower() == DOCTYPE:
+            self.problems.append("missing <!DOCTYPE html> (added)")
+            prefix = DOCTYPE_TAG
+        return prefix + self._document(buf[start:])
+
+    def _find_start(self, buf: str) -> Optional[int]:
+        """Index of the document's first tag, skipping opening fence lines; None if not seen yet."""
+        pos = self._scanned
+        while True:
+            tag = DOC_START.search(buf, pos)
+            fence = buf.find("```", pos)
+            if fence != -1 and (tag is None or fence < tag.start()):
+                line = OPENING_FENCE.match(buf, fence)
+                if not line.group(0).endswith("\n"):
+                    self._scanned = fence  # fence line not complete yet
+                    return None
+                pos = line.end()
+                continue
+            if tag is None:
+                # a partial "<!DOCT" or "``" at the end may still grow into a match
+                self._scanned = max(pos, len(buf) - len(DOCTYPE))
+                return None
+            self._scanned = tag.start()
+            return tag.start()
+
+    def _document(self, buf: str) -> str:
+        low = buf.lower()
+        pos = 0
+        cut = None
+        while True:
+            if self._raw is not None:
+                close = low.find("</" + self._raw, pos)
+                if close == -1:
+                    break
+                pos = close + len(self._raw) + 2
+                self._raw = None
+                continue
+            opener = RAW_TEXT_OPEN.search(low, pos)
+            end = low.find(HTML_END, pos)
+            fence = CLOSING_FENCE.search(buf, pos)
+            found = []
+            if opener is not None:
+                found.append((opener.start(), "open"))
+            if end != -1:
+                found.append((end, "html"))
+            if fence is not None:
+                found.append((fence.start(), "fence"))
+            if not found:
+                break
+            at, kind = min(found)
+            if kind == "open":
+                self._raw = opener.group(1)
+                pos = opener.end()
+                continue
+            self._ended = kind == "html"
+            cut = at + len(HTML_END) if self._ended else at
+            break
+
+        if cut is not None:
+            self._state = TRAILER
+            self._note_trailer(buf[cut:])
+            return self._emit(buf[:cut])
+
+        # hold back a tag that is still arriving (</html>, <script, </style, ...) or a fence line
+        hold = len(buf)
+        lt = buf.rfind("<", max(0, len(buf) - LONGEST_TAG))
+        if lt != -1 and ">" not in buf[lt:]:
+            hold = lt
+        nl = buf.rfind("\n")
+        if nl != -1 and not buf[nl + 1:].strip(" \t`"):
+            hold = min(hold, nl)
+        self._pending = buf[hold:]
+        return self._emit(buf[:hold])
+
+    # ---------------- helpers ----------------
+    def _emit(self, text: str, scan: bool = True) -> str:
+        if not text:
+            return ""
+        if scan:
+            self._count_tags(text)
+        else:
+            self._tail = (self._tail + text)[-TAG_TAIL:]
+        stripped = text.rstrip()
+        if not stripped:
+            self._ws += text
+            return ""
+        out = self._ws + stripped
+        self._ws = text[len(stripped):]
+        return out
+
+    def _count_tags(self, text: str):
+        window = self._tail + text
+        offset = len(self._tail)
+        for match in SKELETON_TAG.finditer(window.lower()):
+            # tags whose lookahead char was already in the last window were counted then
+            if match.end() >= offset:
+                name = match.group(1) + match.group(2)
+                self._tags[name] = self._tags.get(name, 0) + 1
+        self._tail = window[-TAG_TAIL:]
+
+    def _open(self, tag: str) -> int:
+        return self._tags.get(tag, 0) - self._tags.get("/" + tag, 0)
+
+    def _close_open_tags(self) -> str:
+        if self._ended:
+            return ""
+        # the tag counts include tags written inside scripts; the raw-text state does not
+        closers = [f"</{self._raw}>"] if self._raw is not None else []
+        if self._open("body") > 0:
+            closers.append("</body>")
+        closers.append("</html>")
+        self.problems.append(f"document ended without </html> (added {''.join(closers)})")
+        return "\n" + "\n".join(closers)
+
+    def _check_skeleton(self):
+        for tag in ("html", "head", "body"):
+            if not self._tags.get(tag):
+                self.problems.append(f"missing <{tag}>")
+
+    def _note_trailer(self, text: str):
+        if len(self._trailer) < 4 * REPORT_CHARS:
+            self._trailer += text[:4 * REPORT_CHARS]
+
+
+@timed("postprocess")
+def postprocess_html(raw_output: str) -> tuple:
+    """One-shot form: (html, problems)."""
+    processor = HtmlPostProcessor()
+    html = processor.feed(raw_output) + processor.flush()
+    return html, processor.problems
+
+
+def clean_html(raw_output: str) -> str:
+    return postprocess_html(raw_output)[0]
+
+
+def without_raw_text(html: str) -> str:
+    """
+    `html` with the contents of <script>/<style>/<textarea> removed (the tags
+    stay), so markup built in JS strings or CSS is not counted as structure.
+    An element left open drops everything after its opening tag.
+    """
+    low = html.lower()
+    kept = []
+    pos = 0
+    while True:
+        opener = RAW_TEXT_OPEN.search(low, pos)
+        if opener is None:
+            break
+        body = low.find(">", opener.end())
+        if body == -1:
+            break
+        kept.append(html[pos:body + 1])
+        pos = low.find("</" + opener.group(1), body)
+        if pos == -1:
+            return "".join(kept)
+    kept.append(html[pos:])
+    return "".join(kept)
@@ -0,0 +1,95 @@
+import os
+
+import httpx
+
+
+# ================================================================
+#   ENV HELPERS
+# ================================================================
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# ================================================================
+#   SHARED ASYNC HTTP CLIENT
+# ================================================================
+def build_http_client(**overrides) -> httpx.AsyncClient:
+    """
+    Builds the application-lifetime client. Create it once at startup
+    and close it at shutdown so every call reuses pooled keep-alive
+    connections instead of paying a new TCP+TLS handshake.
+    """
+    limits = httpx.Limits(
+        max_connections=env_int("HTTP_MAX_CONNECTIONS", 100),
+        max_keepalive_connections=env_int("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20),
+        keepalive_expiry=env_float("HTTP_KEEPALIVE_EXPIRY", 30.0),
+    )
+    # LLM completions are slow to produce, so the read timeout is generous.
+    timeout = httpx.Timeout(
+        connect=env_float("HTTP_CONNECT_TIMEOUT", 10.0),
+        read=env_float("HTTP_READ_TIMEOUT", 120.0),
+        write=env_float("HTTP_WRITE_TIMEOUT", 30.0),
+        pool=env_float("HTTP_POOL_TIMEOUT", 10.0),
+    )
+
+    http2 = env_bool("HTTP2", True)
+    if http2:
+        try:
+            import h2  # noqa: F401  (httpx needs the h2 package for HTTP/2)
+        except ImportError:
+            http2 = False
+
+    options = {"limits": limits, "timeout": timeout, "http2": http2}
+    options.update(overrides)
+    return httpx.AsyncClient(**options)
+
+
+def pool_stats(client: httpx.AsyncClient) -> dict:
+    """
+    Snapshot of the connection pool. httpx does not expose this publicly,
+    so we read it from the underlying httpcore pool when it is available.
+    """
+    stats = {
+        "http2_enabled": False,
+        "connections": 0,
+        "active": 0,
+        "idle": 0,
+        "http2_connections": 0,
+        "queued_requests": 0,
+        "max_connections": None,
+        "max_keepalive_connections": None,
+        "closed": client.is_closed,
+    }
+
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    if pool is None:
+        return stats
+
+    stats["http2_enabled"] = bool(getattr(pool, "_http2", False))
+    stats["max_connections"] = getattr(pool, "_max_connections", None)
+    stats["max_keepalive_connections"] = getattr(pool, "_max_keepalive_connections", None)
+    stats["queued_requests"] = len(getattr(pool, "_requests", []))
+
+    for conn in list(getattr(pool, "connections", [])):
+        stats["connections"] += 1
+        if conn.is_idle():
+            stats["idle"] += 1
+        else:
+            stats["active"] += 1
+        if "HTTP/2" in conn.info():
+            stats["http2_connections"] += 1
+
+    return stats
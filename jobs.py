@@ -0,0 +1,332 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from http_pool import env_float, env_int
+from metrics import log
+from sqlite_db import connect, write
+
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+# Seconds between store reads while long-polling a job this process does not run.
+WAIT_POLL_SECONDS = 0.5
+
+
+def new_job(kind: str, params: dict) -> dict:
+    return {
+        "id": uuid.uuid4().hex,
+        "kind": kind,
+        "status": QUEUED,
+        "params": params,
+        "result": None,
+        "error": None,
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+    }
+
+
+# ================================================================
+#   JOB STORES
+# ================================================================
+class MemoryJobStore:
+    """Default store. Finished jobs are dropped after `retention` seconds."""
+
+    def __init__(self, retention: float = 3600):
+        self.retention = retention
+        self._jobs = OrderedDict()
+
+    async def create(self, job: dict):
+        self._purge()
+        self._jobs[job["id"]] = job
+
+    async def update(self, job_id: str, **fields):
+        self._jobs[job_id].update(fields)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    def unfinished(self, limit: int) -> list:
+        return [dict(job) for job in self._jobs.values() if job["status"] not in FINISHED][:limit]
+
+    async def claim(self, job_id: str) -> bool:
+        job = self._jobs.get(job_id)
+        if job is None or job["status"] != QUEUED:
+            return False
+        job.update(status=RUNNING, started_at=time.time())
+        return True
+
+    async def requeue_stale(self, job_id: str, started_before: float) -> bool:
+        job = self._jobs.get(job_id)
+        if job is None or job["status"] != RUNNING or (job["started_at"] or 0) >= started_before:
+            return False
+        job.update(status=QUEUED, started_at=None)
+        return True
+
+    def _purge(self):
+        cutoff = time.time() - self.retention
+        for job_id in [j["id"] for j in self._jobs.values() if j["finished_at"] and j["finished_at"] < cutoff]:
+            del self._jobs[job_id]
+
+
+class SQLiteJobStore:
+    """Persists jobs in a SQLite file so results survive restarts; writes never block the event loop (sqlite_db.py)."""
+
+    COLUMNS = ("id", "kind", "status", "params", "result", "error", "created_at", "started_at", "finished_at")
+    JSON_COLUMNS = ("params", "result")
+
+    def __init__(self, path: str, retention: float = 7 * 24 * 3600):
+        self.retention = retention
+        self._db = connect(
+            path,
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, kind TEXT, status TEXT, params TEXT, result TEXT,"
+            " error TEXT, created_at REAL, started_at REAL, finished_at REAL)",
+        )
+
+    async def create(self, job: dict):
+        cutoff = time.time() - self.retention
+        values = [self._encode(col, job[col]) for col in self.COLUMNS]
+
+        def insert():
+            self._db.execute("DELETE FROM jobs WHERE finished_at < ?", (cutoff,))
+            self._db.execute(
+                f"INSERT INTO jobs ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})", values
+            )
+
+        await write(self._db, insert)
+
+    async def update(self, job_id: str, **fields):
+        assignments = ", ".join(f"{col} = ?" for col in fields)
+        values = [self._encode(col, value) for col, value in fields.items()]
+        await write(self._db, lambda: self._db.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*values, job_id)))
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self._db.execute(
+            f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return self._decode(row) if row else None
+
+    def unfinished(self, limit: int) -> list:
+        rows = self._db.execute(
+            f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE status IN (?, ?) ORDER BY created_at LIMIT ?",
+            (QUEUED, RUNNING, limit),
+        ).fetchall()
+        return [self._decode(row) for row in rows]
+
+    async def claim(self, job_id: str) -> bool:
+        """queued -> running in one statement, so two workers sharing the file never both run a job."""
+        cursor = await write(self._db, lambda: self._db.execute(
+            "UPDATE jobs SET status = ?, started_at = ? WHERE id = ? AND status = ?",
+            (RUNNING, time.time(), job_id, QUEUED),
+        ))
+        return cursor.rowcount == 1
+
+    async def requeue_stale(self, job_id: str, started_before: float) -> bool:
+        cursor = await write(self._db, lambda: self._db.execute(
+            "UPDATE jobs SET status = ?, started_at = NULL WHERE id = ? AND status = ? AND started_at < ?",
+            (QUEUED, job_id, RUNNING, started_before),
+        ))
+        return cursor.rowcount == 1
+
+    def _encode(self, column: str, value):
+        return json.dumps(value) if column in self.JSON_COLUMNS and value is not None else value
+
+    def _decode(self, row) -> dict:
+        job = dict(zip(self.COLUMNS, row))
+        for column in self.JSON_COLUMNS:
+            if job[column] is not None:
+                job[column] = json.loads(job[column])
+        return job
+
+
+# ================================================================
+#   BOUNDED WORKER POOL
+# ================================================================
+class QueueFull(Exception):
+    pass
+
+
+class JobQueue:
+    """
+    Runs submitted jobs on `concurrency` worker tasks. Clients poll
+    `store.get(job_id)` or long-poll with `wait(job_id, timeout)`.
+
+    Unfinished jobs in the store (from a previous process, or another
+    worker sharing JOB_DB_PATH) are resumed at start, no more than the
+    queue has room for; the rest stay queued rows that workers pull in
+    once the queue drains. Running jobs are only taken over once they
+    have been running for `stale_seconds`, and every run starts with an
+    atomic queued -> running claim, so no job runs twice at once.
+    """
+
+    def __init__(
+        self,
+        store,
+        handler: Callable[[dict], Awaitable[dict]],
+        concurrency: int = 4,
+        max_queue: int = 1000,
+        stale_seconds: float = 600,
+    ):
+        self.store = store
+        self.handler = handler
+        self.concurrency = concurrency
+        self.stale_seconds = stale_seconds
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._events = {}  # job id -> set when its run here ends; only jobs queued in this process
+        self._pending = set()   # job ids in this process's queue or running here
+        self._backlog = False   # the store had more unfinished jobs than fit in the queue
+        self._resuming = False
+        self._workers = []
+        self.counters = {"resumed": 0, "reclaimed": 0, "claim_conflicts": 0}
+
+    async def start(self):
+        await self._resume()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def _resume(self):
+        free = self._queue.maxsize - self._queue.qsize()
+        if free <= 0 or self._resuming:
+            return
+        self._resuming = True  # one pass at a time; workers may ask while requeue_stale() waits
+        try:
+            stale_before = time.time() - self.stale_seconds
+            # one row more than could be used tells whether any are left in the store
+            limit = free + len(self._pending) + 1
+            rows = self.store.unfinished(limit)
+            full = False
+            for job in rows:
+                if job["id"] in self._pending:
+                    continue
+                if job["status"] == RUNNING:
+                    if not await self.store.requeue_stale(job["id"], stale_before):
+                        continue  # still running elsewhere, or not stale yet
+                    self.counters["reclaimed"] += 1
+                # submit() may have filled the queue while this pass was writing; the row stays queued
+                full = self._queue.full()
+                if full:
+                    break
+                self._enqueue(job["id"])
+                self.counters["resumed"] += 1
+            self._backlog = full or len(rows) == limit
+        finally:
+            self._resuming = False
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(self, kind: str, params: dict) -> dict:
+        if self._queue.full():
+            raise QueueFull("Job queue is full, try again later")
+        job = new_job(kind, params)
+        await self.store.create(job)
+        if self._queue.full():
+            # Filled up while the row was written: a worker pulls it from the store once there is room.
+            self._backlog = True
+        else:
+            self._enqueue(job["id"])
+        return job
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[dict]:
+        """
+        The job once it finishes, or as it is after `timeout` seconds. Jobs
+        queued here wake the caller when they finish; jobs run by another
+        worker sharing the store are re-read every WAIT_POLL_SECONDS.
+        """
+        job = self.store.get(job_id)
+        deadline = time.monotonic() + timeout
+        while job is not None and job["status"] not in FINISHED:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            event = self._events.get(job_id)
+            if event is not None:
+                try:
+                    await asyncio.wait_for(event.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep(min(WAIT_POLL_SECONDS, remaining))
+            job = self.store.get(job_id)
+        return job
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "max_queue": self._queue.maxsize,
+            "concurrency": self.concurrency,
+            "workers": len(self._workers),
+            "backlog": self._backlog,
+            **self.counters,
+        }
+
+    def _enqueue(self, job_id: str):
+        self._events.setdefault(job_id, asyncio.Event())
+        self._pending.add(job_id)
+        self._queue.put_nowait(job_id)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            finally:
+                self._pending.discard(job_id)
+                self._queue.task_done()
+            if self._backlog and self._queue.empty():
+                await self._resume()
+
+    async def _run(self, job_id: str):
+        try:
+            if not await self.store.claim(job_id):
+                # finished, gone, or already claimed by another worker sharing the store;
+                # waiters fall back to polling it
+                self.counters["claim_conflicts"] += 1
+                return
+            job = self.store.get(job_id)
+            try:
+                result = await self.handler(job)
+                await self.store.update(job_id, status=SUCCEEDED, result=result, finished_at=time.time())
+            except asyncio.CancelledError:
+                # Shutting down: leave it queued so the next start() resumes it.
+                await self.store.update(job_id, status=QUEUED, started_at=None)
+                raise
+            except Exception as e:
+                detail = getattr(e, "detail", None) or str(e)
+                log("Job failed", level="error", job_id=job_id, error=detail)
+                await self.store.update(job_id, status=FAILED, error=detail, finished_at=time.time())
+        finally:
+            event = self._events.pop(job_id, None)
+            if event is not None:
+                event.set()
+
+
+def job_store_from_env():
+    db_path = os.getenv("JOB_DB_PATH")
+    retention = env_float("JOB_RETENTION_SECONDS", 24 * 3600)
+    if db_path:
+        return SQLiteJobStore(db_path, retention=retention)
+    return MemoryJobStore(retention=retention)
+
+
+def job_queue_from_env(handler) -> JobQueue:
+    return JobQueue(
+        job_store_from_env(),
+        handler,
+        concurrency=env_int("JOB_CONCURRENCY", 4),
+        max_queue=env_int("JOB_QUEUE_MAX", 1000),
+        stale_seconds=env_float("JOB_STALE_SECONDS", 600),
+    )
@@ -0,0 +1,262 @@
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Optional
+
+from fastapi import Request
+
+from http_pool import env_bool, env_float, env_int
+from sqlite_db import StateBusy, connect, transaction
+
+
+# ================================================================
+#   CACHE KEY
+# ================================================================
+def make_cache_key(model: str, messages: list, temperature: Optional[float] = None, max_tokens: Optional[int] = None) -> str:
+    """
+    Content-addressed key: sha256 over (model, messages, temperature,
+    max_tokens). For generation the messages are the build_system_prompt
+    output plus the user message, so any prompt change yields a new key.
+    """
+    params = {"model": model, "messages": messages, "temperature": temperature}
+    if max_tokens is not None:
+        params["max_tokens"] = max_tokens  # absent otherwise, so older keys stay valid
+    raw = json.dumps(
+        params,
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def cache_bypassed(request: Request, body: dict) -> bool:
+    """Per-request opt out: {"cache": false} or a Cache-Control: no-cache header."""
+    if body.get("cache") is False:
+        return True
+    cache_control = request.headers.get("cache-control", "").lower()
+    return "no-cache" in cache_control or "no-store" in cache_control
+
+
+# ================================================================
+#   RESPONSE CACHE (MEMORY LRU + OPTIONAL SQLITE)
+# ================================================================
+SHARED_PREFIX = "llm_cache:"
+
+
+class ResponseCache:
+    """
+    Tiered cache for completion text.
+
+    - memory: LRU bounded by entry count and total bytes, with a TTL
+    - disk (optional): SQLite file, bounded by entry count, same TTL;
+      a write is skipped rather than waited for while another worker
+      holds the file's lock (sqlite_db.py)
+    - shared (optional): a cross-process SharedState (shared_state.py), so
+      a completion paid for by one worker is a hit in the others
+
+    Disk and shared hits are promoted back into memory.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        max_bytes: int = 32 * 1024 * 1024,
+        ttl: float = 24 * 3600,
+        db_path: Optional[str] = None,
+        disk_max_entries: int = 10000,
+        enabled: bool = True,
+        shared=None,
+    ):
+        self.enabled = enabled
+        self.shared = shared
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_max_entries = disk_max_entries
+
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._bytes = 0
+        self.counters = {
+            "hits": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "shared_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "disk_evictions": 0,
+            "disk_busy": 0,
+        }
+
+        self._db = None
+        if db_path:
+            # several workers may open the same file
+            self._db = connect(
+                db_path,
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " expires_at REAL NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS llm_cache_created ON llm_cache (created_at);",
+            )
+
+    # ---------------- public API ----------------
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                self.counters["memory_hits"] += 1
+                return value
+            self._drop(key)
+            self.counters["expirations"] += 1
+
+        value = self._disk_get(key, now)
+        if value is not None:
+            self._memory_set(key, value, now)
+            self.counters["hits"] += 1
+            self.counters["disk_hits"] += 1
+            return value
+
+        value = self.shared.get(SHARED_PREFIX + key) if self.shared is not None else None
+        if value is not None:
+            self._memory_set(key, value, now)
+            self.counters["hits"] += 1
+            self.counters["shared_hits"] += 1
+            return value
+
+        self.counters["misses"] += 1
+        return None
+
+    def set(self, key: str, value: str):
+        if not self.enabled or not value:
+            return
+        now = time.time()
+        self._memory_set(key, value, now)
+        self._disk_set(key, value, now)
+        if self.shared is not None:
+            self.shared.set(SHARED_PREFIX + key, value, self.ttl)
+        self.counters["sets"] += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+        if self._db is not None:
+            transaction(self._db, lambda: self._db.execute("DELETE FROM llm_cache"))
+
+    def stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        stats = {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+            **self.counters,
+        }
+        if self._db is not None:
+            stats["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        return stats
+
+    # ---------------- memory tier ----------------
+    def _memory_set(self, key: str, value: str, now: float):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (now + self.ttl, value)
+        self._bytes += size
+
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.counters["evictions"] += 1
+
+    def _drop(self, key: str):
+        _, value = self._entries.pop(key)
+        self._bytes -= len(value.encode("utf-8"))
+
+    # ---------------- disk tier ----------------
+    def _disk_get(self, key: str, now: float) -> Optional[str]:
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at <= now:
+            # removed by the next _disk_set(); reads never write
+            self.counters["expirations"] += 1
+            return None
+        return value
+
+    def _disk_set(self, key: str, value: str, now: float):
+        if self._db is None:
+            return
+
+        def insert() -> int:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now + self.ttl),
+            )
+            self._db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+            overflow = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.disk_max_entries
+            if overflow > 0:
+                self._db.execute(
+                    "DELETE FROM llm_cache WHERE key IN "
+                    "(SELECT key FROM llm_cache ORDER BY created_at LIMIT ?)",
+                    (overflow,),
+                )
+            return max(overflow, 0)
+
+        try:
+            self.counters["disk_evictions"] += transaction(self._db, insert)
+        except StateBusy:
+            # the memory tier has it; only other workers and restarts miss out
+            self.counters["disk_busy"] += 1
+
+
+def cache_from_env(shared=None) -> ResponseCache:
+    return ResponseCache(
+        enabled=env_bool("CACHE_ENABLED", True),
+        max_entries=env_int("CACHE_MAX_ENTRIES", 256),
+        max_bytes=env_int("CACHE_MAX_BYTES", 32 * 1024 * 1024),
+        ttl=env_float("CACHE_TTL_SECONDS", 24 * 3600),
+        db_path=os.getenv("CACHE_DB_PATH") or None,
+        disk_max_entries=env_int("CACHE_DISK_MAX_ENTRIES", 10000),
+        # an in-process SharedState would only duplicate the memory tier
+        shared=shared if shared is not None and shared.cross_process else None,
+    )
+
+
+# ================================================================
+#   STREAMING HELPERS
+# ================================================================
+async def replay_cached(text: str) -> AsyncIterator[str]:
+    """Feeds a cached completion through the streaming path as one chunk."""
+    yield text
+
+
+async def tee_to_cache(cache: ResponseCache, key: str, chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Passes chunks through and caches the full text once the stream completes."""
+    parts = []
+    async for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    cache.set(key, "".join(parts))
@@ -0,0 +1,309 @@
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from http_pool import env_float, env_int
+from metrics import record_phase
+
+
+class LimiterTimeout(Exception):
+    """Raised when a caller could not get an upstream slot before its deadline."""
+
+
+# ================================================================
+#   HELPERS
+# ================================================================
+def estimate_tokens(messages: list, expected_output: int) -> int:
+    """Cheap pre-flight estimate (~4 chars per token) used to charge the TPM bucket."""
+    chars = sum(len(str(msg.get("content", ""))) for msg in messages)
+    return chars // 4 + expected_output
+
+
+def upstream_status(error: BaseException) -> Optional[int]:
+    """HTTP status of an openai / httpx error, if it carries one."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def error_status(error: BaseException) -> int:
+    """Status to surface to our client: 503 for queue timeouts, 429 passed through, else 500."""
+    if isinstance(error, LimiterTimeout):
+        return 503
+    if upstream_status(error) == 429:
+        return 429
+    return 500
+
+
+class TokenBucket:
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay_for(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available (0 if it is now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+    def give_back(self, amount: float):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+# ================================================================
+#   SLOT (ONE ADMITTED UPSTREAM CALL)
+# ================================================================
+class Slot:
+    def __init__(self, limiter: "UpstreamLimiter", tokens: int):
+        self.limiter = limiter
+        self.tokens = tokens
+        self.started = time.monotonic()
+        self.released = False
+        self.usage_tokens = None
+
+    def record_usage(self, total_tokens: Optional[int]):
+        """Actual usage from the completion; the TPM bucket is corrected on release."""
+        self.usage_tokens = total_tokens
+
+    def release(self, error: Optional[BaseException] = None):
+        if not self.released:
+            self.released = True
+            self.limiter._release(self, error)
+
+    async def wrap(self, chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+        """Holds the slot until a streamed completion finishes."""
+        try:
+            async for chunk in chunks:
+                yield chunk
+        except BaseException as e:
+            self.release(e)
+            raise
+        finally:
+            self.release()
+
+
+# ================================================================
+#   ADAPTIVE UPSTREAM LIMITER
+# ================================================================
+class UpstreamLimiter:
+    """
+    Shared gate for outbound LLM calls.
+
+    - requests-per-minute and tokens-per-minute token buckets (0 = off)
+    - max in-flight calls, adapted AIMD-style: +1 per window of successes,
+      halved on upstream 429, cut by 20% on latency spikes
+    - callers queue FIFO and give up with LimiterTimeout after `queue_timeout`
+
+    With a cross-process `shared` state (shared_state.py) the RPM/TPM
+    buckets live there, so every worker spends from the same budget. The
+    in-flight limit stays per worker: it adapts to latency this worker sees.
+    """
+
+    def __init__(
+        self,
+        rpm: int = 0,
+        tpm: int = 0,
+        max_in_flight: int = 16,
+        min_in_flight: int = 1,
+        queue_timeout: float = 30.0,
+        expected_output_tokens: int = 3000,
+        latency_spike_factor: float = 3.0,
+        shared=None,
+    ):
+        self.rpm = TokenBucket(rpm) if rpm > 0 else None
+        self.tpm = TokenBucket(tpm) if tpm > 0 else None
+        self.rpm_per_minute = rpm
+        self.tpm_per_minute = tpm
+        self.shared = shared
+        self.max_in_flight = max_in_flight
+        self.min_in_flight = min_in_flight
+        self.queue_timeout = queue_timeout
+        self.expected_output_tokens = expected_output_tokens
+        self.latency_spike_factor = latency_spike_factor
+
+        self.limit = float(max_in_flight)
+        self.in_flight = 0
+        self.queued = 0
+        self.latency_ewma = None
+        self._samples = 0
+
+        self._lock = asyncio.Lock()      # FIFO: only the head waiter polls the gates
+        self._released = asyncio.Event()
+
+        self.counters = {
+            "admitted": 0,
+            "timeouts": 0,
+            "throttled": 0,
+            "latency_spikes": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+    # ---------------- admission ----------------
+    def estimate(self, messages: list, max_tokens: Optional[int] = None) -> int:
+        expected = self.expected_output_tokens if max_tokens is None else min(max_tokens, self.expected_output_tokens)
+        return estimate_tokens(messages, expected)
+
+    async def acquire(self, tokens: int, timeout: Optional[float] = None) -> Slot:
+        deadline = time.monotonic() + (self.queue_timeout if timeout is None else timeout)
+        start = time.monotonic()
+        self.queued += 1
+        try:
+            remaining = deadline - time.monotonic()
+            try:
+                await asyncio.wait_for(self._lock.acquire(), remaining)
+            except asyncio.TimeoutError:
+                raise self._timeout()
+
+            try:
+                while True:
+                    delay = self._try_admit(tokens)
+                    if delay == 0:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise self._timeout()
+                    self._released.clear()
+                    try:
+                        # wake on a released slot or when the buckets refill
+                        await asyncio.wait_for(self._released.wait(), min(delay, remaining))
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                self._lock.release()
+        finally:
+            self.queued -= 1
+
+        waited = time.monotonic() - start
+        self.counters["admitted"] += 1
+        self.counters["wait_seconds_total"] += waited
+        self.counters["wait_seconds_max"] = max(self.counters["wait_seconds_max"], waited)
+        record_phase("queue_wait", waited)
+        return Slot(self, tokens)
+
+    @asynccontextmanager
+    async def slot(self, tokens: int, timeout: Optional[float] = None):
+        slot = await self.acquire(tokens, timeout)
+        try:
+            yield slot
+        except BaseException as e:
+            slot.release(e)
+            raise
+        finally:
+            slot.release()
+
+    def _try_admit(self, tokens: int) -> float:
+        """0 if admitted, else how long to wait before trying again."""
+        if self.in_flight >= self.current_limit:
+            return self.queue_timeout  # woken early by _released
+        if self.shared is not None:
+            return self._try_admit_shared(tokens)
+        now = time.monotonic()
+        delay = max(
+            self.rpm.delay_for(1, now) if self.rpm else 0.0,
+            self.tpm.delay_for(tokens, now) if self.tpm else 0.0,
+        )
+        if delay > 0:
+            return delay
+        if self.rpm:
+            self.rpm.take(1)
+        if self.tpm:
+            self.tpm.take(tokens)
+        self.in_flight += 1
+        return 0
+
+    def _try_admit_shared(self, tokens: int) -> float:
+        # Both buckets are charged in one transaction, or neither is.
+        wanted = {}
+        if self.rpm:
+            wanted["llm_rpm"] = (1, self.rpm_per_minute)
+        if self.tpm:
+            wanted["llm_tpm"] = (tokens, self.tpm_per_minute)
+        delay = self.shared.take_tokens(wanted) if wanted else 0.0
+        if delay > 0:
+            return delay
+        self.in_flight += 1
+        return 0
+
+    def _timeout(self) -> LimiterTimeout:
+        self.counters["timeouts"] += 1
+        return LimiterTimeout("Upstream LLM is busy, please retry shortly")
+
+    # ---------------- feedback ----------------
+    def _release(self, slot: Slot, error: Optional[BaseException]):
+        self.in_flight -= 1
+        self._released.set()
+
+        if self.tpm and slot.usage_tokens is not None and slot.usage_tokens < slot.tokens:
+            if self.shared is not None:
+                self.shared.give_back("llm_tpm", slot.tokens - slot.usage_tokens, self.tpm_per_minute)
+            else:
+                self.tpm.give_back(slot.tokens - slot.usage_tokens)
+
+        if error is not None:
+            if upstream_status(error) == 429:
+                self.counters["throttled"] += 1
+                self.limit = max(self.min_in_flight, self.limit / 2)
+            return
+
+        latency = time.monotonic() - slot.started
+        if self.latency_ewma is not None and self._samples >= 10 and latency > self.latency_ewma * self.latency_spike_factor:
+            self.counters["latency_spikes"] += 1
+            self.limit = max(self.min_in_flight, self.limit * 0.8)
+        else:
+            self.limit = min(self.max_in_flight, self.limit + 1 / max(self.limit, 1))
+        self.latency_ewma = latency if self.latency_ewma is None else 0.9 * self.latency_ewma + 0.1 * latency
+        self._samples += 1
+
+    @property
+    def current_limit(self) -> int:
+        return max(self.min_in_flight, math.floor(self.limit))
+
+    def _available(self, bucket: Optional[TokenBucket], name: str, per_minute: int) -> Optional[float]:
+        if bucket is None:
+            return None
+        if self.shared is not None:
+            return round(self.shared.available(name, per_minute), 1)
+        return round(bucket.tokens, 1)
+
+    def stats(self) -> dict:
+        admitted = self.counters["admitted"]
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.queued,
+            "limit": self.current_limit,
+            "max_in_flight": self.max_in_flight,
+            "latency_ewma_seconds": round(self.latency_ewma, 4) if self.latency_ewma is not None else None,
+            "wait_seconds_avg": round(self.counters["wait_seconds_total"] / admitted, 4) if admitted else 0.0,
+            "rpm_available": self._available(self.rpm, "llm_rpm", self.rpm_per_minute),
+            "tpm_available": self._available(self.tpm, "llm_tpm", self.tpm_per_minute),
+            "shared_buckets": self.shared is not None,
+            **self.counters,
+        }
+
+
+def limiter_from_env(shared=None) -> UpstreamLimiter:
+    # Buckets move to `shared` only when other workers can see it
+    return UpstreamLimiter(
+        rpm=env_int("LLM_RPM", 0),
+        tpm=env_int("LLM_TPM", 0),
+        max_in_flight=env_int("LLM_MAX_IN_FLIGHT", 16),
+        min_in_flight=env_int("LLM_MIN_IN_FLIGHT", 1),
+        queue_timeout=env_float("LLM_QUEUE_TIMEOUT", 30.0),
+        expected_output_tokens=env_int("LLM_EXPECTED_OUTPUT_TOKENS", 3000),
+        latency_spike_factor=env_float("LLM_LATENCY_SPIKE_FACTOR", 3.0),
+        shared=shared if shared is not None and shared.cross_process else None,
+    )
@@ -0,0 +1,196 @@
+import asyncio
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+from http_pool import env_bool, env_float, env_int
+from llm_limiter import upstream_status
+from metrics import log
+
+
+RETRYABLE_STATUSES = (408, 429)
+
+
+# ================================================================
+#   ERROR CLASSIFICATION
+# ================================================================
+def is_retryable(error: BaseException) -> bool:
+    """429, 5xx, timeouts and connection errors are worth another attempt."""
+    status = upstream_status(error)
+    if status is not None:
+        return status in RETRYABLE_STATUSES or status >= 500
+    if isinstance(error, (httpx.TimeoutException, httpx.TransportError, asyncio.TimeoutError)):
+        return True
+    # openai.APITimeoutError / APIConnectionError carry no status code
+    return type(error).__name__ in ("APITimeoutError", "APIConnectionError")
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds the upstream asked us to wait (Retry-After / retry-after-ms), if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    retry_ms = headers.get("retry-after-ms")
+    if retry_ms:
+        try:
+            return float(retry_ms) / 1000
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+
+# ================================================================
+#   LATENCY TRACKING (FOR HEDGE DELAY)
+# ================================================================
+class LatencyTracker:
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def __len__(self):
+        return len(self._samples)
+
+
+# ================================================================
+#   RETRY + HEDGE POLICY
+# ================================================================
+class RetryPolicy:
+    """
+    Retries retryable failures with full-jitter exponential backoff,
+    honoring Retry-After. With hedging on, a second identical request is
+    sent if the first has not finished after the observed p95 latency, and
+    whichever finishes first wins (the other is cancelled).
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 2,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+        hedge: bool = False,
+        hedge_percentile: float = 95.0,
+        hedge_min_delay: float = 2.0,
+        hedge_min_samples: int = 20,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+
+        self.latency = LatencyTracker()
+        self.counters = {"attempts": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "gave_up": 0}
+
+    async def run(self, fn: Callable[[], Awaitable], hedge: Optional[bool] = None):
+        hedge = self.hedge if hedge is None else hedge
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await (self._hedged(fn) if hedge else self._timed(fn))
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    if attempt:
+                        self.counters["gave_up"] += 1
+                    raise
+                delay = self.backoff(attempt, e)
+                log("Upstream call failed, retrying", level="warning", error=repr(e), retry=attempt + 1, delay=round(delay, 2))
+                self.counters["retries"] += 1
+                await asyncio.sleep(delay)
+
+    def backoff(self, attempt: int, error: Optional[BaseException] = None) -> float:
+        hinted = retry_after(error) if error is not None else None
+        if hinted is not None:
+            return min(hinted, self.max_delay)
+        return random.uniform(0, min(self.base_delay * (2 ** attempt), self.max_delay))
+
+    def hedge_delay(self) -> Optional[float]:
+        if len(self.latency) < self.hedge_min_samples:
+            return None
+        return max(self.latency.percentile(self.hedge_percentile), self.hedge_min_delay)
+
+    async def _timed(self, fn: Callable[[], Awaitable]):
+        self.counters["attempts"] += 1
+        start = time.monotonic()
+        result = await fn()
+        self.latency.record(time.monotonic() - start)
+        return result
+
+    async def _hedged(self, fn: Callable[[], Awaitable]):
+        delay = self.hedge_delay()
+        if delay is None:
+            return await self._timed(fn)
+
+        primary = asyncio.ensure_future(self._timed(fn))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                return primary.result()
+
+            self.counters["hedges"] += 1
+            hedge = asyncio.ensure_future(self._timed(fn))
+            tasks.append(hedge)
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.counters["hedge_wins"] += 1
+                        return task.result()
+            # both failed: surface the primary's error
+            return primary.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> dict:
+        p50 = self.latency.percentile(50)
+        p95 = self.latency.percentile(95)
+        return {
+            "max_retries": self.max_retries,
+            "hedging": self.hedge,
+            "hedge_delay_seconds": self.hedge_delay(),
+            "latency_p50_seconds": round(p50, 4) if p50 is not None else None,
+            "latency_p95_seconds": round(p95, 4) if p95 is not None else None,
+            **self.counters,
+        }
+
+
+def retry_policy_from_env() -> RetryPolicy:
+    return RetryPolicy(
+        max_retries=env_int("LLM_MAX_RETRIES", 2),
+        base_delay=env_float("LLM_RETRY_BASE_DELAY", 0.5),
+        max_delay=env_float("LLM_RETRY_MAX_DELAY", 20.0),
+        hedge=env_bool("LLM_HEDGE", False),
+        hedge_percentile=env_float("LLM_HEDGE_PERCENTILE", 95.0),
+        hedge_min_delay=env_float("LLM_HEDGE_MIN_DELAY", 2.0),
+        hedge_min_samples=env_int("LLM_HEDGE_MIN_SAMPLES", 20),
+    )
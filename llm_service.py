@@ -0,0 +1,233 @@
+import os
+import time
+from typing import Optional
+
+import httpx
+from fastapi import HTTPException
+
+from http_pool import env_float
+from llm_cache import cache_from_env, make_cache_key, replay_cached, tee_to_cache
+from llm_limiter import error_status, limiter_from_env
+from llm_retry import retry_policy_from_env
+from llm_usage import UsageTracker
+from metrics import record_phase, register_stats, set_model, timed_stream
+from shared_state import lease
+from singleflight import SingleFlight
+from streaming import openai_deltas
+
+
+DEFAULT_MODEL = "gpt-4o-mini"
+CHAT_COMPLETIONS_PATH = "/chat/completions"
+
+
+def llm_endpoint_from_env() -> tuple:
+    """
+    (base_url, api_key) for the OpenAI-compatible upstream. LLMFOUNDRY_API_*
+    wins; main.py's API_ENDPOINT (a full .../chat/completions URL) also works.
+    """
+    endpoint = os.getenv("LLMFOUNDRY_API_ENDPOINT") or os.getenv("API_ENDPOINT")
+    api_key = os.getenv("LLMFOUNDRY_API_KEY") or os.getenv("API_KEY")
+    if endpoint:
+        endpoint = endpoint.rstrip("/")
+        if endpoint.endswith(CHAT_COMPLETIONS_PATH):
+            endpoint = endpoint[: -len(CHAT_COMPLETIONS_PATH)]
+    return endpoint, api_key
+
+
+# ================================================================
+#   LLM SERVICE (ONE CODE PATH FOR EVERY APP)
+# ================================================================
+class LLMService:
+    """
+    Everything between a route and the upstream completion: response
+    cache, single-flight, limiter, retries, usage and metrics.
+
+    Construction is cheap. The openai SDK is imported and its client
+    built on first use, on top of the app's pooled httpx client (see
+    bind()), so workers start fast and a missing endpoint only fails the
+    requests that need the LLM.
+    """
+
+    def __init__(self, endpoint: Optional[str], api_key: Optional[str], model: str = DEFAULT_MODEL, shared=None):
+        self.endpoint = endpoint
+        self.api_key = api_key
+        self.model = model
+        self.http_client = None
+        self._client = None
+        # Cross-worker state (shared_state.py); only used when other processes see it
+        self.shared = shared if shared is not None and shared.cross_process else None
+        # Seconds a worker holds (and others wait on) the lease for one generation
+        self.lease_seconds = env_float("LLM_LEASE_SECONDS", 180.0)
+
+        # Completion cache keyed on (model, messages, temperature); see llm_cache.py
+        self.cache = cache_from_env(self.shared)
+        # Coalesces identical in-flight completions (same key as the cache)
+        self.inflight = SingleFlight()
+        # Shared RPM/TPM/in-flight gate for every outbound completion
+        self.limiter = limiter_from_env(self.shared)
+        # Retries with jittered backoff and optional p95 hedging
+        self.retry = retry_policy_from_env()
+        # Token usage and provider prompt-cache hits reported by completions
+        self.usage = UsageTracker()
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.endpoint and self.api_key)
+
+    def bind(self, http_client: httpx.AsyncClient):
+        """Use the app's pooled client for upstream calls (called from the lifespan hook)."""
+        self.http_client = http_client
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            if not self.configured:
+                raise HTTPException(
+                    status_code=503,
+                    detail="LLM endpoint not configured: set LLMFOUNDRY_API_ENDPOINT and LLMFOUNDRY_API_KEY",
+                )
+            from openai import AsyncOpenAI  # ~1s import, paid by the first LLM request instead of startup
+
+            options = {}
+            if self.http_client is not None:
+                options = {"http_client": self.http_client, "timeout": self.http_client.timeout}
+            self._client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.endpoint,
+                max_retries=0,  # retries are handled by llm_retry
+                **options,
+            )
+        return self._client
+
+    # ---------------- completions ----------------
+    def _options(self, temperature: Optional[float] = None, max_tokens: Optional[int] = None) -> dict:
+        options = {} if temperature is None else {"temperature": temperature}
+        if max_tokens is not None:
+            options["max_tokens"] = max_tokens
+        return options
+
+    async def complete(
+        self,
+        msgs: list,
+        temperature: Optional[float] = None,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+    ) -> str:
+        client = self.client
+        model = model or self.model
+        set_model(model)
+        options = self._options(temperature, max_tokens)
+
+        async def attempt():
+            async with self.limiter.slot(self.limiter.estimate(msgs, max_tokens)) as slot:
+                started = time.monotonic()
+                response = await client.chat.completions.create(
+                    model=model,
+                    messages=msgs,
+                    **options,
+                )
+                elapsed = time.monotonic() - started
+                record_phase("llm", elapsed)
+                slot.record_usage(response.usage.total_tokens if response.usage else None)
+                self.usage.record(response.usage, elapsed)
+            return response.choices[0].message.content
+
+        return await self.retry.run(attempt)
+
+    async def call(
+        self,
+        msgs: list,
+        use_cache: bool = True,
+        temperature: Optional[float] = None,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+    ) -> str:
+        """`model` / `max_tokens` override the defaults for one call (see model_routing.py)."""
+        try:
+            if not use_cache:
+                return await self.complete(msgs, temperature, model, max_tokens)
+
+            cache_key = make_cache_key(model or self.model, msgs, temperature, max_tokens)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+            async def complete_and_cache():
+                if self.shared is None:
+                    content = await self.complete(msgs, temperature, model, max_tokens)
+                    self.cache.set(cache_key, content)
+                    return content
+                # Another worker may be generating the same completion:
+                # wait for its lease and take the result from the shared cache.
+                async with lease(self.shared, "llm:" + cache_key, ttl=self.lease_seconds, wait=self.lease_seconds):
+                    cached = self.cache.get(cache_key)
+                    if cached is not None:
+                        return cached
+                    content = await self.complete(msgs, temperature, model, max_tokens)
+                    self.cache.set(cache_key, content)
+                    return content
+
+            # Identical concurrent requests share one upstream call.
+            return await self.inflight.do(cache_key, complete_and_cache)
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=error_status(e), detail=str(e))
+
+    async def stream(self, msgs: list, use_cache: bool = True, model: Optional[str] = None, max_tokens: Optional[int] = None):
+        """
+        Same as call() but returns an async iterator of content deltas.
+        The upstream request is opened here, so connection/auth errors still
+        surface as HTTPException before the response starts.
+        """
+        try:
+            model = model or self.model
+            cache_key = make_cache_key(model, msgs, max_tokens=max_tokens)
+            if use_cache:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return replay_cached(cached)
+
+            client = self.client
+            set_model(model)
+            options = self._options(max_tokens=max_tokens)
+
+            async def open_stream():
+                slot = await self.limiter.acquire(self.limiter.estimate(msgs, max_tokens))
+                started = time.perf_counter()
+                try:
+                    stream = await client.chat.completions.create(
+                        model=model,
+                        messages=msgs,
+                        **options,
+                        stream=True,
+                        stream_options={"include_usage": True},
+                    )
+                except BaseException as e:
+                    slot.release(e)
+                    raise
+                return slot.wrap(timed_stream(openai_deltas(stream, on_usage=self.usage.recorder(slot)), started))
+
+            # Only opening the stream is retried; tokens already sent cannot be.
+            deltas = await self.retry.run(open_stream, hedge=False)
+            return tee_to_cache(self.cache, cache_key, deltas) if use_cache else deltas
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=error_status(e), detail=str(e))
+
+    def register_metrics(self):
+        """Existing /…/stats counters, exported as gauges on /metrics."""
+        register_stats("llm_cache", self.cache.stats)
+        register_stats("llm_inflight", self.inflight.stats)
+        register_stats("llm_limiter", self.limiter.stats)
+        register_stats("llm_retry", self.retry.stats)
+        register_stats("llm_usage", self.usage.stats)
+
+
+def llm_service_from_env(shared=None) -> LLMService:
+    endpoint, api_key = llm_endpoint_from_env()
+    return LLMService(endpoint, api_key, model=os.getenv("LLM_MODEL", DEFAULT_MODEL), shared=shared)
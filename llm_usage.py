@@ -0,0 +1,79 @@
+from typing import Callable, Optional
+
+from metrics import record_tokens
+
+
+def _field(obj, name: str):
+    """Reads `name` from an openai usage object or a raw JSON dict."""
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+def usage_counts(usage) -> dict:
+    """prompt / cached / completion / total token counts from a completion `usage` field."""
+    details = _field(usage, "prompt_tokens_details")
+    return {
+        "prompt_tokens": _field(usage, "prompt_tokens") or 0,
+        "cached_tokens": _field(details, "cached_tokens") or 0,
+        "completion_tokens": _field(usage, "completion_tokens") or 0,
+        "total_tokens": _field(usage, "total_tokens") or 0,
+    }
+
+
+# ================================================================
+#   TOKEN USAGE + PROMPT-CACHE HIT TRACKING
+# ================================================================
+class UsageTracker:
+    """
+    Totals the `usage` reported by completions, including the provider's
+    prompt-cache hits (prompt_tokens_details.cached_tokens), and splits
+    non-streaming latency by whether the prompt was served from cache.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.cache_hits = 0
+        self.totals = {"prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        self._latency = {True: [0, 0.0], False: [0, 0.0]}  # cached? -> [count, seconds]
+
+    def record(self, usage, seconds: Optional[float] = None):
+        if usage is None:
+            return
+        counts = usage_counts(usage)
+        self.requests += 1
+        record_tokens(counts)
+        for name, value in counts.items():
+            self.totals[name] += value
+
+        cached = counts["cached_tokens"] > 0
+        if cached:
+            self.cache_hits += 1
+        if seconds is not None:
+            self._latency[cached][0] += 1
+            self._latency[cached][1] += seconds
+
+    def recorder(self, slot=None) -> Callable:
+        """on_usage callback for streamed completions; also corrects the limiter slot's TPM charge."""
+        def on_usage(usage):
+            if slot is not None:
+                slot.record_usage(usage_counts(usage)["total_tokens"])
+            self.record(usage)
+        return on_usage
+
+    def stats(self) -> dict:
+        prompt = self.totals["prompt_tokens"]
+        return {
+            "requests": self.requests,
+            "prompt_cache_hits": self.cache_hits,
+            "cached_token_ratio": round(self.totals["cached_tokens"] / prompt, 4) if prompt else 0.0,
+            "latency_cached_avg_seconds": self._avg(True),
+            "latency_uncached_avg_seconds": self._avg(False),
+            **self.totals,
+        }
+
+    def _avg(self, cached: bool) -> Optional[float]:
+        count, total = self._latency[cached]
+        return round(total / count, 4) if count else None
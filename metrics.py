@@ -0,0 +1,298 @@
+import contextvars
+import functools
+import inspect
+import json
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import AsyncIterator, Callable, Optional
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+REGISTRY = []
+COLLECTORS = {}  # prefix -> stats function
+
+
+# ================================================================
+#   PROMETHEUS TEXT-FORMAT METRICS
+# ================================================================
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+        REGISTRY.append(self)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._values = {}  # label values -> [per-bucket counts (+Inf last), sum, count]
+        REGISTRY.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+def register_stats(prefix: str, stats_fn: Callable[[], dict]):
+    """Exports every numeric field of an existing /…/stats dict as a gauge `<prefix>_<field>`."""
+    COLLECTORS[prefix] = stats_fn
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for prefix, stats_fn in COLLECTORS.items():
+        for field, value in stats_fn().items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = f"{prefix}_{field}"
+            lines.extend([f"# TYPE {name} gauge", f"{name} {value:g}"])
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Request latency until the last body byte was sent",
+    ("route", "method", "status"),
+)
+PHASE_SECONDS = Histogram(
+    "llm_app_phase_seconds",
+    "Time spent per request phase (parse, prompt_build, queue_wait, ttft, llm, postprocess, optimize, github_api, ...)",
+    ("route", "model", "phase"),
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens reported by completions (kind = prompt, cached, completion)",
+    ("route", "model", "kind"),
+)
+
+
+# ================================================================
+#   REQUEST CONTEXT
+# ================================================================
+class RequestContext:
+    def __init__(self, request_id: str, scope: dict):
+        self.request_id = request_id
+        self.scope = scope
+        self.started = time.perf_counter()
+        self.model = None
+        self.tier = None
+        self.phases = {}
+        self.tokens = {}
+
+    @property
+    def route(self) -> str:
+        # FastAPI stores the matched route in the scope once routing is done
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or "unmatched"
+
+
+_current = contextvars.ContextVar("request_context", default=None)
+
+
+def current_request() -> Optional[RequestContext]:
+    return _current.get()
+
+
+@contextmanager
+def request_context(scope: dict, request_id: Optional[str] = None):
+    """A request context for work outside an HTTP request, e.g. one WebSocket turn."""
+    context = RequestContext(request_id or uuid.uuid4().hex, scope)
+    token = _current.set(context)
+    try:
+        yield context
+    finally:
+        _current.reset(token)
+
+
+def set_model(model: str):
+    """Labels the rest of this request's phases and tokens with `model`."""
+    context = _current.get()
+    if context is not None:
+        context.model = model
+
+
+def set_tier(tier: str):
+    """Model-routing tier of this request (model_routing.py), written to the access log."""
+    context = _current.get()
+    if context is not None:
+        context.tier = tier
+
+
+def _route_and_model(model: Optional[str]) -> tuple:
+    context = _current.get()
+    if context is None:
+        return "background", model or "none"
+    return context.route, model or context.model or "none"
+
+
+def record_phase(name: str, seconds: float, model: Optional[str] = None):
+    route, model = _route_and_model(model)
+    PHASE_SECONDS.observe(seconds, route=route, model=model, phase=name)
+    context = _current.get()
+    if context is not None:
+        context.phases[name] = context.phases.get(name, 0.0) + seconds
+
+
+def record_tokens(counts: dict, model: Optional[str] = None):
+    route, model = _route_and_model(model)
+    context = _current.get()
+    for kind in ("prompt", "cached", "completion"):
+        value = counts.get(f"{kind}_tokens") or 0
+        LLM_TOKENS.inc(value, route=route, model=model, kind=kind)
+        if context is not None:
+            context.tokens[kind] = context.tokens.get(kind, 0) + value
+
+
+@contextmanager
+def phase(name: str, model: Optional[str] = None):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, time.perf_counter() - started, model)
+
+
+def timed(name: str):
+    """Decorator form of `phase` for sync and async functions."""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with phase(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+async def timed_stream(chunks: AsyncIterator[str], started: float) -> AsyncIterator[str]:
+    """Records time-to-first-token and total LLM time of a streamed completion."""
+    first = True
+    try:
+        async for chunk in chunks:
+            if first:
+                record_phase("ttft", time.perf_counter() - started)
+                first = False
+            yield chunk
+    finally:
+        record_phase("llm", time.perf_counter() - started)
+
+
+# ================================================================
+#   STRUCTURED LOGS
+# ================================================================
+def log(message: str, level: str = "info", **fields):
+    """One JSON line on stdout, tagged with the current request id and route."""
+    record = {"ts": round(time.time(), 3), "level": level, "msg": message}
+    context = _current.get()
+    if context is not None:
+        record["request_id"] = context.request_id
+        record["route"] = context.route
+    record.update(fields)
+    print(json.dumps(record, default=str), flush=True)
+
+
+# ================================================================
+#   ASGI MIDDLEWARE
+# ================================================================
+class RequestMetricsMiddleware:
+    """
+    Times every HTTP request until its last body byte (so streamed
+    responses are measured in full), propagates or assigns X-Request-ID,
+    and writes one JSON access-log line with the per-phase breakdown.
+    """
+
+    QUIET_PATHS = ("/metrics",)
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1") or uuid.uuid4().hex
+        context = RequestContext(request_id, scope)
+        token = _current.set(context)
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            elapsed = time.perf_counter() - context.started
+            HTTP_REQUEST_SECONDS.observe(elapsed, route=context.route, method=scope["method"], status=str(status))
+            if scope["path"] not in self.QUIET_PATHS:
+                log(
+                    "request",
+                    method=scope["method"],
+                    path=scope["path"],
+                    status=status,
+                    duration_ms=round(elapsed * 1000, 1),
+                    model=context.model,
+                    tier=context.tier,
+                    phases_ms={name: round(seconds * 1000, 1) for name, seconds in context.phases.items()},
+                    tokens=context.tokens or None,
+                )
+            _current.reset(token)
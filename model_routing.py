@@ -0,0 +1,180 @@
+import os
+import re
+import time
+from typing import Optional
+
+from http_pool import env_bool, env_int
+from metrics import current_request, log, record_phase, set_tier
+
+
+TIERS = ("small", "standard", "large")
+
+# Terms that each add a feature's worth of code to the page.
+FEATURE_TERMS = frozenset(
+    "dashboard chart charts graph graphs plot canvas game games editor kanban spreadsheet table tables "
+    "calendar schedule map maps animation animations drag drop upload download export import pdf csv "
+    "filter filters sort sorting search login auth authentication signup profile settings theme themes "
+    "database crud storage localstorage offline history undo redo chat chatbot api apis realtime "
+    "multiplayer timer stopwatch quiz cart checkout payment analytics report reports notifications "
+    "tabs modal modals wizard form forms validation pagination responsive 3d physics".split()
+)
+
+# Terms that mark a small, single-purpose widget.
+SIMPLE_TERMS = frozenset(
+    "button counter clock badge toggle card banner widget spinner loader greeting hello "
+    "landing tooltip switch".split()
+)
+
+# The page calls an LLM itself (prompts.LLM_FOUNDRY_RULES). Whole words, so
+# "email" or "paint" no longer count as "ai".
+LLM_TERMS = re.compile(
+    r"\b(ai|llm|llms|gpt|chatgpt|chatbot|openai|summari[sz]\w*|translator|sentiment|rewrite text)\b"
+)
+
+_CLAUSE_SPLIT = re.compile(r",|;|\n|\band\b|\bwith\b|\bplus\b|^\s*[-*]\s", re.MULTILINE)
+
+
+# ================================================================
+#   REQUEST CLASSIFIER (LOCAL, MICROSECONDS)
+# ================================================================
+def classify_description(description: str) -> dict:
+    """
+    Estimates how much page a description asks for from its wording: the
+    number of feature terms, clauses and words. Returns the tier
+    ("small" / "standard" / "large"), a complexity score, the expected
+    completion size in tokens and whether the page needs an LLM API.
+    """
+    started = time.perf_counter()
+    text = description.lower()
+    words = re.findall(r"[a-z0-9]+", text)
+    features = sorted(FEATURE_TERMS.intersection(words))
+    simple = sorted(SIMPLE_TERMS.intersection(words))
+    clauses = len(_CLAUSE_SPLIT.findall(text)) + 1
+    needs_llm_api = LLM_TERMS.search(text) is not None
+
+    complexity = len(features) + 0.5 * (clauses - 1) + len(words) / 40 + (1.5 if needs_llm_api else 0)
+    if simple and not features:
+        complexity = max(0.0, complexity - 1)
+    expected = 700 + 450 * len(features) + 150 * (clauses - 1) + 4 * len(words) + (600 if needs_llm_api else 0)
+
+    if complexity < 1.5:
+        tier = "small"
+    elif complexity >= 5:
+        tier = "large"
+    else:
+        tier = "standard"
+
+    record_phase("classify", time.perf_counter() - started)
+    return {
+        "tier": tier,
+        "complexity": round(complexity, 2),
+        "expected_output_tokens": min(expected, 16000),
+        "needs_llm_api": needs_llm_api,
+        "signals": features + simple,
+    }
+
+
+# ================================================================
+#   TIER -> MODEL / MAX_TOKENS / PROMPT VARIANT
+# ================================================================
+class ModelRouter:
+    """
+    Maps each tier to a model, a max_tokens limit and a system prompt
+    variant (see prompts.SYSTEM_PROMPTS), and keeps per-tier outcomes
+    (latency, completion tokens, completions that hit the limit) so the
+    classifier thresholds and limits can be tuned. With routing disabled
+    every request gets the default model, no limit and the full prompt.
+    """
+
+    def __init__(self, tiers: dict, default_model: str, enabled: bool = True):
+        self.tiers = tiers
+        self.default_model = default_model
+        self.enabled = enabled
+        self.outcomes = {
+            tier: {"requests": 0, "upstream": 0, "seconds_total": 0.0, "completion_tokens": 0, "hit_max_tokens": 0}
+            for tier in TIERS
+        }
+
+    def route(self, requirements: dict) -> dict:
+        tier = requirements["tier"] if self.enabled else "standard"
+        config = self.tiers[tier] if self.enabled else {"model": self.default_model, "max_tokens": None, "prompt_variant": "full"}
+        set_tier(tier)
+        return {
+            "tier": tier,
+            "complexity": requirements["complexity"],
+            "expected_output_tokens": requirements["expected_output_tokens"],
+            **config,
+        }
+
+    def record_outcome(self, route: dict):
+        """Called once the page is done; reads latency and tokens from the current request."""
+        context = current_request()
+        if context is None:
+            return
+        seconds = time.perf_counter() - context.started
+        completion = context.tokens.get("completion")
+        hit_limit = bool(completion and route["max_tokens"] and completion >= route["max_tokens"] * 0.98)
+
+        outcome = self.outcomes[route["tier"]]
+        outcome["requests"] += 1
+        if completion:  # cache and near-duplicate hits say nothing about the model
+            outcome["upstream"] += 1
+            outcome["seconds_total"] += seconds
+            outcome["completion_tokens"] += completion
+            outcome["hit_max_tokens"] += hit_limit
+
+        log(
+            "model route",
+            tier=route["tier"],
+            model=route["model"],
+            complexity=route["complexity"],
+            expected_output_tokens=route["expected_output_tokens"],
+            max_tokens=route["max_tokens"],
+            completion_tokens=completion,
+            hit_max_tokens=hit_limit,
+            duration_ms=round(seconds * 1000, 1),
+        )
+
+    def stats(self) -> dict:
+        # flat <tier>_<field> numbers, so /metrics exports them as gauges
+        stats = {"enabled": self.enabled, "tiers": self.tiers}
+        for tier, outcome in self.outcomes.items():
+            upstream = outcome["upstream"]
+            stats[f"{tier}_requests"] = outcome["requests"]
+            stats[f"{tier}_upstream"] = upstream
+            stats[f"{tier}_avg_seconds"] = round(outcome["seconds_total"] / upstream, 3) if upstream else 0.0
+            stats[f"{tier}_avg_completion_tokens"] = round(outcome["completion_tokens"] / upstream) if upstream else 0
+            stats[f"{tier}_hit_max_tokens"] = outcome["hit_max_tokens"]
+        return stats
+
+
+def _max_tokens(name: str, default: int) -> Optional[int]:
+    value = env_int(name, default)
+    return value if value > 0 else None  # 0 = no limit
+
+
+def model_router_from_env(default_model: Optional[str] = None) -> ModelRouter:
+    # LLM_MODEL_<TIER> / LLM_MAX_TOKENS_<TIER>; every tier uses LLM_MODEL unless set.
+    # No tier is capped unless its limit is set: a cut-off page is worse than a slow one.
+    default_model = default_model or os.getenv("LLM_MODEL", "gpt-4o-mini")
+    return ModelRouter(
+        {
+            "small": {
+                "model": os.getenv("LLM_MODEL_SMALL") or default_model,
+                "max_tokens": _max_tokens("LLM_MAX_TOKENS_SMALL", 0),
+                "prompt_variant": "compact",
+            },
+            "standard": {
+                "model": os.getenv("LLM_MODEL_STANDARD") or default_model,
+                "max_tokens": _max_tokens("LLM_MAX_TOKENS_STANDARD", 0),
+                "prompt_variant": "full",
+            },
+            "large": {
+                "model": os.getenv("LLM_MODEL_LARGE") or default_model,
+                "max_tokens": _max_tokens("LLM_MAX_TOKENS_LARGE", 0),
+                "prompt_variant": "full",
+            },
+        },
+        default_model=default_model,
+        enabled=env_bool("MODEL_ROUTING", True),
+    )
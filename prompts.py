@@ -0,0 +1,118 @@
+"""
+Generation system prompts, built once at import time.
+
+Providers cache prompts by exact prefix, so every variant starts with the
+same GENERATION_RULES bytes and only appends its extra rules at the end.
+Anything request-specific (the app description) goes in the user message
+after the system prompt, never inside it.
+"""
+from metrics import timed
+from model_routing import classify_description
+
+
+GENERATION_RULES = """
+You are an expert web developer. Generate complete HTML files with embedded CSS and JS.
+
+RULES:
+1. Output ONLY pure HTML (no markdown, no ```).
+2. Must include <!DOCTYPE html>.
+3. CSS must be inside <style> in <head>.
+4. JS must be inside <script> before </body>.
+5. Must be fully functional, modern UI, clean UX.
+6. Include API integrations if required.
+7. If the app needs an API (like PDF summarizer, weather app, etc.):
+   - Include full working API integration code
+   - For PDF: Use PDF.js from CDN: https://cdnjs.cloudflare.com/ajax/libs/pdf.js/3.11.174/pdf.min.js
+   - For PDF: Extract text and send to API for real summarization
+8. Follow this exact structure:
+
+<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8"></meta>
+<!-- meta, css, cdns -->
+</head>
+<body>
+</body>
+<script>
+</script>
+</html>
+"""
+
+LLM_FOUNDRY_RULES = """
+LLM Integration Rules:
+- Use the LLM Foundry API exactly as shown:
+const response = await fetch("https://llmfoundry.straive.com/openai/v1/chat/completions", {
+  method: "POST",
+  headers: { "Content-Type": "application/json" },
+  credentials: "include",
+  body: JSON.stringify({
+    model: "gpt-4o-mini",
+    messages: [{ role: "user", content: "What is 2 + 2" }],
+  }),
+});
+await response.json()
+
+## Instructions:
+1. Use only the provided LLM Foundry fetch API to call code in the generated code if the application requires llm.
+2. We don;t need API key in the generated code. use .env file where ever you require
+"""
+
+COMPACT_RULES = """
+Size: this is a small, single-purpose page. Keep CSS and JS short, skip CDNs and
+libraries unless the page cannot work without them, and add no extra features.
+"""
+
+# Keyed on (requirements["needs_llm_api"], prompt variant); see model_routing.py.
+SYSTEM_PROMPTS = {
+    (False, "full"): GENERATION_RULES,
+    (True, "full"): GENERATION_RULES + LLM_FOUNDRY_RULES,
+    (False, "compact"): GENERATION_RULES + COMPACT_RULES,
+    (True, "compact"): GENERATION_RULES + LLM_FOUNDRY_RULES + COMPACT_RULES,
+}
+
+
+def build_system_prompt(requirements: dict, variant: str = "full") -> str:
+    """Returns the precompiled variant; the same object for every request of that variant."""
+    return SYSTEM_PROMPTS[(bool(requirements["needs_llm_api"]), variant)]
+
+
+# ================================================================
+#   REQUIREMENT EXTRACTION + MESSAGE BUILDERS
+# ================================================================
+def extract_requirements(description: str):
+    # tier / complexity / expected_output_tokens drive model routing (model_routing.py)
+    classified = classify_description(description)
+    return {
+        "task_description": description,
+        "needs_llm_api": classified["needs_llm_api"],
+        "tier": classified["tier"],
+        "complexity": classified["complexity"],
+        "expected_output_tokens": classified["expected_output_tokens"],
+        "output_type": "single_html",
+        "must_follow_html_rules": True,
+    }
+
+
+@timed("prompt_build")
+def build_messages(description: str, requirements: dict = None, variant: str = "full") -> list:
+    requirements = requirements or extract_requirements(description)
+    system_prompt = build_system_prompt(requirements, variant)
+
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"Create a complete HTML file for: {description}"},
+    ]
+
+
+REWRITE_SYSTEM_PROMPT = "You are an expert web developer. Improve the HTML based on the given feedback. Return ONLY full corrected HTML."
+
+
+@timed("prompt_build")
+def build_rewrite_messages(original_code: str, feedback: str, history: list = None) -> list:
+    return [
+        {"role": "system", "content": REWRITE_SYSTEM_PROMPT},
+        {"role": "user", "content": "Original Code:\n" + original_code},
+        *(history or []),
+        {"role": "user", "content": "Feedback:\n" + feedback},
+    ]
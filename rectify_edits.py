@@ -0,0 +1,178 @@
+import os
+import re
+from typing import Optional
+
+from html_post import clean_html
+from metrics import timed
+
+
+SEARCH_MARK = "<<<<<<< SEARCH"
+DIVIDER_MARK = "======="
+REPLACE_MARK = ">>>>>>> REPLACE"
+
+EDIT_BLOCK = re.compile(
+    r"^[ \t]*<{5,9} ?SEARCH[ \t]*\n(.*?)^[ \t]*={5,9}[ \t]*\n(.*?)^[ \t]*>{5,9} ?REPLACE[ \t]*$",
+    re.DOTALL | re.MULTILINE,
+)
+
+RECTIFY_MODES = ("diff", "full")
+
+# Tags whose open/close balance must survive an edit.
+CHECKED_TAGS = ("html", "head", "body", "style", "script")
+
+EDIT_SYSTEM_PROMPT = f"""
+You are an expert web developer. You will be given an existing single-file HTML app and feedback.
+Change ONLY what the feedback requires and reply with search/replace edit blocks, nothing else:
+
+{SEARCH_MARK}
+exact lines copied from the existing code
+{DIVIDER_MARK}
+the new lines that replace them
+{REPLACE_MARK}
+
+RULES:
+1. The SEARCH part must match the existing code exactly (including indentation) and occur only once.
+2. Keep SEARCH parts short: just enough lines to be unique.
+3. Use several blocks for several changes; an empty REPLACE part deletes the lines.
+4. To add code, SEARCH for a nearby line and repeat it in REPLACE together with the new lines.
+5. No markdown, no explanations, no full file.
+"""
+
+
+class PatchError(ValueError):
+    """The model's edits could not be parsed, applied or validated."""
+
+
+# ================================================================
+#   MODE + PROMPT
+# ================================================================
+def rectify_mode(body: dict) -> str:
+    """'diff' (search/replace edits) or 'full' (whole file rewrite); RECTIFY_MODE sets the default."""
+    mode = (body.get("mode") or os.getenv("RECTIFY_MODE", "diff")).lower()
+    return mode if mode in RECTIFY_MODES else "diff"
+
+
+@timed("prompt_build")
+def build_edit_messages(original_code: str, feedback: str, history: Optional[list] = None) -> list:
+    """
+    `history` holds earlier feedback rounds (see rectify_sessions.py). It goes
+    after the code so system prompt + code stay a cacheable prompt prefix.
+    """
+    return [
+        {"role": "system", "content": EDIT_SYSTEM_PROMPT},
+        {"role": "user", "content": "Existing code:\n" + original_code},
+        *(history or []),
+        {"role": "user", "content": "Feedback:\n" + feedback},
+    ]
+
+
+# ================================================================
+#   PARSE + APPLY
+# ================================================================
+def parse_edits(completion: str) -> list:
+    """[(search, replace), ...] from the SEARCH/REPLACE blocks in a completion."""
+    return [(search, replace) for search, replace in EDIT_BLOCK.findall(completion)]
+
+
+def _line_span(code_lines: list, search: str) -> Optional[tuple]:
+    """
+    Unique (start, end) line span matching `search` when indentation,
+    trailing whitespace and blank lines are ignored.
+    """
+    wanted = [line.strip() for line in search.splitlines() if line.strip()]
+    if not wanted:
+        return None
+    # (line index, stripped text) of every non-blank code line
+    content = [(i, line.strip()) for i, line in enumerate(code_lines) if line.strip()]
+    size = len(wanted)
+    spans = [
+        (content[k][0], content[k + size - 1][0] + 1)
+        for k in range(len(content) - size + 1)
+        if [text for _, text in content[k:k + size]] == wanted
+    ]
+    if len(spans) > 1:
+        raise PatchError(f"Edit target is ambiguous ({len(spans)} matches): {wanted[0][:60]!r}")
+    return spans[0] if spans else None
+
+
+def apply_edit(code: str, search: str, replace: str) -> str:
+    if not search.strip():
+        raise PatchError("Edit has an empty SEARCH part")
+
+    # The block format always ends SEARCH on a newline; the target may not.
+    for target, new in ((search, replace), (search.strip("\n"), replace.strip("\n"))):
+        count = code.count(target)
+        if count == 1:
+            return code.replace(target, new, 1)
+        if count > 1:
+            raise PatchError(f"Edit target is ambiguous ({count} matches): {search.strip()[:60]!r}")
+
+    # Models often get indentation or trailing whitespace slightly wrong.
+    code_lines = code.splitlines(keepends=True)
+    span = _line_span(code_lines, search)
+    if span is None:
+        raise PatchError(f"Edit target not found: {search.strip()[:60]!r}")
+
+    start, end = span
+    if replace and not replace.endswith("\n"):
+        replace += "\n"
+    return "".join(code_lines[:start]) + replace + "".join(code_lines[end:])
+
+
+def apply_edits(code: str, edits: list) -> str:
+    for search, replace in edits:
+        code = apply_edit(code, search, replace)
+    return code
+
+
+def edit_splices(code: str, edits: list) -> list:
+    """
+    The edits as exact {"start", "end", "text"} replacements, each relative
+    to the code left by the previous one, so a client holding `code` can
+    apply them without repeating the whitespace-tolerant matching.
+    """
+    splices = []
+    for search, replace in edits:
+        patched = apply_edit(code, search, replace)
+        start = len(os.path.commonprefix([code, patched]))
+        room = min(len(code), len(patched)) - start
+        tail = min(room, len(os.path.commonprefix([code[::-1], patched[::-1]])))
+        splices.append({"start": start, "end": len(code) - tail, "text": patched[start:len(patched) - tail]})
+        code = patched
+    return splices
+
+
+def tag_balance(code: str, tag: str) -> int:
+    opened = len(re.findall(rf"<{tag}[\s>]", code, re.IGNORECASE))
+    closed = len(re.findall(rf"</{tag}\s*>", code, re.IGNORECASE))
+    return opened - closed
+
+
+def validate_patched(original: str, patched: str):
+    """The edited page must still be a whole document with the same tag structure."""
+    if not patched.strip():
+        raise PatchError("Edits produced an empty document")
+    if "<!doctype html" in original.lower() and "<!doctype html" not in patched.lower():
+        raise PatchError("Edits removed <!DOCTYPE html>")
+    for tag in CHECKED_TAGS:
+        if tag_balance(original, tag) == 0 and tag_balance(patched, tag) != 0:
+            raise PatchError(f"Edits left <{tag}> unbalanced")
+
+
+@timed("patch")
+def patch_from_completion(original_code: str, completion: str) -> tuple:
+    """
+    Applies the edit blocks in `completion` to `original_code`.
+    Returns (code, edit_count). If the model ignored the format and sent a
+    whole document, that document is returned with edit_count 0.
+    Raises PatchError when the result cannot be trusted.
+    """
+    edits = parse_edits(completion)
+    if not edits:
+        if "<html" in completion.lower() and "</html>" in completion.lower():
+            return clean_html(completion), 0
+        raise PatchError("Completion contained no edit blocks")
+
+    patched = apply_edits(original_code, edits)
+    validate_patched(original_code, patched)
+    return patched, len(edits)
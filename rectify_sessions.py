@@ -0,0 +1,212 @@
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from http_pool import env_float, env_int
+from sqlite_db import connect, write
+
+
+class SessionConflict(Exception):
+    """The session moved to a newer version while this round was running."""
+
+
+def new_session(code: str, description: Optional[str] = None) -> dict:
+    now = time.time()
+    return {
+        "id": uuid.uuid4().hex,
+        "description": description,
+        "code": code,
+        "version": 1,
+        "history": [],
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+# ================================================================
+#   SESSION STORES
+# ================================================================
+class MemorySessionStore:
+    """Default store: LRU bounded by `max_sessions`, idle sessions expire after `ttl` seconds."""
+
+    def __init__(self, ttl: float = 24 * 3600, max_sessions: int = 1000):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+
+    def get(self, session_id: str) -> Optional[dict]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if session["updated_at"] < time.time() - self.ttl:
+            del self._sessions[session_id]
+            return None
+        self._sessions.move_to_end(session_id)
+        return json.loads(json.dumps(session))
+
+    async def save(self, session: dict, base_version: Optional[int] = None):
+        current = self._sessions.get(session["id"])
+        if base_version is not None and (current is None or current["version"] != base_version):
+            raise SessionConflict("Session changed while this feedback was being applied")
+        self._sessions[session["id"]] = session
+        self._sessions.move_to_end(session["id"])
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    async def delete(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class SQLiteSessionStore:
+    """Persists sessions in a SQLite file so they survive restarts; writes never block the event loop (sqlite_db.py)."""
+
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600):
+        self.ttl = ttl
+        self._db = connect(
+            path,
+            "CREATE TABLE IF NOT EXISTS rectify_sessions ("
+            " id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)",
+        )
+
+    def get(self, session_id: str) -> Optional[dict]:
+        row = self._db.execute(
+            "SELECT data FROM rectify_sessions WHERE id = ? AND updated_at >= ?",
+            (session_id, time.time() - self.ttl),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    async def save(self, session: dict, base_version: Optional[int] = None):
+        """With `base_version`, saves only if the stored session is still at it (checked inside the write)."""
+        cutoff = time.time() - self.ttl
+        data = json.dumps(session)
+
+        def upsert():
+            if base_version is not None:
+                row = self._db.execute("SELECT data FROM rectify_sessions WHERE id = ?", (session["id"],)).fetchone()
+                if row is None or json.loads(row[0])["version"] != base_version:
+                    raise SessionConflict("Session changed while this feedback was being applied")
+            self._db.execute("DELETE FROM rectify_sessions WHERE updated_at < ?", (cutoff,))
+            self._db.execute(
+                "INSERT OR REPLACE INTO rectify_sessions (id, data, updated_at) VALUES (?, ?, ?)",
+                (session["id"], data, session["updated_at"]),
+            )
+
+        await write(self._db, upsert)
+
+    async def delete(self, session_id: str) -> bool:
+        cursor = await write(self._db, lambda: self._db.execute("DELETE FROM rectify_sessions WHERE id = ?", (session_id,)))
+        return cursor.rowcount > 0
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM rectify_sessions").fetchone()[0]
+
+
+# ================================================================
+#   SESSIONS + PROMPT HISTORY
+# ================================================================
+class RectifySessions:
+    """
+    Server-side human-in-the-loop state: the current document version and
+    the feedback rounds that produced it. Clients send only new feedback;
+    earlier rounds go back into the prompt within `history_tokens`, newest
+    first, with anything older collapsed into a one-line summary.
+    """
+
+    SUMMARY_CHARS = 400
+    SUMMARY_ITEM_CHARS = 80
+
+    def __init__(self, store, history_tokens: int = 1500, max_turns: int = 50):
+        self.store = store
+        self.history_tokens = history_tokens
+        self.max_turns = max_turns
+        self.counters = {"created": 0, "rounds": 0, "conflicts": 0, "trimmed_turns": 0}
+
+    async def create(self, code: str, description: Optional[str] = None) -> dict:
+        session = new_session(code, description)
+        await self.store.save(session)
+        self.counters["created"] += 1
+        return session
+
+    def get(self, session_id: str) -> Optional[dict]:
+        return self.store.get(session_id)
+
+    async def delete(self, session_id: str) -> bool:
+        return await self.store.delete(session_id)
+
+    async def record(self, session_id: str, base_version: int, feedback: str, code: str, mode: str) -> dict:
+        """Stores the result of one round on top of `base_version`."""
+        session = self.store.get(session_id)
+        if session is None or session["version"] != base_version:
+            self.counters["conflicts"] += 1
+            raise SessionConflict("Session changed while this feedback was being applied")
+
+        now = time.time()
+        session["history"].append({"feedback": feedback, "mode": mode, "version": base_version + 1, "at": now})
+        session["history"] = session["history"][-self.max_turns:]
+        session["code"] = code
+        session["version"] = base_version + 1
+        session["updated_at"] = now
+        try:
+            await self.store.save(session, base_version)
+        except SessionConflict:
+            self.counters["conflicts"] += 1
+            raise
+        self.counters["rounds"] += 1
+        return session
+
+    def history_messages(self, session: dict) -> list:
+        """Earlier feedback rounds as prompt messages, trimmed to the token budget (~4 chars/token)."""
+        history = session["history"]
+        if not history:
+            return []
+
+        budget = self.history_tokens * 4 - self.SUMMARY_CHARS
+        kept = 0
+        for turn in reversed(history):
+            budget -= len(turn["feedback"]) + 8
+            if budget < 0:
+                break
+            kept += 1
+
+        older, recent = history[:len(history) - kept], history[len(history) - kept:]
+        lines = []
+        if older:
+            self.counters["trimmed_turns"] += len(older)
+            summary = "; ".join(_shorten(turn["feedback"], self.SUMMARY_ITEM_CHARS) for turn in older)
+            lines.append(f"(earlier, {len(older)} rounds) " + _shorten(summary, self.SUMMARY_CHARS))
+        lines += [f"{i}. {turn['feedback']}" for i, turn in enumerate(recent, start=len(older) + 1)]
+
+        return [{
+            "role": "user",
+            "content": "Previous feedback, already applied to the code above:\n" + "\n".join(lines),
+        }]
+
+    def stats(self) -> dict:
+        return {"sessions": len(self.store), "history_tokens": self.history_tokens, **self.counters}
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def session_store_from_env():
+    db_path = os.getenv("SESSION_DB_PATH")
+    ttl = env_float("SESSION_TTL_SECONDS", 24 * 3600)
+    if db_path:
+        return SQLiteSessionStore(db_path, ttl=ttl)
+    return MemorySessionStore(ttl=ttl, max_sessions=env_int("SESSION_MAX", 1000))
+
+
+def sessions_from_env() -> RectifySessions:
+    return RectifySessions(
+        session_store_from_env(),
+        history_tokens=env_int("SESSION_HISTORY_TOKENS", 1500),
+        max_turns=env_int("SESSION_MAX_TURNS", 50),
+    )
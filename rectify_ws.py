@@ -0,0 +1,223 @@
+import asyncio
+import json
+import time
+from contextlib import aclosing, suppress
+
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+
+from artifacts import record_artifact
+from html_post import HtmlPostProcessor
+from http_pool import env_float
+from metrics import log, request_context
+from prompts import build_rewrite_messages
+from rectify_edits import PatchError, build_edit_messages, edit_splices, parse_edits, patch_from_completion, rectify_mode
+from rectify_sessions import SessionConflict
+from schemas import dumps
+from streaming import postprocessed
+
+
+# Minimum seconds between "progress" events while edit blocks are generated.
+PROGRESS_INTERVAL = env_float("WS_PROGRESS_INTERVAL", 0.25)
+
+
+def _utf16_len(text: str) -> int:
+    # Browsers index strings in UTF-16 code units, Python in code points.
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _utf16_splices(code: str, splices: list) -> list:
+    converted = []
+    for splice in splices:
+        start = _utf16_len(code[:splice["start"]])
+        end = start + _utf16_len(code[splice["start"]:splice["end"]])
+        converted.append({"start": start, "end": end, "text": splice["text"]})
+        code = code[:splice["start"]] + splice["text"] + code[splice["end"]:]
+    return converted
+
+
+# ================================================================
+#   ONE WEBSOCKET = ONE RECTIFY SESSION, ONE TURN AT A TIME
+# ================================================================
+class EditChannel:
+    """
+    Human-in-the-loop rectify over a WebSocket bound to a rectify session.
+
+    Client -> server (JSON text frames):
+      {"type": "feedback", "feedback": "...", "mode": "diff"|"full", "cache": true}
+      {"type": "cancel"}   stop the running turn; its upstream call is aborted
+      {"type": "ping"}
+
+    Server -> client:
+      ready {session_id, version}, progress {stage, chars?},
+      delta {content} (streamed HTML of a full rewrite),
+      patch {splices: [{start, end, text}]} (UTF-16 offsets, applied in order),
+      done {mode, version, problems, artifact_id, length}, cancelled,
+      conflict {error, status: 409, version} (the session moved on; nothing was recorded),
+      error {error, status?}, pong
+
+    Neither side re-sends the document: the server takes it from the
+    session, the client keeps its copy in sync from deltas or splices and
+    can check it against `length` in "done".
+    """
+
+    def __init__(self, websocket: WebSocket, llm, sessions, artifacts, session_id: str):
+        self.websocket = websocket
+        self.llm = llm
+        self.sessions = sessions
+        self.artifacts = artifacts
+        self.session_id = session_id
+        self.turn = None
+        self._send_lock = asyncio.Lock()
+
+    async def send(self, event: str, **data):
+        async with self._send_lock:
+            await self.websocket.send_text(dumps({"type": event, **data}))
+
+    async def run(self):
+        session = self.sessions.get(self.session_id)
+        if session is None:
+            await self.websocket.close(code=4404, reason="Rectify session not found or expired")
+            return
+
+        await self.websocket.accept()
+        await self.send("ready", session_id=session["id"], version=session["version"])
+        try:
+            while True:
+                try:
+                    message = json.loads(await self.websocket.receive_text())
+                except json.JSONDecodeError:
+                    await self.send("error", error="Messages must be JSON")
+                    continue
+                await self.dispatch(message if isinstance(message, dict) else {})
+        except WebSocketDisconnect:
+            pass
+        finally:
+            # Nobody is left to read the result: stop paying for it.
+            if self.turn is not None and not self.turn.done():
+                self.turn.cancel()
+                with suppress(asyncio.CancelledError):
+                    await self.turn
+
+    async def dispatch(self, message: dict):
+        kind = message.get("type")
+        running = self.turn is not None and not self.turn.done()
+
+        if kind == "feedback":
+            if running:
+                await self.send("error", error="A turn is already running; cancel it first", status=409)
+            elif not message.get("feedback"):
+                await self.send("error", error="Feedback is required", status=400)
+            else:
+                self.turn = asyncio.create_task(self.run_turn(message))
+        elif kind == "cancel":
+            if running:
+                self.turn.cancel()
+            else:
+                await self.send("error", error="No turn is running")
+        elif kind == "ping":
+            await self.send("pong")
+        else:
+            await self.send("error", error=f"Unknown message type: {kind!r}")
+
+    # ---------------- one feedback round ----------------
+    async def run_turn(self, message: dict):
+        with request_context(self.websocket.scope) as context:
+            outcome = "done"
+            try:
+                session = self.sessions.get(self.session_id)
+                if session is None:
+                    raise HTTPException(status_code=404, detail="Rectify session not found or expired")
+                if message.get("version") is not None and message["version"] != session["version"]:
+                    raise SessionConflict(f"Session is at version {session['version']}")
+
+                use_cache = message.get("cache", True) is not False
+                handled = False
+                if rectify_mode(message) == "diff":
+                    handled = await self.diff_turn(session, message["feedback"], use_cache)
+                if not handled:
+                    await self.full_turn(session, message["feedback"], use_cache)
+            except asyncio.CancelledError:
+                # Cancelling the task closed the upstream stream on its way out.
+                outcome = "cancelled"
+                with suppress(Exception):
+                    await self.send("cancelled")
+            except SessionConflict as e:
+                # Another round (another tab or socket) moved the session on; the client reloads it.
+                outcome = "conflict"
+                current = self.sessions.get(self.session_id)
+                await self.send("conflict", error=str(e), status=409, version=current["version"] if current else None)
+            except HTTPException as e:
+                outcome = "error"
+                await self.send("error", error=e.detail, status=e.status_code)
+            except Exception as e:
+                outcome = "error"
+                log("WebSocket rectify turn failed", level="error", error=str(e))
+                await self.send("error", error=str(e))
+            finally:
+                log(
+                    "ws turn",
+                    session_id=self.session_id,
+                    outcome=outcome,
+                    duration_ms=round((time.perf_counter() - context.started) * 1000, 1),
+                    model=context.model,
+                    phases_ms={name: round(seconds * 1000, 1) for name, seconds in context.phases.items()},
+                    tokens=context.tokens or None,
+                )
+
+    async def finish(self, session: dict, feedback: str, code: str, mode: str) -> dict:
+        """Records the round and the artifact; the fields returned go into "done". Raises SessionConflict."""
+        updated = await self.sessions.record(session["id"], session["version"], feedback, code, mode)
+        artifact = await record_artifact(self.artifacts, code, "rectify", session["description"], parent_code=session["code"])
+        return {"mode": mode, "version": updated["version"], "artifact_id": artifact["id"], "length": _utf16_len(code)}
+
+    async def diff_turn(self, session: dict, feedback: str, use_cache: bool) -> bool:
+        """Search/replace edits sent as splices; False if they do not apply (caller rewrites instead)."""
+        messages = build_edit_messages(session["code"], feedback, self.sessions.history_messages(session))
+        await self.send("progress", stage="waiting")
+        chunks = await self.llm.stream(messages, use_cache=use_cache)
+
+        parts = []
+        received = 0
+        reported = time.monotonic()
+        await self.send("progress", stage="generating", chars=0)
+        async for chunk in chunks:
+            parts.append(chunk)
+            received += len(chunk)
+            if time.monotonic() - reported >= PROGRESS_INTERVAL:
+                reported = time.monotonic()
+                await self.send("progress", stage="generating", chars=received)
+
+        completion = "".join(parts)
+        await self.send("progress", stage="patching", chars=received)
+        try:
+            code, edit_count = patch_from_completion(session["code"], completion)
+        except PatchError as e:
+            log("Diff rectify failed, falling back to a full rewrite", level="warning", error=str(e))
+            await self.send("progress", stage="fallback", reason=str(e))
+            return False
+
+        if edit_count:
+            splices = edit_splices(session["code"], parse_edits(completion))
+            await self.send("patch", splices=_utf16_splices(session["code"], splices))
+            await self.send("done", problems=[], edits=edit_count, **await self.finish(session, feedback, code, "diff"))
+        else:
+            # The model sent a whole document instead of edits
+            await self.send("delta", content=code)
+            await self.send("done", problems=[], edits=0, **await self.finish(session, feedback, code, "full"))
+        return True
+
+    async def full_turn(self, session: dict, feedback: str, use_cache: bool):
+        messages = build_rewrite_messages(session["code"], feedback, self.sessions.history_messages(session))
+        await self.send("progress", stage="waiting")
+        chunks = await self.llm.stream(messages, use_cache=use_cache)
+        await self.send("progress", stage="generating")
+
+        processor = HtmlPostProcessor()
+        parts = []
+        async with aclosing(postprocessed(chunks, processor)) as texts:
+            async for text in texts:
+                parts.append(text)
+                await self.send("delta", content=text)
+        # Recorded only once the whole page is in, like diff_turn; a conflict is reported by run_turn.
+        html = "".join(parts)
+        await self.send("done", problems=processor.problems, **await self.finish(session, feedback, html, "full"))
@@ -0,0 +1,6 @@
+"""
+Pluggable route groups for app_factory.create_app().
+
+Each module exposes `router` and reads its services from `request.app.state`
+(llm, sessions, job_queue, deployer), so any subset can be mounted.
+"""
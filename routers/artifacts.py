@@ -0,0 +1,56 @@
+from fastapi import APIRouter, HTTPException, Request
+
+
+router = APIRouter()
+
+
+def artifact_or_404(store, artifact_id: str) -> dict:
+    artifact = store.get(artifact_id)
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    return artifact
+
+
+# --------- ARTIFACTS: STORED OUTPUTS, METADATA AND LINEAGE ----------
+@router.get("/artifacts/stats")
+async def artifact_stats(request: Request):
+    return request.app.state.artifacts.stats()
+
+
+@router.get("/artifacts/{artifact_id}")
+async def get_artifact(artifact_id: str, request: Request):
+    store = request.app.state.artifacts
+    artifact = artifact_or_404(store, artifact_id)
+    return {**artifact, "code": store.content(artifact["hash"])}
+
+
+@router.get("/artifacts/{artifact_id}/html")
+async def preview_artifact(artifact_id: str, request: Request):
+    """
+    The stored page as it would be deployed (optimized, see html_optimize.py)
+    and compressed. Cached and tagged by source hash + optimizer settings, so
+    the same key always means the same bytes and can be marked immutable.
+    """
+    store = request.app.state.artifacts
+    optimizer = request.app.state.optimizer
+    digest = artifact_or_404(store, artifact_id)["hash"]
+
+    def load():
+        content = store.content(digest)
+        if content is None:
+            return None
+        return optimizer.optimize(content)[0].encode("utf-8")
+
+    variants = request.app.state.assets.blob_variants(optimizer.output_key(digest), load)
+    if variants is None:
+        raise HTTPException(status_code=404, detail="Artifact content not found")
+    return request.app.state.assets.response(request, variants, "text/html", "public, max-age=31536000, immutable")
+
+
+@router.get("/artifacts/{artifact_id}/lineage")
+async def get_artifact_lineage(artifact_id: str, request: Request):
+    # newest first: the artifact, the page it was rectified from, and so on back to the generate
+    lineage = request.app.state.artifacts.lineage(artifact_id)
+    if not lineage:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    return {"artifact_id": artifact_id, "lineage": lineage}
@@ -0,0 +1,119 @@
+from contextlib import AsyncExitStack
+
+from fastapi import APIRouter, HTTPException, Request
+
+from artifacts import content_hash
+from html_optimize import log_optimization
+from http_pool import env_float
+from schemas import DeployBatchRequest, DeployBatchResponse, DeployRequest, DeployResponse, read_model
+from shared_state import lease
+
+
+router = APIRouter()
+
+# How long one worker may hold a blob's deploy lease (others wait up to this long).
+DEPLOY_LEASE_SECONDS = env_float("DEPLOY_LEASE_SECONDS", 60.0)
+
+
+def deploy_lease(request: Request, target: str, digest: str):
+    """Makes one worker upload a given blob to a target; the rest find its record afterwards."""
+    return lease(request.app.state.shared, f"deploy:{target}:{digest}", ttl=DEPLOY_LEASE_SECONDS, wait=DEPLOY_LEASE_SECONDS)
+
+
+# --------- DEPLOY: DEPLOYS CURRENT CODE AS NEW FILE ----------
+@router.post("/deploy", response_model=DeployResponse)
+async def deploy(request: Request):
+    body = await read_model(request, DeployRequest)
+    html_code = body.code
+    description = body.description or "App"
+
+    if not html_code:
+        raise HTTPException(status_code=400, detail="Code is required to deploy")
+
+    deployer = request.app.state.deployer
+    store = request.app.state.artifacts
+    digest = content_hash(html_code)
+
+    async with deploy_lease(request, deployer.target, digest):
+        # Identical HTML already on this repo/branch → hand back the existing file.
+        deployment = store.deployment(digest, deployer.target) if deployer.configured else None
+        deduplicated = deployment is not None
+        report = None
+        if not deduplicated:
+            # Uploaded minified; the record stays keyed on the source's hash (see html_optimize.py)
+            optimized, report = request.app.state.optimizer.optimize(html_code)
+            deployment = await deployer.deploy(optimized, description)
+            await store.record_deployment(digest, deployer.target, deployment)
+            log_optimization(report, hash=digest, path=deployment["path"])
+
+    return {
+        "repo_url": deployment["repo_url"],
+        "pages_url": deployment["pages_url"],
+        "filename": deployment["filename"],
+        "path": deployment["path"],
+        "deduplicated": deduplicated,
+        "bytes_saved": report["bytes_saved"] if report else None,
+    }
+
+
+# --------- BATCH DEPLOY: MANY APPS, ONE COMMIT ----------
+@router.post("/deploy/batch", response_model=DeployBatchResponse)
+async def deploy_batch(request: Request):
+    body = await read_model(request, DeployBatchRequest)
+    items = [{"code": item.code, "description": item.description} for item in body.items or []]
+
+    if not items:
+        raise HTTPException(status_code=400, detail="A non-empty list of items is required")
+    if any(not item["code"] for item in items):
+        raise HTTPException(status_code=400, detail="Every item needs code to deploy")
+
+    deployer = request.app.state.deployer
+    store = request.app.state.artifacts
+    digests = [content_hash(item["code"]) for item in items]
+
+    async with AsyncExitStack() as leases:
+        # Sorted, so two workers deploying overlapping batches cannot deadlock.
+        for digest in sorted(set(digests)):
+            await leases.enter_async_context(deploy_lease(request, deployer.target, digest))
+
+        # Only blobs not yet on this target are uploaded, each once even if repeated in the batch.
+        known = {}
+        pending = {}
+        if deployer.configured:
+            for digest in digests:
+                if digest not in known:
+                    known[digest] = store.deployment(digest, deployer.target)
+        for item, digest in zip(items, digests):
+            if known.get(digest) is None and digest not in pending:
+                pending[digest] = item
+
+        commit_sha = None
+        reports = {}
+        if pending:
+            optimizer = request.app.state.optimizer
+            uploads = []
+            for digest, item in pending.items():
+                optimized, reports[digest] = optimizer.optimize(item["code"])
+                uploads.append({**item, "code": optimized})
+            result = await deployer.deploy_batch(uploads)
+            commit_sha = result["commit_sha"]
+            for digest, info in zip(pending, result["files"]):
+                known[digest] = {"repo_url": result["repo_url"], **info}
+                await store.record_deployment(digest, deployer.target, known[digest])
+                log_optimization(reports[digest], hash=digest, path=info["path"])
+
+    uploaded = set(pending)
+    files = []
+    for digest in digests:
+        info = known[digest]
+        report = reports.get(digest) if digest in uploaded else None
+        files.append({
+            "pages_url": info["pages_url"],
+            "filename": info["filename"],
+            "path": info["path"],
+            "deduplicated": digest not in uploaded,
+            "bytes_saved": report["bytes_saved"] if report else None,
+        })
+        uploaded.discard(digest)  # later repeats inside the batch point at the same file
+
+    return {"repo_url": deployer.repo_url, "commit_sha": commit_sha, "files": files}
@@ -0,0 +1,98 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+
+from artifacts import record_artifact
+from candidates import candidate_count, candidates_response, generate_candidates
+from html_post import postprocess_html
+from llm_cache import cache_bypassed, replay_cached
+from prompts import build_messages, extract_requirements
+from schemas import GenerateRequest, GenerateResponse, read_model
+from similar import similar_mode, similar_outputs
+from streaming import stream_format, streaming_html_response
+
+
+router = APIRouter()
+
+
+def wants_html(request: Request, body: GenerateRequest) -> bool:
+    """{"format": "html"} or an Accept header that puts text/html first."""
+    if body.format:
+        return body.format.lower() == "html"
+    return request.headers.get("accept", "").split(",")[0].strip().startswith("text/html")
+
+
+def html_response(code: str, problems: list, fields: dict) -> Response:
+    """The page as the body, no JSON escaping; the other fields go in headers."""
+    headers = {"X-Problem-Count": str(len(problems))}
+    if fields.get("artifact_id"):
+        headers["X-Artifact-Id"] = fields["artifact_id"]
+    if fields.get("tier"):
+        headers["X-Model-Tier"] = fields["tier"]
+    return Response(code, media_type="text/html; charset=utf-8", headers=headers)
+
+
+# --------- GENERATE: ONLY GENERATES, DOES NOT DEPLOY ----------
+@router.post("/generate", response_model=GenerateResponse, response_model_exclude_unset=True)
+async def generate(request: Request):
+    body = await read_model(request, GenerateRequest)
+    description = body.description
+
+    if not description:
+        raise HTTPException(status_code=400, detail="Description is required")
+
+    llm = request.app.state.llm
+    models = request.app.state.models
+    # Simple widgets go to a smaller tier: model, max_tokens and prompt variant (model_routing.py)
+    requirements = extract_requirements(description)
+    route = models.route(requirements)
+    messages = build_messages(description, requirements, route["prompt_variant"])
+    routing = {"model": route["model"], "max_tokens": route["max_tokens"]}
+    use_cache = not cache_bypassed(request, body)
+
+    async def save(html: str, problems: list = None) -> dict:
+        # identical output is stored once (content hash); see artifacts.py
+        artifact = await record_artifact(request.app.state.artifacts, html, "generate", description)
+        await request.app.state.similar.add(description, artifact["id"])
+        models.record_outcome(route)
+        return {"artifact_id": artifact["id"], "tier": route["tier"]}
+
+    n = candidate_count(body)
+    fmt = stream_format(request, body)
+    as_html = not fmt and wants_html(request, body)
+
+    # A near-duplicate of an earlier description reuses that page (similar.py)
+    mode = similar_mode(request, body)
+    if n == 1 and mode != "off":
+        limit = 3 if mode == "offer" else 1
+        matches = await similar_outputs(request.app.state.similar, request.app.state.artifacts, description, limit)
+        if matches and mode == "offer":
+            # the client picks one (GET /artifacts/{id}) or asks again with "similar": "off"
+            return {"code": None, "similar": [{k: v for k, v in match.items() if k != "code"} for match in matches]}
+        if matches:
+            code = matches[0].pop("code")
+            reused = {"artifact_id": matches[0]["artifact_id"], "similar": matches[0]}
+            if fmt:
+                return streaming_html_response(replay_cached(code), fmt, on_done=lambda html, problems: reused)
+            if as_html:
+                return html_response(code, [], reused)
+            return {"code": code, "problems": [], **reused}
+
+    # {"candidates": N}: N completions at different temperatures, best one wins
+    if n > 1:
+        async def generate_one(temperature: float):
+            return postprocess_html(await llm.call(messages, use_cache=use_cache, temperature=temperature, **routing))
+
+        response = candidates_response(await generate_candidates(generate_one, n), ranked=bool(body.ranked))
+        if as_html:
+            return html_response(response["code"], response["problems"], await save(response["code"]))
+        return {**response, **await save(response["code"])}
+
+    if fmt:
+        return streaming_html_response(await llm.stream(messages, use_cache=use_cache, **routing), fmt, on_done=save)
+
+    html_code, problems = postprocess_html(await llm.call(messages, use_cache=use_cache, **routing))
+
+    # Only return code. NO GitHub deployment here.
+    if as_html:
+        return html_response(html_code, problems, await save(html_code))
+    return {"code": html_code, "problems": problems, **await save(html_code)}
@@ -0,0 +1,82 @@
+from fastapi import APIRouter, HTTPException, Request
+
+from artifacts import record_artifact
+from html_post import clean_html
+from jobs import QueueFull
+from llm_cache import cache_bypassed
+from prompts import build_messages, extract_requirements
+from schemas import GenerateRequest, read_model
+from similar import similar_mode, similar_outputs
+
+
+router = APIRouter()
+
+
+async def run_generate_job(llm, models, artifacts, similar, job: dict) -> dict:
+    params = job["params"]
+    if params.get("similar") == "serve":
+        for match in await similar_outputs(similar, artifacts, params["description"]):
+            return {"code": match.pop("code"), "artifact_id": match["artifact_id"], "similar": match}
+
+    requirements = extract_requirements(params["description"])
+    route = models.route(requirements)
+    html_code_raw = await llm.call(
+        build_messages(params["description"], requirements, route["prompt_variant"]),
+        use_cache=params.get("use_cache", True),
+        model=route["model"],
+        max_tokens=route["max_tokens"],
+    )
+    html_code = clean_html(html_code_raw)
+    artifact = await record_artifact(artifacts, html_code, "generate", params["description"])
+    await similar.add(params["description"], artifact["id"])
+    return {"code": html_code, "artifact_id": artifact["id"], "tier": route["tier"]}
+
+
+# --------- GENERATE AS A BACKGROUND JOB (SUBMIT + POLL) ----------
+@router.post("/jobs/generate", status_code=202)
+async def submit_generate_job(request: Request):
+    body = await read_model(request, GenerateRequest)
+    description = body.description
+
+    if not description:
+        raise HTTPException(status_code=400, detail="Description is required")
+
+    try:
+        job = await request.app.state.job_queue.submit(
+            "generate",
+            {
+                "description": description,
+                "use_cache": not cache_bypassed(request, body),
+                # "offer" needs a client to choose, so jobs either serve or skip
+                "similar": "serve" if similar_mode(request, body) == "serve" else "off",
+            },
+        )
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return {"job_id": job["id"], "status": job["status"], "status_url": f"/jobs/{job['id']}"}
+
+
+@router.get("/jobs/stats")
+async def job_stats(request: Request):
+    return request.app.state.job_queue.stats()
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, request: Request, wait: float = 0):
+    # wait > 0 long-polls until the job finishes or the timeout expires
+    job = await request.app.state.job_queue.wait(job_id, min(wait, 60))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "code": (job["result"] or {}).get("code"),
+        "artifact_id": (job["result"] or {}).get("artifact_id"),
+        "similar": (job["result"] or {}).get("similar"),
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+    }
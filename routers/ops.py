@@ -0,0 +1,74 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import PlainTextResponse
+
+from http_pool import pool_stats
+from metrics import render_metrics
+
+
+router = APIRouter()
+
+
+@router.get("/pool-stats")
+async def pool_stats_endpoint(request: Request):
+    return pool_stats(request.app.state.http_client)
+
+
+@router.get("/startup/stats")
+async def startup_stats(request: Request):
+    return request.app.state.startup
+
+
+@router.get("/cache/stats")
+async def cache_stats(request: Request):
+    return request.app.state.llm.cache.stats()
+
+
+@router.get("/inflight/stats")
+async def inflight_stats(request: Request):
+    return request.app.state.llm.inflight.stats()
+
+
+@router.get("/limiter/stats")
+async def limiter_stats(request: Request):
+    return request.app.state.llm.limiter.stats()
+
+
+@router.get("/retry/stats")
+async def retry_stats(request: Request):
+    return request.app.state.llm.retry.stats()
+
+
+@router.get("/usage/stats")
+async def usage_stats(request: Request):
+    return request.app.state.llm.usage.stats()
+
+
+@router.get("/routing/stats")
+async def routing_stats(request: Request):
+    return request.app.state.models.stats()
+
+
+@router.get("/shared/stats")
+async def shared_stats(request: Request):
+    return request.app.state.shared.stats()
+
+
+@router.get("/similar/stats")
+async def similar_stats(request: Request):
+    return request.app.state.similar.stats()
+
+
+@router.get("/optimize/stats")
+async def optimize_stats(request: Request):
+    return request.app.state.optimizer.stats()
+
+
+@router.get("/assets/stats")
+async def asset_stats(request: Request):
+    return request.app.state.assets.stats()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text format: request/phase latency histograms, token counters, stats gauges."""
+    return render_metrics()
@@ -0,0 +1,177 @@
+from fastapi import APIRouter, HTTPException, Request, WebSocket
+
+from artifacts import record_artifact
+from html_post import postprocess_html
+from llm_cache import cache_bypassed, replay_cached
+from metrics import log
+from prompts import build_rewrite_messages
+from rectify_edits import PatchError, build_edit_messages, patch_from_completion, rectify_mode
+from rectify_sessions import SessionConflict
+from rectify_ws import EditChannel
+from schemas import (
+    RectifyRequest,
+    RectifyResponse,
+    RectifySessionRequest,
+    RectifySessionResponse,
+    RectifyTurnRequest,
+    read_model,
+)
+from streaming import stream_format, streaming_html_response
+
+
+router = APIRouter()
+
+
+# --------- RECTIFY: SEARCH/REPLACE EDITS, FULL REWRITE AS FALLBACK ----------
+async def rectify_with_edits(llm, original_code: str, feedback: str, use_cache: bool = True, history: list = None):
+    """Asks for search/replace edits only; returns None if they do not apply cleanly."""
+    messages = build_edit_messages(original_code, feedback, history)
+    completion = await llm.call(messages, use_cache=use_cache)
+    try:
+        code, edit_count = patch_from_completion(original_code, completion)
+    except PatchError as e:
+        log("Diff rectify failed, falling back to a full rewrite", level="warning", error=str(e))
+        return None
+    # edit_count 0: the model sent a whole document instead of edits
+    return {"code": code, "mode": "diff" if edit_count else "full", "edits": edit_count}
+
+
+def artifact_saver(request: Request, parent_code: str, description: str = None):
+    """Stores a rectify result with the page it started from as parent; usable as a stream on_done."""
+    async def save(html: str, problems: list = None) -> dict:
+        artifact = await record_artifact(request.app.state.artifacts, html, "rectify", description, parent_code=parent_code)
+        return {"artifact_id": artifact["id"]}
+    return save
+
+
+@router.post("/rectify", response_model=RectifyResponse, response_model_exclude_unset=True)
+async def rectify(request: Request):
+    body = await read_model(request, RectifyRequest)
+    original_code = body.code
+    feedback = body.feedback
+
+    if not original_code or not feedback:
+        raise HTTPException(status_code=400, detail="Code and feedback are required")
+
+    llm = request.app.state.llm
+    save = artifact_saver(request, original_code)
+    use_cache = not cache_bypassed(request, body)
+    fmt = stream_format(request, body)
+
+    # Edits first: output tokens scale with the change, not the page.
+    if rectify_mode(body) == "diff":
+        result = await rectify_with_edits(llm, original_code, feedback, use_cache)
+        if result is not None:
+            result.update(await save(result["code"]))
+            return streaming_html_response(replay_cached(result["code"]), fmt) if fmt else result
+
+    messages = build_rewrite_messages(original_code, feedback)
+    if fmt:
+        return streaming_html_response(await llm.stream(messages, use_cache=use_cache), fmt, on_done=save)
+
+    updated_html, problems = postprocess_html(await llm.call(messages, use_cache=use_cache))
+
+    # Not redeploying here – just returning improved code (same behavior).
+    return {"code": updated_html, "mode": "full", "problems": problems, **await save(updated_html)}
+
+
+# --------- RECTIFY SESSIONS: SERVER KEEPS THE CODE + FEEDBACK HISTORY ----------
+def session_or_404(sessions, session_id: str) -> dict:
+    session = sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Rectify session not found or expired")
+    return session
+
+
+async def record_round(sessions, session: dict, feedback: str, code: str, mode: str) -> dict:
+    try:
+        return await sessions.record(session["id"], session["version"], feedback, code, mode)
+    except SessionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.post("/rectify/sessions", status_code=201, response_model=RectifySessionResponse, response_model_exclude_unset=True)
+async def create_rectify_session(request: Request):
+    body = await read_model(request, RectifySessionRequest)
+    code = body.code
+
+    if not code:
+        raise HTTPException(status_code=400, detail="Code is required to start a session")
+
+    session = await request.app.state.sessions.create(code, body.description)
+    return {"session_id": session["id"], "version": session["version"]}
+
+
+@router.get("/rectify/sessions/stats")
+async def rectify_session_stats(request: Request):
+    return request.app.state.sessions.stats()
+
+
+@router.get("/rectify/sessions/{session_id}", response_model=RectifySessionResponse)
+async def get_rectify_session(session_id: str, request: Request):
+    session = session_or_404(request.app.state.sessions, session_id)
+    return {
+        "session_id": session["id"],
+        "version": session["version"],
+        "code": session["code"],
+        "history": session["history"],
+    }
+
+
+@router.delete("/rectify/sessions/{session_id}")
+async def delete_rectify_session(session_id: str, request: Request):
+    if not await request.app.state.sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Rectify session not found or expired")
+    return {"deleted": session_id}
+
+
+@router.post("/rectify/sessions/{session_id}", response_model=RectifyResponse, response_model_exclude_unset=True)
+async def rectify_in_session(session_id: str, request: Request):
+    body = await read_model(request, RectifyTurnRequest)
+    feedback = body.feedback
+
+    if not feedback:
+        raise HTTPException(status_code=400, detail="Feedback is required")
+
+    llm = request.app.state.llm
+    sessions = request.app.state.sessions
+    session = session_or_404(sessions, session_id)
+    if body.version is not None and body.version != session["version"]:
+        raise HTTPException(status_code=409, detail=f"Session is at version {session['version']}")
+
+    # Only the new feedback is uploaded; the code and earlier rounds come from the session.
+    history = sessions.history_messages(session)
+    save = artifact_saver(request, session["code"], session["description"])
+    use_cache = not cache_bypassed(request, body)
+    fmt = stream_format(request, body)
+
+    async def finish(code: str, mode: str) -> dict:
+        """Records the round and the artifact; the same fields whether streamed ("done") or not."""
+        updated = await record_round(sessions, session, feedback, code, mode)
+        return {"session_id": session_id, "version": updated["version"], **await save(code)}
+
+    if rectify_mode(body) == "diff":
+        result = await rectify_with_edits(llm, session["code"], feedback, use_cache, history)
+        if result is not None:
+            result.update(await finish(result["code"], result["mode"]))
+            if fmt:
+                fields = {k: v for k, v in result.items() if k != "code"}
+                return streaming_html_response(replay_cached(result["code"]), fmt, on_done=lambda html, problems: fields)
+            return result
+
+    messages = build_rewrite_messages(session["code"], feedback, history)
+    if fmt:
+        async def on_done(html: str, problems: list) -> dict:
+            return {"mode": "full", **await finish(html, "full")}
+
+        return streaming_html_response(await llm.stream(messages, use_cache=use_cache), fmt, on_done=on_done)
+
+    updated_html, problems = postprocess_html(await llm.call(messages, use_cache=use_cache))
+    return {"code": updated_html, "mode": "full", "problems": problems, **await finish(updated_html, "full")}
+
+
+# --------- RECTIFY SESSIONS OVER A WEBSOCKET: STREAMED EDITS + CANCEL ----------
+@router.websocket("/rectify/sessions/{session_id}/ws")
+async def rectify_session_socket(websocket: WebSocket, session_id: str):
+    state = websocket.app.state
+    await EditChannel(websocket, state.llm, state.sessions, state.artifacts, session_id).run()
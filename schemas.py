@@ -0,0 +1,196 @@
+"""
+Typed request and response bodies for the JSON routes.
+
+`code` carries a 20-100 KB page each way on /rectify and /deploy, so JSON
+work shows up per request (see bench/serialization_bench.py):
+
+- read_model() parses and validates the raw bytes in one pass with
+  pydantic-core (model_validate_json), which beats json.loads on
+  escape-heavy HTML and needs no dict walk afterwards.
+- Routes declare a response_model, which skips jsonable_encoder's walk
+  over the returned dict. FastJSONResponse then writes it with orjson;
+  without orjson FastAPI's own pydantic dump_json path is used instead.
+"""
+import json
+from typing import Annotated, Any, Optional, Union
+
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+
+from http_pool import env_int
+from metrics import phase
+
+try:
+    import orjson
+except ImportError:  # stdlib json
+    orjson = None
+
+
+MAX_DESCRIPTION_CHARS = env_int("MAX_DESCRIPTION_CHARS", 4000)
+MAX_FEEDBACK_CHARS = env_int("MAX_FEEDBACK_CHARS", 8000)
+MAX_CODE_CHARS = env_int("MAX_CODE_CHARS", 1_000_000)
+MAX_BATCH_ITEMS = env_int("MAX_BATCH_ITEMS", 50)
+# Checked against Content-Length before the body is read.
+MAX_BODY_BYTES = env_int("MAX_BODY_BYTES", 8 * 1024 * 1024)
+
+Description = Annotated[Optional[str], Field(default=None, max_length=MAX_DESCRIPTION_CHARS)]
+Feedback = Annotated[Optional[str], Field(default=None, max_length=MAX_FEEDBACK_CHARS)]
+Code = Annotated[Optional[str], Field(default=None, max_length=MAX_CODE_CHARS)]
+
+
+def dumps(data: Any) -> str:
+    """JSON text for streamed events; orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(data).decode("utf-8")
+    return json.dumps(data)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+def response_class_options() -> dict:
+    """FastAPI(**...) kwargs: orjson responses, or FastAPI's default (and its dump_json fast path)."""
+    return {"default_response_class": FastJSONResponse} if orjson is not None else {}
+
+
+# ================================================================
+#   REQUEST BODIES
+# ================================================================
+class RequestBody(BaseModel):
+    """
+    Unknown fields are ignored, as before. get() keeps the helpers that
+    read options from a dict (cache_bypassed, stream_format, rectify_mode,
+    ...) working for both these models and WebSocket messages.
+    """
+
+    model_config = ConfigDict(extra="ignore")
+
+    cache: Optional[bool] = None
+    stream: Union[bool, str, None] = None
+
+    def get(self, name: str, default: Any = None) -> Any:
+        value = getattr(self, name, None)
+        return default if value is None else value
+
+
+class GenerateRequest(RequestBody):
+    description: Description
+    similar: Optional[str] = None
+    candidates: Optional[int] = None
+    ranked: Optional[bool] = None
+    # "html": answer with the page itself as text/html instead of JSON
+    format: Optional[str] = None
+
+
+class RectifyRequest(RequestBody):
+    code: Code
+    feedback: Feedback
+    mode: Optional[str] = None
+
+
+class RectifySessionRequest(RequestBody):
+    code: Code
+    description: Description
+
+
+class RectifyTurnRequest(RequestBody):
+    feedback: Feedback
+    mode: Optional[str] = None
+    version: Optional[int] = None
+
+
+class DeployRequest(RequestBody):
+    code: Code
+    description: Description
+
+
+class DeployBatchRequest(RequestBody):
+    items: Optional[list[DeployRequest]] = Field(default=None, max_length=MAX_BATCH_ITEMS)
+
+
+def _error_message(error: dict) -> str:
+    where = ".".join(str(part) for part in error["loc"])
+    return f"{where}: {error['msg']}" if where else error["msg"]
+
+
+async def read_model(request: Request, model: type) -> BaseModel:
+    """
+    Parses and validates the JSON body as `model`: 413 when it is over a
+    size limit, 400 for malformed JSON, 422 for wrong types.
+    """
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > MAX_BODY_BYTES:
+        raise HTTPException(status_code=413, detail=f"Request body is larger than {MAX_BODY_BYTES} bytes")
+
+    with phase("parse"):
+        raw = await request.body()
+        try:
+            return model.model_validate_json(raw or b"{}")
+        except ValidationError as e:
+            errors = e.errors(include_url=False, include_context=False, include_input=False)
+            if any(error["type"] == "json_invalid" for error in errors):
+                raise HTTPException(status_code=400, detail="Request body is not valid JSON")
+            if any(error["type"] in ("string_too_long", "too_long") for error in errors):
+                raise HTTPException(status_code=413, detail="; ".join(map(_error_message, errors)))
+            raise HTTPException(status_code=422, detail="; ".join(map(_error_message, errors)))
+
+
+# ================================================================
+#   RESPONSE BODIES (routes use response_model_exclude_unset, so only
+#   the fields a route actually returns are sent)
+# ================================================================
+class GenerateResponse(BaseModel):
+    code: Optional[str] = None
+    problems: list[str] = []
+    artifact_id: Optional[str] = None
+    tier: Optional[str] = None
+    # a match dict when a near-duplicate was served, a list of them in "offer" mode
+    similar: Union[dict, list, None] = None
+    score: Optional[float] = None
+    temperature: Optional[float] = None
+    candidates_ok: Optional[int] = None
+    candidates: Optional[list[dict]] = None
+
+
+class RectifyResponse(BaseModel):
+    code: str
+    mode: str
+    problems: list[str] = []
+    edits: Optional[int] = None
+    artifact_id: Optional[str] = None
+    session_id: Optional[str] = None
+    version: Optional[int] = None
+
+
+class RectifySessionResponse(BaseModel):
+    session_id: str
+    version: int
+    code: Optional[str] = None
+    history: Optional[list[dict]] = None
+
+
+class DeployResponse(BaseModel):
+    repo_url: str
+    pages_url: str
+    filename: str
+    path: str
+    deduplicated: bool
+    # html_optimize savings on the uploaded page; None when nothing was uploaded
+    bytes_saved: Optional[int] = None
+
+
+class DeployedFile(BaseModel):
+    pages_url: str
+    filename: str
+    path: str
+    deduplicated: bool
+    bytes_saved: Optional[int] = None
+
+
+class DeployBatchResponse(BaseModel):
+    repo_url: str
+    commit_sha: Optional[str] = None
+    files: list[DeployedFile]
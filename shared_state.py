@@ -0,0 +1,373 @@
+import asyncio
+import os
+import random
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import Callable, Optional
+
+from http_pool import env_float, env_int
+from metrics import log
+from sqlite_db import StateBusy, connect, transaction
+
+
+# ================================================================
+#   INTERFACE
+# ================================================================
+class SharedState(ABC):
+    """
+    State that every worker of an app sees: a key/value store with TTLs,
+    token buckets that are refilled and charged atomically, and leases
+    (expiring locks). Backends: MemorySharedState (one process) and
+    SQLiteSharedState (all workers on one host). A networked store plugs in
+    by implementing every abstract method (an incomplete backend fails when
+    it is constructed) and calling register_backend().
+    """
+
+    # True if other processes see the same state; in-process callers
+    # skip work the memory backend would only duplicate.
+    cross_process = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl: float):
+        ...
+
+    @abstractmethod
+    def take_tokens(self, requests: dict) -> float:
+        """
+        `requests` maps bucket name -> (amount, per_minute). Takes every
+        amount if all buckets have it and returns 0; otherwise takes nothing
+        and returns the seconds until they will.
+        """
+
+    @abstractmethod
+    def give_back(self, name: str, amount: float, per_minute: int):
+        ...
+
+    @abstractmethod
+    def available(self, name: str, per_minute: int) -> float:
+        ...
+
+    @abstractmethod
+    def try_claim(self, key: str, owner: str, ttl: float) -> bool:
+        """Takes the lease `key` for `ttl` seconds unless someone else holds it."""
+
+    @abstractmethod
+    def release(self, key: str, owner: str) -> bool:
+        """False if it could not be written right now; lease() retries (leases also expire)."""
+
+    @abstractmethod
+    def stats(self) -> dict:
+        ...
+
+
+def _refill(tokens: Optional[float], updated: float, per_minute: int, now: float) -> float:
+    capacity = float(per_minute)
+    if tokens is None:
+        return capacity
+    return min(capacity, tokens + (now - updated) * per_minute / 60.0)
+
+
+def _plan_take(levels: dict, requests: dict) -> float:
+    """0 if every bucket in `levels` covers its request, else the longest wait."""
+    delay = 0.0
+    for name, (amount, per_minute) in requests.items():
+        amount = min(amount, per_minute)
+        if levels[name] < amount:
+            delay = max(delay, (amount - levels[name]) / (per_minute / 60.0))
+    return delay
+
+
+# ================================================================
+#   IN-PROCESS BACKEND (DEFAULT, ONE WORKER)
+# ================================================================
+class MemorySharedState(SharedState):
+    def __init__(self):
+        self._values = {}  # key -> (expires_at, value)
+        self._buckets = {}  # name -> (tokens, updated)
+        self._leases = {}  # key -> (owner, expires_at)
+        self.counters = {"claims": 0, "claim_conflicts": 0}
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._values.get(key)
+        if entry is None or entry[0] <= time.time():
+            self._values.pop(key, None)
+            return None
+        return entry[1]
+
+    def set(self, key: str, value: str, ttl: float):
+        self._values[key] = (time.time() + ttl, value)
+
+    def _level(self, name: str, per_minute: int, now: float) -> float:
+        tokens, updated = self._buckets.get(name, (None, now))
+        return _refill(tokens, updated, per_minute, now)
+
+    def take_tokens(self, requests: dict) -> float:
+        now = time.time()
+        levels = {name: self._level(name, per_minute, now) for name, (_, per_minute) in requests.items()}
+        delay = _plan_take(levels, requests)
+        for name, (amount, per_minute) in requests.items():
+            taken = 0 if delay else min(amount, per_minute)
+            self._buckets[name] = (levels[name] - taken, now)
+        return delay
+
+    def give_back(self, name: str, amount: float, per_minute: int):
+        now = time.time()
+        self._buckets[name] = (min(float(per_minute), self._level(name, per_minute, now) + amount), now)
+
+    def available(self, name: str, per_minute: int) -> float:
+        return self._level(name, per_minute, time.time())
+
+    def try_claim(self, key: str, owner: str, ttl: float) -> bool:
+        holder = self._leases.get(key)
+        if holder is not None and holder[0] != owner and holder[1] > time.time():
+            self.counters["claim_conflicts"] += 1
+            return False
+        self._leases[key] = (owner, time.time() + ttl)
+        self.counters["claims"] += 1
+        return True
+
+    def release(self, key: str, owner: str) -> bool:
+        if self._leases.get(key, (None,))[0] == owner:
+            del self._leases[key]
+        return True
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "values": len(self._values), "leases": len(self._leases), **self.counters}
+
+
+# ================================================================
+#   SQLITE BACKEND (EVERY WORKER ON ONE HOST)
+# ================================================================
+class SQLiteSharedState(SharedState):
+    """
+    One SQLite file in WAL mode, opened by every worker. Token buckets are
+    refilled and charged inside BEGIN IMMEDIATE, so concurrent workers
+    never spend the same tokens twice.
+
+    Statements run on the event loop, so a write waits at most
+    `busy_timeout` seconds (a few ms) for another worker's lock instead of
+    blocking the loop. When it is still held the write is not made:
+    take_tokens() returns a short delay and try_claim() / release() return
+    False, which the limiter and lease() retry asynchronously; cache
+    writes and token give-backs are skipped. Reads never wait in WAL mode.
+    """
+
+    cross_process = True
+    # what take_tokens() asks the limiter to wait when the lock is busy
+    busy_retry_seconds = 0.02
+
+    def __init__(self, path: str, max_values: int = 10000, busy_timeout: float = 0.005):
+        self.path = path
+        self.max_values = max_values
+        self._db = connect(
+            path,
+            "PRAGMA synchronous=NORMAL;"
+            "CREATE TABLE IF NOT EXISTS shared_values ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, created_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS shared_values_created ON shared_values (created_at);"
+            "CREATE TABLE IF NOT EXISTS shared_buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS shared_leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL);",
+            busy_timeout=busy_timeout,
+        )
+        self._lock = threading.Lock()  # the connection is shared with worker threads (e.g. to_thread callers)
+        self._sets = 0
+        self.counters = {"claims": 0, "claim_conflicts": 0, "evictions": 0, "busy": 0}
+
+    def _transaction(self, fn: Callable):
+        with self._lock:
+            try:
+                return transaction(self._db, fn)
+            except StateBusy:
+                self.counters["busy"] += 1
+                raise
+
+    # ---------------- values ----------------
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM shared_values WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl: float):
+        now = time.time()
+
+        def write():
+            self._db.execute(
+                "INSERT OR REPLACE INTO shared_values (key, value, expires_at, created_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl, now),
+            )
+            self._sets += 1
+            if self._sets % 100 == 0:  # housekeeping, not on every write
+                self._db.execute("DELETE FROM shared_values WHERE expires_at <= ?", (now,))
+                overflow = self._db.execute("SELECT COUNT(*) FROM shared_values").fetchone()[0] - self.max_values
+                if overflow > 0:
+                    self._db.execute(
+                        "DELETE FROM shared_values WHERE key IN (SELECT key FROM shared_values ORDER BY created_at LIMIT ?)",
+                        (overflow,),
+                    )
+                    self.counters["evictions"] += overflow
+
+        try:
+            self._transaction(write)
+        except StateBusy:
+            pass  # a shared cache entry is an optimization; this worker still has it locally
+
+    # ---------------- token buckets ----------------
+    def _levels(self, requests: dict, now: float) -> dict:
+        levels = {}
+        for name, (_, per_minute) in requests.items():
+            row = self._db.execute("SELECT tokens, updated FROM shared_buckets WHERE name = ?", (name,)).fetchone()
+            levels[name] = _refill(row[0] if row else None, row[1] if row else now, per_minute, now)
+        return levels
+
+    def take_tokens(self, requests: dict) -> float:
+        def take():
+            now = time.time()
+            levels = self._levels(requests, now)
+            delay = _plan_take(levels, requests)
+            for name, (amount, per_minute) in requests.items():
+                taken = 0 if delay else min(amount, per_minute)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO shared_buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                    (name, levels[name] - taken, now),
+                )
+            return delay
+
+        try:
+            return self._transaction(take)
+        except StateBusy:
+            return self.busy_retry_seconds
+
+    def give_back(self, name: str, amount: float, per_minute: int):
+        def give():
+            now = time.time()
+            level = self._levels({name: (0, per_minute)}, now)[name]
+            self._db.execute(
+                "INSERT OR REPLACE INTO shared_buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                (name, min(float(per_minute), level + amount), now),
+            )
+
+        try:
+            self._transaction(give)
+        except StateBusy:
+            pass  # the bucket refills on its own; giving back is only an early refund
+
+    def available(self, name: str, per_minute: int) -> float:
+        with self._lock:
+            return self._levels({name: (0, per_minute)}, time.time())[name]
+
+    # ---------------- leases ----------------
+    def try_claim(self, key: str, owner: str, ttl: float) -> bool:
+        def claim():
+            now = time.time()
+            row = self._db.execute("SELECT owner, expires_at FROM shared_leases WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[0] != owner and row[1] > now:
+                return False
+            self._db.execute(
+                "INSERT OR REPLACE INTO shared_leases (key, owner, expires_at) VALUES (?, ?, ?)", (key, owner, now + ttl)
+            )
+            return True
+
+        try:
+            claimed = self._transaction(claim)
+        except StateBusy:
+            return False
+        self.counters["claims" if claimed else "claim_conflicts"] += 1
+        return claimed
+
+    def release(self, key: str, owner: str) -> bool:
+        def delete():
+            self._db.execute("DELETE FROM shared_leases WHERE key = ? AND owner = ?", (key, owner))
+
+        try:
+            self._transaction(delete)
+        except StateBusy:
+            return False
+        return True
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            values = self._db.execute("SELECT COUNT(*) FROM shared_values WHERE expires_at > ?", (now,)).fetchone()[0]
+            leases = self._db.execute("SELECT COUNT(*) FROM shared_leases WHERE expires_at > ?", (now,)).fetchone()[0]
+        return {"backend": "sqlite", "values": values, "leases": leases, **self.counters}
+
+
+# ================================================================
+#   LEASES AS ASYNC CONTEXT MANAGERS
+# ================================================================
+LEASE_POLL_MAX = 1.0      # seconds between claim attempts, after backing off
+LEASE_RELEASE_TRIES = 8
+
+
+@asynccontextmanager
+async def lease(shared: SharedState, key: str, ttl: float = 60.0, wait: float = 60.0, poll: float = 0.05):
+    """
+    Holds `key` across workers while the block runs. Waits up to `wait`
+    seconds for another holder, polling from `poll` seconds and backing off
+    to LEASE_POLL_MAX; after that the block runs anyway (yielding False),
+    since a stuck lease must not block requests for good. Leases expire
+    after `ttl`, so a crashed worker frees them.
+    """
+    owner = uuid.uuid4().hex
+    deadline = time.monotonic() + wait
+    held = shared.try_claim(key, owner, ttl)
+    while not held:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        await asyncio.sleep(min(poll, remaining) * random.uniform(0.8, 1.2))
+        poll = min(poll * 2, LEASE_POLL_MAX)
+        held = shared.try_claim(key, owner, ttl)
+    if not held:
+        log("Lease wait timed out, continuing without it", level="warning", key=key)
+    try:
+        yield held
+    finally:
+        if held:
+            await _release(shared, key, owner)
+
+
+async def _release(shared: SharedState, key: str, owner: str):
+    delay = 0.01
+    for _ in range(LEASE_RELEASE_TRIES):
+        if shared.release(key, owner):
+            return
+        await asyncio.sleep(delay)
+        delay *= 2
+    log("Lease release kept failing; it frees itself when it expires", level="warning", key=key)
+
+
+# ================================================================
+#   BACKEND SELECTION
+# ================================================================
+BACKENDS = {
+    "memory": lambda location: MemorySharedState(),
+    "sqlite": lambda location: SQLiteSharedState(
+        location,
+        max_values=env_int("SHARED_STATE_MAX_VALUES", 10000),
+        busy_timeout=env_float("SHARED_STATE_BUSY_MS", 5.0) / 1000,
+    ),
+}
+
+
+def register_backend(scheme: str, factory: Callable[[str], SharedState]):
+    """Makes SHARED_STATE_URL=<scheme>://<location> build `factory(location)` (e.g. a Redis-backed store)."""
+    BACKENDS[scheme] = factory
+
+
+def shared_state_from_env() -> SharedState:
+    # memory:// (default), sqlite:///var/run/app/shared.db, or any registered scheme
+    url = os.getenv("SHARED_STATE_URL", "memory://")
+    scheme, _, location = url.partition("://")
+    if scheme not in BACKENDS:
+        raise ValueError(f"Unknown SHARED_STATE_URL scheme {scheme!r}; known: {sorted(BACKENDS)}")
+    return BACKENDS[scheme](location)
@@ -0,0 +1,242 @@
+import hashlib
+import os
+import re
+import struct
+import time
+from collections import OrderedDict
+
+from fastapi import Request
+
+from http_pool import env_float, env_int
+from llm_cache import cache_bypassed
+from metrics import log, record_phase
+from sqlite_db import StateBusy, connect, write
+
+
+SIMILAR_MODES = ("serve", "offer", "off")
+
+# Function words only; anything that can carry intent ("simple", "create", "app", ...) counts.
+STOPWORDS = frozenset(
+    "a an the and or but of to in on at by for with from as that which who whom whose where "
+    "this these those it its is are was were be been i we you me my our your".split()
+)
+
+
+def similar_mode(request: Request, body: dict) -> str:
+    """
+    {"similar": "serve" | "offer" | "off"}; SIMILAR_MODE sets the default
+    ("off": a near-duplicate is only reused when a client asks for it).
+    Bypassing the cache (see llm_cache.cache_bypassed) or an unknown mode
+    also turns it off.
+    """
+    if cache_bypassed(request, body):
+        return "off"
+    mode = str(body.get("similar") or os.getenv("SIMILAR_MODE", "off")).lower()
+    return mode if mode in SIMILAR_MODES else "off"
+
+
+def shingles(description: str) -> frozenset:
+    """Content words plus adjacent word pairs, so word order counts a little."""
+    words = [w for w in re.findall(r"[a-z0-9]+", description.lower()) if w not in STOPWORDS]
+    return frozenset(words + [f"{a} {b}" for a, b in zip(words, words[1:])])
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+# ================================================================
+#   MINHASH + LSH INDEX OVER PAST DESCRIPTIONS
+# ================================================================
+class DescriptionIndex:
+    """
+    Finds earlier descriptions that say nearly the same thing, so their
+    generated page can be reused instead of paying for a new completion.
+
+    Each description becomes a set of word shingles and a MinHash signature
+    (`num_perm` hashes). Signatures are split into `bands`; two descriptions
+    sharing any band land in the same bucket and become candidates, whose
+    exact Jaccard similarity is then checked against `threshold`. Lookups
+    touch a handful of buckets, not the whole index.
+
+    Entries point at artifacts (artifacts.py), are kept in SQLite so the
+    index survives restarts, and the least recently used are dropped once
+    there are more than `max_entries`. Lookups never write: the use times
+    of hits are saved with the next add().
+    """
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        threshold: float = 0.8,
+        max_entries: int = 10000,
+        num_perm: int = 64,
+        bands: int = 16,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.bands = bands
+        self.num_perm = num_perm
+        self.rows = num_perm // bands
+        self._unpack = struct.Struct(f"<{num_perm}I").unpack
+
+        self._entries = OrderedDict()  # key -> entry, least recently used first
+        self._touched = {}  # key -> used_at of lookup hits not yet saved
+        self._buckets = {}  # (band, band hashes) -> set of keys
+        self.counters = {"lookups": 0, "hits": 0, "misses": 0, "added": 0, "evicted": 0}
+        self._lookup_seconds = 0.0
+
+        self._db = connect(
+            path,
+            "CREATE TABLE IF NOT EXISTS description_index ("
+            " key TEXT PRIMARY KEY, description TEXT NOT NULL, artifact_id TEXT NOT NULL,"
+            " signature BLOB NOT NULL, used_at REAL NOT NULL)",
+        )
+        self._load()
+
+    def signature(self, words: frozenset) -> tuple:
+        # One SHAKE-128 digest per word gives `num_perm` independent 32-bit
+        # hashes; the signature is their element-wise minimum.
+        hashes = [self._unpack(hashlib.shake_128(word.encode("utf-8")).digest(4 * self.num_perm)) for word in words]
+        return tuple(map(min, zip(*hashes)))
+
+    def _band_keys(self, signature: tuple) -> list:
+        return [(band, signature[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+    def _insert(self, key: str, entry: dict):
+        self._entries[key] = entry
+        for band_key in self._band_keys(entry["signature"]):
+            self._buckets.setdefault(band_key, set()).add(key)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        for band_key in self._band_keys(entry["signature"]):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def _load(self):
+        rows = self._db.execute(
+            "SELECT key, description, artifact_id, signature FROM description_index ORDER BY used_at DESC LIMIT ?",
+            (self.max_entries,),
+        ).fetchall()
+        for key, description, artifact_id, blob in reversed(rows):
+            signature = struct.unpack(f"<{len(blob) // 4}I", blob)
+            if len(signature) != self.num_perm:
+                continue  # written with another num_perm
+            self._insert(key, {
+                "description": description,
+                "artifact_id": artifact_id,
+                "words": shingles(description),
+                "signature": signature,
+            })
+
+    # ---------------- lookup / add ----------------
+    def lookup(self, description: str, limit: int = 1) -> list:
+        """Up to `limit` {description, artifact_id, score} at or above the threshold, best first."""
+        started = time.perf_counter()
+        words = shingles(description)
+        matches = []
+        if words:
+            candidates = set()
+            for band_key in self._band_keys(self.signature(words)):
+                candidates |= self._buckets.get(band_key, set())
+            for key in candidates:
+                entry = self._entries[key]
+                score = jaccard(words, entry["words"])
+                if score >= self.threshold:
+                    matches.append({"description": entry["description"], "artifact_id": entry["artifact_id"], "score": round(score, 3), "key": key})
+            matches.sort(key=lambda match: -match["score"])
+            matches = matches[:limit]
+            for match in matches:
+                key = match.pop("key")
+                self._entries.move_to_end(key)
+                self._touched[key] = time.time()
+
+        elapsed = time.perf_counter() - started
+        self._lookup_seconds += elapsed
+        self.counters["lookups"] += 1
+        self.counters["hits" if matches else "misses"] += 1
+        record_phase("similar_lookup", elapsed)
+        return matches
+
+    async def add(self, description: str, artifact_id: str):
+        """Indexes a description; a rewording with the same words just points at the newer artifact."""
+        words = shingles(description)
+        if not words:
+            return
+        key = "\x1f".join(sorted(words))
+        if key in self._entries:
+            self._remove(key)
+        signature = self.signature(words)
+        self._insert(key, {"description": description, "artifact_id": artifact_id, "words": words, "signature": signature})
+        self.counters["added"] += 1
+        evicted = []
+        while len(self._entries) > self.max_entries:
+            evicted.append(next(iter(self._entries)))
+            self._remove(evicted[-1])
+            self.counters["evicted"] += 1
+        touched, self._touched = self._touched, {}
+        row = (key, description, artifact_id, struct.pack(f"<{len(signature)}I", *signature), time.time())
+
+        def save():
+            self._db.execute(
+                "INSERT OR REPLACE INTO description_index (key, description, artifact_id, signature, used_at) VALUES (?, ?, ?, ?, ?)",
+                row,
+            )
+            self._db.executemany("DELETE FROM description_index WHERE key = ?", [(k,) for k in evicted])
+            self._db.executemany("UPDATE description_index SET used_at = ? WHERE key = ?", [(t, k) for k, t in touched.items()])
+
+        await self._save(save)
+
+    async def forget(self, artifact_id: str):
+        """Drops entries whose artifact is gone (e.g. the artifact store was reset)."""
+        stale = [key for key, entry in self._entries.items() if entry["artifact_id"] == artifact_id]
+        for key in stale:
+            self._remove(key)
+            self._touched.pop(key, None)
+        if stale:
+            await self._save(lambda: self._db.executemany("DELETE FROM description_index WHERE key = ?", [(k,) for k in stale]))
+
+    async def _save(self, fn):
+        # The in-memory index is already updated; persisting it only matters after a restart.
+        try:
+            await write(self._db, fn)
+        except StateBusy as e:
+            log("Description index not saved", level="warning", error=str(e))
+
+    def stats(self) -> dict:
+        lookups = self.counters["lookups"]
+        return {
+            "entries": len(self._entries),
+            "buckets": len(self._buckets),
+            "threshold": self.threshold,
+            **self.counters,
+            "avg_lookup_us": round(self._lookup_seconds / lookups * 1e6, 1) if lookups else 0.0,
+        }
+
+
+async def similar_outputs(index: DescriptionIndex, store, description: str, limit: int = 1) -> list:
+    """Index matches whose page is still in the artifact store, each with its `code`."""
+    found = []
+    for match in index.lookup(description, limit):
+        artifact = store.get(match["artifact_id"])
+        code = store.content(artifact["hash"]) if artifact else None
+        if code is None:
+            await index.forget(match["artifact_id"])
+            continue
+        found.append({**match, "code": code})
+    return found
+
+
+def description_index_from_env() -> DescriptionIndex:
+    # Same SQLite file as the artifact store unless SIMILAR_DB_PATH says otherwise
+    return DescriptionIndex(
+        os.getenv("SIMILAR_DB_PATH") or os.getenv("ARTIFACT_DB_PATH", "artifacts.db"),
+        threshold=env_float("SIMILAR_THRESHOLD", 0.8),
+        max_entries=env_int("SIMILAR_MAX_ENTRIES", 10000),
+    )
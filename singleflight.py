@@ -0,0 +1,61 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable
+
+
+# ================================================================
+#   SINGLE-FLIGHT COALESCING
+# ================================================================
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Runs at most one `fn()` per key at a time. Callers that arrive while a
+    call for the same key is in flight await that call instead of starting
+    their own, and all of them receive its result (or exception).
+
+    Cancellation: a waiter that is cancelled (e.g. its client disconnected)
+    only stops waiting. The shared call keeps running for the others and is
+    cancelled only when the last waiter has gone.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.counters = {"leaders": 0, "followers": 0, "abandoned": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _task: self._forget(key, call))
+            self.counters["leaders"] += 1
+        else:
+            self.counters["followers"] += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                # Last interested caller left: stop paying for the upstream call.
+                self._forget(key, call)
+                call.task.cancel()
+                self.counters["abandoned"] += 1
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _forget(self, key: Hashable, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "waiters": sum(call.waiters for call in self._calls.values()),
+            **self.counters,
+        }
@@ -0,0 +1,81 @@
+import asyncio
+import random
+import sqlite3
+import time
+from typing import Callable
+
+
+# Seconds a statement on the event loop waits for another worker's write lock.
+BUSY_TIMEOUT = 0.005
+# Seconds write() keeps retrying before it gives up with StateBusy.
+WRITE_WAIT = 10.0
+WRITE_POLL_MAX = 0.25
+
+
+class StateBusy(Exception):
+    """Another worker holds the write lock; the caller should try again shortly."""
+
+
+# ================================================================
+#   CONNECTIONS SHARED BY SEVERAL WORKERS
+# ================================================================
+def connect(path: str, schema: str = "", busy_timeout: float = BUSY_TIMEOUT) -> sqlite3.Connection:
+    """
+    Opens a store's SQLite file (WAL, so reads never wait for writers)
+    and creates `schema`. Setup may wait the usual 5 s for other workers
+    starting at the same time; afterwards a statement waits at most
+    `busy_timeout` for a lock, since it runs on the event loop. Writes go
+    through transaction() or write(); isolation_level=None leaves every
+    transaction to them.
+    """
+    db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    if path != ":memory:":
+        db.execute("PRAGMA journal_mode=WAL")
+    if schema:
+        db.executescript(schema)
+    db.execute(f"PRAGMA busy_timeout = {max(1, round(busy_timeout * 1000))}")
+    return db
+
+
+def _busy(error: sqlite3.OperationalError) -> StateBusy:
+    message = str(error).lower()
+    if "locked" not in message and "busy" not in message:
+        raise error
+    return StateBusy(str(error))
+
+
+def transaction(db: sqlite3.Connection, fn: Callable):
+    """Runs `fn` in one write transaction; raises StateBusy if the lock stays taken."""
+    try:
+        db.execute("BEGIN IMMEDIATE")
+    except sqlite3.OperationalError as e:
+        raise _busy(e) from e
+    try:
+        result = fn()
+        db.execute("COMMIT")
+    except sqlite3.OperationalError as e:
+        db.execute("ROLLBACK")
+        raise _busy(e) from e
+    except BaseException:
+        db.execute("ROLLBACK")
+        raise
+    return result
+
+
+async def write(db: sqlite3.Connection, fn: Callable, wait: float = WRITE_WAIT):
+    """
+    transaction(), retried with jittered backoff while another worker
+    writes; the event loop serves other requests in between. `fn` may run
+    more than once, so it must only touch the database. Raises StateBusy
+    after `wait` seconds.
+    """
+    deadline = time.monotonic() + wait
+    delay = 0.005
+    while True:
+        try:
+            return transaction(db, fn)
+        except StateBusy:
+            if time.monotonic() >= deadline:
+                raise
+        await asyncio.sleep(delay * random.uniform(0.8, 1.2))
+        delay = min(delay * 2, WRITE_POLL_MAX)
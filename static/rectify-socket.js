@@ -0,0 +1,99 @@
+// Rectify rounds over a WebSocket bound to a rectify session
+// (/rectify/sessions/{id}/ws). Only the feedback goes up; the server sends
+// back the rewritten HTML as "delta" events or exact edits as "patch"
+// splices, and a running round can be stopped with cancelRectifyOverSocket().
+(function () {
+  let socket = null; // { sessionUrl, ws, ready, turn }
+
+  function socketUrl(sessionUrl) {
+    const scheme = location.protocol === 'https:' ? 'wss://' : 'ws://';
+    return scheme + location.host + sessionUrl + '/ws';
+  }
+
+  function connect(sessionUrl) {
+    if (socket && socket.sessionUrl === sessionUrl) return socket.ready;
+    if (socket) socket.ws.close();
+
+    const current = { sessionUrl, ws: new WebSocket(socketUrl(sessionUrl)), turn: null };
+    current.ready = new Promise((resolve, reject) => {
+      current.ws.onmessage = (message) => {
+        const event = JSON.parse(message.data);
+        if (event.type === 'ready') resolve(current);
+        else if (current.turn) current.turn(event);
+      };
+      current.ws.onclose = (e) => {
+        if (socket === current) socket = null;
+        // `closed` tells the caller to fall back to plain HTTP
+        const error = new Error(e.reason || 'Connection closed');
+        error.closed = true;
+        reject(error);
+        if (current.turn) current.turn({ type: 'closed', error });
+      };
+    });
+    socket = current;
+    return current.ready;
+  }
+
+  function applySplices(code, splices) {
+    // Offsets are UTF-16 code units, like JavaScript string indices.
+    for (const s of splices) code = code.slice(0, s.start) + s.text + code.slice(s.end);
+    return code;
+  }
+
+  // Resolves with the new HTML. `code` must be the session's current code.
+  window.rectifyOverSocket = async function (sessionUrl, code, feedback, onProgress, onStatus) {
+    const current = await connect(sessionUrl);
+
+    return new Promise((resolve, reject) => {
+      let patched = code;
+      let streamed = '';
+      const fail = (message, fields) => {
+        current.turn = null;
+        reject(Object.assign(new Error(message), fields));
+      };
+
+      current.turn = (event) => {
+        switch (event.type) {
+          case 'progress':
+            if (onStatus) onStatus(event.chars ? `Improving code... (${event.chars} chars)` : 'Improving code...');
+            break;
+          case 'delta':
+            streamed += event.content;
+            onProgress(streamed);
+            break;
+          case 'patch':
+            patched = applySplices(patched, event.splices);
+            onProgress(patched);
+            break;
+          case 'done': {
+            current.turn = null;
+            const result = event.mode === 'diff' ? patched : streamed;
+            if (result.length === event.length) return resolve(result);
+            // Out of sync: take the code from the session instead.
+            fetch(sessionUrl).then((r) => r.json()).then((s) => resolve(s.code), reject);
+            break;
+          }
+          case 'cancelled':
+            fail('Cancelled', { cancelled: true });
+            break;
+          case 'conflict':
+            // The session moved on elsewhere; nothing was recorded.
+            fail(event.error, { status: 409, conflict: true, version: event.version });
+            break;
+          case 'error':
+            fail(event.error, { status: event.status });
+            break;
+          case 'closed':
+            current.turn = null;
+            reject(event.error);
+            break;
+        }
+      };
+      current.ws.send(JSON.stringify({ type: 'feedback', feedback }));
+    });
+  };
+
+  window.cancelRectifyOverSocket = function () {
+    if (socket && socket.turn) socket.ws.send(JSON.stringify({ type: 'cancel' }));
+  };
+})();
@@ -0,0 +1,130 @@
+import inspect
+import time
+from contextlib import aclosing
+from typing import AsyncIterator, Callable, Optional
+
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from html_post import HtmlPostProcessor
+from metrics import log, record_phase
+from schemas import dumps
+
+
+# ================================================================
+#   WIRE FORMATS (SSE / NDJSON)
+# ================================================================
+STREAM_MEDIA_TYPES = {
+    "sse": "text/event-stream",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def stream_format(request: Request, body: dict) -> Optional[str]:
+    """
+    Returns "sse", "ndjson" or None (non-streaming). Opt in with
+    {"stream": true | "sse" | "ndjson"} in the body or via the Accept header.
+    """
+    stream = body.get("stream")
+    if isinstance(stream, str) and stream.lower() in STREAM_MEDIA_TYPES:
+        return stream.lower()
+
+    accept = request.headers.get("accept", "")
+    if "text/event-stream" in accept:
+        return "sse"
+    if "application/x-ndjson" in accept:
+        return "ndjson"
+
+    return "ndjson" if stream is True else None
+
+
+def encode_event(fmt: str, event: str, data: dict) -> str:
+    if fmt == "sse":
+        return f"event: {event}\ndata: {dumps(data)}\n\n"
+    return dumps({"type": event, **data}) + "\n"
+
+
+async def postprocessed(chunks: AsyncIterator[str], processor: HtmlPostProcessor) -> AsyncIterator[str]:
+    """
+    Model tokens through `processor` (html_post.py), as soon as each
+    piece is safe to show; its `problems` are final once this ends. The
+    time spent is recorded as the "postprocess" phase.
+    """
+    spent = 0.0  # post-processing time, summed across chunks
+    try:
+        async for chunk in chunks:
+            started = time.perf_counter()
+            text = processor.feed(chunk)
+            spent += time.perf_counter() - started
+            if text:
+                yield text
+        started = time.perf_counter()
+        text = processor.flush()
+        spent += time.perf_counter() - started
+        if text:
+            yield text
+    finally:
+        record_phase("postprocess", spent)
+
+
+async def html_event_stream(
+    chunks: AsyncIterator[str],
+    fmt: str,
+    on_done: Optional[Callable[[str, list], Optional[dict]]] = None,
+) -> AsyncIterator[str]:
+    """
+    Forwards model tokens as "delta" events, post-processed on the fly,
+    then a final "done" event listing any structural problems (or "error"
+    if the upstream stream breaks). `on_done` gets the final HTML and
+    problems; fields it returns (or awaits) are added to "done", and an
+    HTTPException it raises becomes an "error" with its status.
+    """
+    processor = HtmlPostProcessor()
+    parts = []
+    try:
+        async with aclosing(postprocessed(chunks, processor)) as texts:
+            async for text in texts:
+                parts.append(text)
+                yield encode_event(fmt, "delta", {"content": text})
+        extra = on_done("".join(parts), processor.problems) if on_done else None
+        if inspect.isawaitable(extra):
+            extra = await extra
+        yield encode_event(fmt, "done", {"problems": processor.problems, **(extra or {})})
+    except HTTPException as e:
+        yield encode_event(fmt, "error", {"error": e.detail, "status": e.status_code})
+    except Exception as e:
+        log("Streaming error", level="error", error=str(e))
+        yield encode_event(fmt, "error", {"error": str(e)})
+
+
+def streaming_html_response(
+    chunks: AsyncIterator[str],
+    fmt: str,
+    on_done: Optional[Callable[[str, list], Optional[dict]]] = None,
+) -> StreamingResponse:
+    return StreamingResponse(
+        html_event_stream(chunks, fmt, on_done),
+        media_type=STREAM_MEDIA_TYPES[fmt],
+        # Stop proxies (nginx) from buffering the stream.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ================================================================
+#   UPSTREAM CHUNK SOURCES
+# ================================================================
+async def openai_deltas(stream, on_usage: Optional[Callable] = None) -> AsyncIterator[str]:
+    """
+    Yields content deltas from an AsyncOpenAI chat.completions stream.
+    With stream_options={"include_usage": True} the last chunk carries
+    `usage`, which is handed to `on_usage`.
+    """
+    try:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            if on_usage and getattr(chunk, "usage", None):
+                on_usage(chunk.usage)
+    finally:
+        await stream.close()
+
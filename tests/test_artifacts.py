@@ -0,0 +1,60 @@
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from artifacts import ArtifactStore, content_hash  # noqa: E402
+
+
+def put_all(store: ArtifactStore, contents: list) -> list:
+    async def run():
+        return [await store.put(content, "generate") for content in contents]
+    return asyncio.run(run())
+
+
+def test_identical_content_is_stored_once():
+    store = ArtifactStore()
+    first, second = put_all(store, ["<html>a</html>", "<html>a</html>"])
+    assert first["id"] != second["id"] and first["hash"] == second["hash"]
+    stats = store.stats()
+    assert (stats["artifacts"], stats["blobs"], stats["stored"], stats["deduplicated"]) == (2, 1, 1, 1)
+
+
+def test_prunes_in_batches_down_to_low_water():
+    store = ArtifactStore(max_artifacts=10)
+    store.PRUNE_EVERY = 5
+    put_all(store, [f"<html>{i}</html>" for i in range(11)])
+    # passes run on writes 1, 6 and 11: the last finds 11 rows and keeps 9
+    stats = store.stats()
+    assert (stats["artifacts"], stats["blobs"], stats["evicted"]) == (9, 9, 2)
+    assert store.content(content_hash("<html>0</html>")) is None
+    assert store.content(content_hash("<html>10</html>")) is not None
+
+
+def test_no_queries_between_passes():
+    store = ArtifactStore(max_artifacts=2)
+    store.PRUNE_EVERY = 100
+    put_all(store, [f"<html>{i}</html>" for i in range(5)])
+    assert store.stats()["artifacts"] == 5  # over the bound until the next pass
+
+
+def test_shared_blob_survives_eviction_of_one_artifact():
+    store = ArtifactStore(max_artifacts=2)
+    store.PRUNE_EVERY = 1
+    store.LOW_WATER = 1.0
+    put_all(store, ["<html>shared</html>", "<html>other</html>", "<html>shared</html>"])
+    stats = store.stats()
+    assert (stats["artifacts"], stats["blobs"], stats["evicted"]) == (2, 2, 1)
+    assert store.content(content_hash("<html>shared</html>")) == "<html>shared</html>"
+
+
+def test_retention_drops_old_artifacts():
+    store = ArtifactStore(retention_seconds=60)
+    store.PRUNE_EVERY = 1
+    old, = put_all(store, ["<html>old</html>"])
+    store._db.execute("UPDATE artifacts SET created_at = ? WHERE id = ?", (time.time() - 3600, old["id"]))
+    new, = put_all(store, ["<html>new</html>"])
+    assert store.get(old["id"]) is None and store.get(new["id"]) is not None
+    assert store.content(old["hash"]) is None
@@ -0,0 +1,33 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from candidates import score_candidate  # noqa: E402
+from html_post import without_raw_text  # noqa: E402
+
+
+def page(script: str, style: str = "p { color: red; }") -> str:
+    filler = "<p>" + "content " * 150 + "</p>\n"
+    return (
+        f"<!DOCTYPE html>\n<html><head><style>{style}</style></head>\n"
+        f"<body>\n{filler}<script>{script}</script>\n</body>\n</html>"
+    )
+
+
+def test_markup_built_in_scripts_is_not_penalized():
+    plain_score, plain_notes = score_candidate(page("run();"), [])
+    builds_html = "list.innerHTML = '<body><div>' + items.join('</div><div>') + '<script>';"
+    score, notes = score_candidate(page(builds_html, style="/* <head> */"), [])
+    assert notes == plain_notes == [] and score == plain_score
+
+
+def test_real_imbalance_is_still_penalized():
+    broken = page("run();").replace("</body>", "")
+    score, notes = score_candidate(broken, [])
+    assert notes == ["unbalanced <body>"]
+
+
+def test_without_raw_text_keeps_the_tags():
+    html = "<STYLE id=s>a<b></STYLE><p>x</p><script type='module'>'</p>'</script><textarea><body>"
+    assert without_raw_text(html) == "<STYLE id=s></STYLE><p>x</p><script type='module'></script><textarea>"
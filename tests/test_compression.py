@@ -0,0 +1,112 @@
+import gzip
+import os
+import sys
+
+import brotli
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import compression  # noqa: E402
+from compression import AssetCache, CompressionMiddleware, accepted_encodings, encode_variants  # noqa: E402
+
+
+BODY = "<p>hello compression</p>\n" * 200
+CHUNKS = [f"<li>item {i}</li>\n" * 40 for i in range(4)]
+
+
+def compressed_app(sent: list, **options) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/page")
+    def page():
+        return PlainTextResponse(BODY)
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter(CHUNKS), media_type="text/html")
+
+    @app.get("/pieces")
+    def pieces():
+        length = str(sum(len(chunk) for chunk in CHUNKS))
+        return StreamingResponse(iter(CHUNKS), media_type="text/html", headers={"Content-Length": length})
+
+    async def record_body(scope, receive, send):
+        async def recording_send(message):
+            if message["type"] == "http.response.body":
+                sent.append(message["body"])
+            await send(message)
+        await inner(scope, receive, recording_send)
+
+    inner = CompressionMiddleware(app, **options)
+    return record_body
+
+
+def test_accepted_encodings_follow_q_values():
+    assert accepted_encodings("gzip, br") == ["br", "gzip"]
+    assert accepted_encodings("br;q=0.5, gzip") == ["gzip", "br"]
+    assert accepted_encodings("gzip;q=0, *") == ["br"]
+    assert accepted_encodings("identity") == []
+    assert accepted_encodings("br;q=bogus, gzip") == ["gzip"]
+
+
+def test_middleware_negotiates_encoding():
+    client = TestClient(compressed_app([]))
+    for accept, encoding in (("br, gzip", "br"), ("gzip", "gzip"), ("identity", None)):
+        response = client.get("/page", headers={"Accept-Encoding": accept})
+        assert response.headers.get("content-encoding") == encoding
+        assert response.text == BODY  # httpx decodes br and gzip
+        assert response.headers["vary"] == "Accept-Encoding"
+
+
+def test_brotli_flushes_streams_but_not_fixed_length_pieces():
+    for path, flushed in (("/stream", True), ("/pieces", False)):
+        sent = []
+        TestClient(compressed_app(sent)).get(path, headers={"Accept-Encoding": "br"})
+        chunks = [chunk for chunk in sent if chunk]
+        decoder = brotli.Decompressor()
+        # a flushed chunk decodes on its own to exactly what the app sent
+        assert (decoder.process(chunks[0]) == CHUNKS[0].encode()) is flushed
+        whole = b"".join(chunks)
+        assert brotli.decompress(whole) == "".join(CHUNKS).encode()
+
+
+def test_large_brotli_bodies_leave_the_event_loop(monkeypatch):
+    offloaded = []
+    run_sync = compression.anyio.to_thread.run_sync
+
+    async def counting_run_sync(fn, *args, **kwargs):
+        if getattr(fn, "__name__", "") == "_compress":  # endpoints and iterators use the thread pool too
+            offloaded.append(len(args[0]))
+        return await run_sync(fn, *args, **kwargs)
+
+    monkeypatch.setattr(compression.anyio.to_thread, "run_sync", counting_run_sync)
+    client = TestClient(compressed_app([], thread_minimum_size=1024))
+    response = client.get("/page", headers={"Accept-Encoding": "br"})
+    assert response.text == BODY and offloaded == [len(BODY)]
+    client.get("/stream", headers={"Accept-Encoding": "br"})
+    assert offloaded == [len(BODY)]  # each streamed chunk is under the threshold
+
+
+def test_asset_etag_and_304():
+    cache = AssetCache()
+    variants = encode_variants(BODY.encode())
+    assert gzip.decompress(variants["gzip"]) == BODY.encode()
+    app = FastAPI()
+
+    @app.get("/asset")
+    def asset(request: Request):
+        return cache.response(request, variants, "text/html", "no-cache")
+
+    client = TestClient(app)
+    first = client.get("/asset", headers={"Accept-Encoding": "br"})
+    assert first.headers["etag"] == f'"{variants["etag"]}-br"' and first.text == BODY
+
+    # the validator matches whichever encoding it was served in
+    again = client.get("/asset", headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304 and again.content == b""
+    changed = client.get("/asset", headers={"Accept-Encoding": "identity", "If-None-Match": '"other"'})
+    assert changed.status_code == 200 and changed.headers["etag"] == f'"{variants["etag"]}"'
+    assert cache.stats()["not_modified"] == 1
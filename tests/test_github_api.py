@@ -0,0 +1,65 @@
+import asyncio
+import base64
+import os
+import sys
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import github_api  # noqa: E402
+from github_api import git_blob_sha, put_file  # noqa: E402
+
+
+URL = "https://api.github.test/repos/me/apps/contents/generated/a.html"
+
+
+def payload(text: str) -> dict:
+    return {"message": "deploy", "content": base64.b64encode(text.encode()).decode(), "branch": "main"}
+
+
+def run_put(monkeypatch, handler, body: dict) -> tuple:
+    """put_file against a fake GitHub; returns (response, requests seen)."""
+    monkeypatch.setattr(github_api, "retry_delay", lambda response, attempt: 0)
+    seen = []
+
+    def record(request):
+        seen.append(request.method)
+        return handler(request)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(record)) as client:
+            return await put_file(client, URL, "token", body)
+
+    return asyncio.run(run()), seen
+
+
+def test_retry_after_applied_put_counts_as_success(monkeypatch):
+    stored = {}
+
+    def github(request):
+        if request.method == "GET":
+            assert request.url.params["ref"] == "main"
+            return httpx.Response(200, json={"sha": stored["sha"]})
+        if "sha" in stored:
+            return httpx.Response(422, json={"message": "\"sha\" wasn't supplied."})
+        stored["sha"] = git_blob_sha(b"<html>app</html>")
+        return httpx.Response(502)  # the write landed, the response got lost
+
+    response, seen = run_put(monkeypatch, github, payload("<html>app</html>"))
+    assert response.status_code == 200 and seen == ["PUT", "PUT", "GET"]
+
+
+def test_conflict_with_other_content_is_still_a_failure(monkeypatch):
+    def github(request):
+        if request.method == "GET":
+            return httpx.Response(200, json={"sha": git_blob_sha(b"someone else's page")})
+        return httpx.Response(422, json={"message": "\"sha\" wasn't supplied."})
+
+    response, seen = run_put(monkeypatch, github, payload("<html>app</html>"))
+    assert response.status_code == 422 and seen == ["PUT", "GET"]
+
+
+def test_git_blob_sha_matches_git():
+    # `printf 'hello\n' | git hash-object --stdin`
+    assert git_blob_sha(b"hello\n") == "ce013625030ba8dba906f756967f9e9ca394464a"
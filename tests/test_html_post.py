@@ -0,0 +1,38 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from html_post import HtmlPostProcessor, postprocess_html  # noqa: E402
+
+
+SCRIPT_WITH_HTML_END = (
+    "<!DOCTYPE html>\n<html><head></head><body>\n<script>\n"
+    "document.write('<html><body>hi</body></html>');\n"
+    "const fence = `\n```\n`;\n"
+    "</script>\n</body>\n</html>\nHope this helps!"
+)
+
+
+def streamed(raw: str, size: int) -> tuple:
+    processor = HtmlPostProcessor()
+    html = "".join(processor.feed(raw[i:i + size]) for i in range(0, len(raw), size)) + processor.flush()
+    return html, processor.problems
+
+
+def test_html_end_inside_script_does_not_end_document():
+    html, problems = postprocess_html(SCRIPT_WITH_HTML_END)
+    assert html == SCRIPT_WITH_HTML_END[:SCRIPT_WITH_HTML_END.rindex("</html>") + len("</html>")]
+    assert problems == ["dropped trailing text: 'Hope this helps!'"]
+
+
+def test_html_end_inside_script_streamed():
+    expected = postprocess_html(SCRIPT_WITH_HTML_END)
+    for size in (1, 3, 7, 16):
+        assert streamed(SCRIPT_WITH_HTML_END, size) == expected
+
+
+def test_cut_off_inside_script_closes_it():
+    html, problems = postprocess_html("<!DOCTYPE html><html><body><script>let end = '</html>';")
+    assert html.endswith("let end = '</html>';\n</script>\n</body>\n</html>")
+    assert "document ended without </html> (added </script></body></html>)" in problems
@@ -0,0 +1,118 @@
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import jobs  # noqa: E402
+from jobs import FINISHED, QUEUED, RUNNING, SUCCEEDED, JobQueue, MemoryJobStore, SQLiteJobStore, new_job  # noqa: E402
+
+
+async def succeed(job: dict) -> dict:
+    await asyncio.sleep(0.01)
+    return {"ok": job["id"]}
+
+
+def test_claim_is_exclusive(tmp_path):
+    async def run():
+        path = str(tmp_path / "jobs.db")
+        first, second = SQLiteJobStore(path), SQLiteJobStore(path)
+        job = new_job("generate", {})
+        await first.create(job)
+        return await first.claim(job["id"]), await second.claim(job["id"]), first.get(job["id"])["status"]
+
+    assert asyncio.run(run()) == (True, False, RUNNING)
+
+
+def test_requeue_only_stale_running_jobs():
+    async def run():
+        store = MemoryJobStore()
+        fresh, stale = new_job("generate", {}), new_job("generate", {})
+        for job, started in ((fresh, time.time()), (stale, time.time() - 3600)):
+            await store.create(job)
+            await store.update(job["id"], status=RUNNING, started_at=started)
+        cutoff = time.time() - 600
+        return await store.requeue_stale(fresh["id"], cutoff), await store.requeue_stale(stale["id"], cutoff), store
+
+    fresh_requeued, stale_requeued, store = asyncio.run(run())
+    assert (fresh_requeued, stale_requeued) == (False, True)
+    assert [job["status"] for job in store.unfinished(10)] == [RUNNING, QUEUED]
+
+
+def test_resume_fills_the_queue_and_drains_the_backlog(tmp_path):
+    async def run():
+        store = SQLiteJobStore(str(tmp_path / "jobs.db"))
+        for i in range(12):
+            await store.create(new_job("generate", {"i": i}))
+        queue = JobQueue(store, succeed, concurrency=2, max_queue=5)
+        await queue.start()
+        started = queue.stats()
+        for _ in range(200):
+            if not store.unfinished(1):
+                break
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return started, store.unfinished(100), queue.stats()
+
+    started, unfinished, stats = asyncio.run(run())
+    assert started["queued"] == 5 and started["backlog"]
+    assert unfinished == []
+    assert stats["resumed"] == 12 and not stats["backlog"]
+
+
+def test_wait_wakes_on_finish():
+    async def run():
+        queue = JobQueue(MemoryJobStore(), succeed)
+        await queue.start()
+        job = await queue.submit("generate", {})
+        started = time.monotonic()
+        finished = await queue.wait(job["id"], 5)
+        await queue.stop()
+        return finished, time.monotonic() - started, queue
+
+    finished, elapsed, queue = asyncio.run(run())
+    assert finished["status"] == SUCCEEDED and elapsed < 1
+    assert queue._events == {}
+
+
+def test_claim_conflict_releases_waiters(tmp_path):
+    async def run():
+        path = str(tmp_path / "jobs.db")
+        queue = JobQueue(SQLiteJobStore(path), succeed)
+        job = await queue.submit("generate", {})
+        # another worker sharing the file claims it first
+        assert await SQLiteJobStore(path).claim(job["id"])
+        await queue.start()
+        status = (await queue.wait(job["id"], 0.3))["status"]
+        await queue.stop()
+        return status, queue
+
+    status, queue = asyncio.run(run())
+    assert status == RUNNING
+    assert queue.stats()["claim_conflicts"] == 1
+    assert queue._events == {}
+
+
+def test_wait_polls_jobs_run_elsewhere(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "WAIT_POLL_SECONDS", 0.02)
+
+    async def run():
+        path = str(tmp_path / "jobs.db")
+        other, here = SQLiteJobStore(path), JobQueue(SQLiteJobStore(path), succeed)
+        job = new_job("generate", {})
+        await other.create(job)
+        await other.claim(job["id"])
+
+        async def finish_elsewhere():
+            await asyncio.sleep(0.1)
+            await other.update(job["id"], status=SUCCEEDED, result={"ok": 1}, finished_at=time.time())
+
+        asyncio.create_task(finish_elsewhere())
+        started = time.monotonic()
+        finished = await here.wait(job["id"], 5)
+        return finished, time.monotonic() - started, here
+
+    finished, elapsed, here = asyncio.run(run())
+    assert finished["status"] in FINISHED and elapsed < 1
+    assert here._events == {}
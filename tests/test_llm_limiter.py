@@ -0,0 +1,88 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from llm_limiter import LimiterTimeout, TokenBucket, UpstreamLimiter, error_status  # noqa: E402
+
+
+class Throttled(Exception):
+    status_code = 429
+
+
+def test_token_bucket_refills_at_its_rate():
+    bucket = TokenBucket(60)  # one token per second
+    now = bucket.updated
+    assert bucket.delay_for(60, now) == 0
+    bucket.take(60)
+    assert bucket.delay_for(1, now) == pytest.approx(1.0)
+    assert bucket.delay_for(1, now + 1) == 0
+    # a request larger than the bucket waits for a full bucket, not forever
+    assert bucket.delay_for(600, now + 1) == pytest.approx(59.0)
+    bucket.give_back(1000)
+    assert bucket.tokens == 60
+
+
+def test_aimd_halves_on_429_and_grows_back_additively():
+    limiter = UpstreamLimiter(max_in_flight=8)
+    for error in (Throttled(), Throttled()):
+        asyncio.run(limiter.acquire(1)).release(error)
+    assert limiter.current_limit == 2 and limiter.counters["throttled"] == 2
+
+    for _ in range(3):
+        asyncio.run(limiter.acquire(1)).release()
+    assert limiter.limit == pytest.approx(2 + 1 / 2 + 1 / 2.5 + 1 / 2.9)
+    assert limiter.current_limit == 3
+
+
+def test_latency_spike_cuts_the_limit():
+    limiter = UpstreamLimiter(max_in_flight=10, latency_spike_factor=3.0)
+    limiter.latency_ewma, limiter._samples = 0.001, 10
+    slot = asyncio.run(limiter.acquire(1))
+    slot.started -= 1.0  # took a second against a 1 ms average
+    slot.release()
+    assert limiter.limit == pytest.approx(8.0) and limiter.counters["latency_spikes"] == 1
+
+
+def test_in_flight_cap_queues_until_release():
+    async def run():
+        limiter = UpstreamLimiter(max_in_flight=1)
+        first = await limiter.acquire(1)
+        waiter = asyncio.create_task(limiter.acquire(1))
+        await asyncio.sleep(0.01)
+        queued = (waiter.done(), limiter.stats()["queue_depth"])
+        first.release()
+        second = await asyncio.wait_for(waiter, 1)
+        second.release()
+        return queued, limiter.stats()
+
+    (done_early, depth), stats = asyncio.run(run())
+    assert not done_early and depth == 1
+    assert stats["admitted"] == 2 and stats["in_flight"] == 0
+
+
+def test_queue_timeout_raises_and_maps_to_503():
+    async def run():
+        limiter = UpstreamLimiter(max_in_flight=1)
+        await limiter.acquire(1)
+        with pytest.raises(LimiterTimeout) as raised:
+            await limiter.acquire(1, timeout=0.05)
+        return raised.value, limiter
+
+    error, limiter = asyncio.run(run())
+    assert error_status(error) == 503 and error_status(Throttled()) == 429
+    assert limiter.counters["timeouts"] == 1 and limiter.queued == 0
+
+
+def test_tpm_bucket_is_charged_the_estimate_and_refunded_unused_tokens():
+    limiter = UpstreamLimiter(tpm=1000)
+    slot = asyncio.run(limiter.acquire(600))
+    assert limiter.tpm.tokens == pytest.approx(400, abs=1)
+    slot.record_usage(100)
+    slot.release()
+    assert limiter.tpm.tokens == pytest.approx(900, abs=1)
+    with pytest.raises(LimiterTimeout):
+        asyncio.run(limiter.acquire(950, timeout=0.05))
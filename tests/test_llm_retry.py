@@ -0,0 +1,106 @@
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from llm_retry import RetryPolicy, is_retryable, retry_after  # noqa: E402
+
+
+class UpstreamError(Exception):
+    def __init__(self, status_code: int, headers: dict = None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = httpx.Response(status_code, headers=headers or {})
+
+
+def flaky(*outcomes):
+    """An upstream call that raises or returns each outcome in turn."""
+    calls = []
+
+    async def call():
+        outcome = outcomes[len(calls)]
+        calls.append(outcome)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    return call, calls
+
+
+def test_classification():
+    assert is_retryable(UpstreamError(429)) and is_retryable(UpstreamError(503)) and is_retryable(UpstreamError(408))
+    assert not is_retryable(UpstreamError(400)) and not is_retryable(UpstreamError(401))
+    assert is_retryable(httpx.ConnectError("refused")) and is_retryable(asyncio.TimeoutError())
+    assert not is_retryable(ValueError("bad prompt"))
+
+
+def test_retry_after_forms():
+    assert retry_after(UpstreamError(429, {"retry-after-ms": "250"})) == 0.25
+    assert retry_after(UpstreamError(429, {"retry-after": "3"})) == 3.0
+    date = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 < retry_after(UpstreamError(429, {"retry-after": date})) <= 30
+    assert retry_after(UpstreamError(429)) is None and retry_after(ValueError()) is None
+
+
+def test_retries_until_success_honoring_retry_after(monkeypatch):
+    slept = []
+
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+    policy = RetryPolicy(max_retries=2, max_delay=5.0)
+    call, calls = flaky(UpstreamError(429, {"retry-after": "60"}), UpstreamError(502), "page")
+    assert asyncio.run(policy.run(call)) == "page"
+    assert slept[0] == 5.0 and 0 <= slept[1] <= 1.0  # Retry-After is capped at max_delay
+    assert policy.counters["retries"] == 2 and policy.counters["attempts"] == 3
+
+
+def test_gives_up_and_skips_non_retryable(monkeypatch):
+    async def no_sleep(seconds):
+        pass
+
+    monkeypatch.setattr(asyncio, "sleep", no_sleep)
+    policy = RetryPolicy(max_retries=1)
+    call, calls = flaky(UpstreamError(500), UpstreamError(500))
+    with pytest.raises(UpstreamError):
+        asyncio.run(policy.run(call))
+    assert len(calls) == 2 and policy.counters["gave_up"] == 1
+
+    call, calls = flaky(UpstreamError(400), "page")
+    with pytest.raises(UpstreamError):
+        asyncio.run(policy.run(call))
+    assert len(calls) == 1
+
+
+def test_hedge_wins_when_the_primary_stalls():
+    policy = RetryPolicy(hedge=True, hedge_min_delay=0.01, hedge_min_samples=1)
+    policy.latency.record(0.01)
+    started = []
+
+    async def call():
+        started.append(len(started))
+        if started[-1] == 0:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                started.append("primary cancelled")
+                raise
+        return f"attempt {started[-1]}"
+
+    assert asyncio.run(asyncio.wait_for(policy.run(call), 2)) == "attempt 1"
+    assert "primary cancelled" in started
+    assert policy.counters["hedges"] == 1 and policy.counters["hedge_wins"] == 1
+
+
+def test_no_hedge_before_enough_samples():
+    policy = RetryPolicy(hedge=True, hedge_min_samples=20)
+    call, calls = flaky("page")
+    assert asyncio.run(policy.run(call)) == "page"
+    assert policy.hedge_delay() is None and policy.counters["hedges"] == 0
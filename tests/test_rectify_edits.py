@@ -0,0 +1,76 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rectify_edits import (  # noqa: E402
+    PatchError,
+    apply_edit,
+    edit_splices,
+    parse_edits,
+    patch_from_completion,
+    validate_patched,
+)
+
+
+PAGE = (
+    "<!DOCTYPE html>\n<html>\n<head>\n  <style>\n    h1 { color: red; }\n  </style>\n</head>\n"
+    "<body>\n  <h1>Timer</h1>\n  <button>Start</button>\n  <button>Stop</button>\n</body>\n</html>\n"
+)
+
+
+def block(search: str, replace: str) -> str:
+    return f"<<<<<<< SEARCH\n{search}=======\n{replace}>>>>>>> REPLACE\n"
+
+
+def test_parse_tolerates_marker_length_and_chatter():
+    completion = "Here you go:\n" + block("a\n", "b\n") + "\n<<<<<<<< SEARCH\nc\n========\n>>>>>>>> REPLACE\n"
+    assert parse_edits(completion) == [("a\n", "b\n"), ("c\n", "")]
+
+
+def test_exact_and_whitespace_tolerant_matches():
+    assert "color: blue" in apply_edit(PAGE, "    h1 { color: red; }\n", "    h1 { color: blue; }\n")
+    # wrong indentation and trailing spaces still find the one matching span
+    patched = apply_edit(PAGE, "<h1>Timer</h1>   \n<button>Start</button>\n", "  <h1>Clock</h1>\n")
+    assert "<h1>Clock</h1>\n  <button>Stop</button>" in patched and "Start" not in patched
+
+
+def test_missing_ambiguous_and_empty_targets_fail():
+    with pytest.raises(PatchError, match="not found"):
+        apply_edit(PAGE, "<h2>nope</h2>\n", "")
+    with pytest.raises(PatchError, match="ambiguous"):
+        apply_edit(PAGE, "</button>", "</b>")
+    with pytest.raises(PatchError, match="empty SEARCH"):
+        apply_edit(PAGE, "\n", "x")
+
+
+def test_validation_guards_the_skeleton():
+    validate_patched(PAGE, PAGE.replace("Timer", "Clock"))
+    with pytest.raises(PatchError, match="DOCTYPE"):
+        validate_patched(PAGE, PAGE.replace("<!DOCTYPE html>\n", ""))
+    with pytest.raises(PatchError, match="<body>"):
+        validate_patched(PAGE, PAGE.replace("</body>\n", ""))
+    with pytest.raises(PatchError, match="empty"):
+        validate_patched(PAGE, "  \n")
+
+
+def test_patch_from_completion():
+    code, count = patch_from_completion(PAGE, block("  <h1>Timer</h1>\n", "  <h1>Clock</h1>\n"))
+    assert count == 1 and code == PAGE.replace("Timer", "Clock")
+    # a whole document instead of edits is taken as a rewrite
+    code, count = patch_from_completion(PAGE, "```html\n<html><body>new</body></html>\n```")
+    assert count == 0 and code == "<!DOCTYPE html>\n<html><body>new</body></html>"
+    with pytest.raises(PatchError, match="no edit blocks"):
+        patch_from_completion(PAGE, "I changed the title.")
+    with pytest.raises(PatchError, match="unbalanced"):
+        patch_from_completion(PAGE, block("</head>\n", ""))
+
+
+def test_splices_reproduce_the_edits():
+    edits = [("  <h1>Timer</h1>\n", "  <h1>Clock</h1>\n"), ("<button>Stop</button>", "<button>Reset</button>")]
+    code = PAGE
+    for splice in edit_splices(PAGE, edits):
+        code = code[:splice["start"]] + splice["text"] + code[splice["end"]:]
+    assert code == PAGE.replace("Timer", "Clock").replace("Stop", "Reset")
@@ -0,0 +1,96 @@
+import asyncio
+import os
+import sys
+
+from fastapi import FastAPI, WebSocket
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from artifacts import ArtifactStore  # noqa: E402
+from rectify_sessions import MemorySessionStore, RectifySessions  # noqa: E402
+from rectify_ws import EditChannel  # noqa: E402
+
+
+PAGE = "<!DOCTYPE html>\n<html><body><p>old</p></body>\n</html>"
+REWRITE = ["<!DOCTYPE html>\n<html><body>", "<p>new</p></body>\n</html>"]
+
+
+class FakeLLM:
+    def __init__(self, before_last_chunk=None):
+        self.before_last_chunk = before_last_chunk
+
+    async def stream(self, messages, use_cache=True):
+        async def chunks():
+            yield REWRITE[0]
+            if self.before_last_chunk:
+                await self.before_last_chunk()
+            yield REWRITE[1]
+        return chunks()
+
+
+def channel_app(llm, sessions) -> FastAPI:
+    app = FastAPI()
+    artifacts = ArtifactStore()
+
+    @app.websocket("/ws/{session_id}")
+    async def socket(websocket: WebSocket, session_id: str):
+        await EditChannel(websocket, llm, sessions, artifacts, session_id).run()
+
+    return app
+
+
+def run_round(app: FastAPI, session_id: str, **message) -> list:
+    events = []
+    with TestClient(app).websocket_connect(f"/ws/{session_id}") as ws:
+        events.append(ws.receive_json())
+        ws.send_json({"type": "feedback", "feedback": "say new", "mode": "full", **message})
+        while events[-1]["type"] not in ("done", "conflict", "error", "cancelled"):
+            events.append(ws.receive_json())
+    return events
+
+
+def new_sessions() -> RectifySessions:
+    return RectifySessions(MemorySessionStore())
+
+
+def _create(sessions: RectifySessions) -> dict:
+    return asyncio.run(sessions.create(PAGE))
+
+
+def test_full_rewrite_is_recorded_after_the_stream():
+    sessions = new_sessions()
+
+    async def check_not_yet_recorded():
+        assert sessions.get(session["id"])["version"] == 1
+
+    session = _create(sessions)
+    events = run_round(channel_app(FakeLLM(check_not_yet_recorded), sessions), session["id"])
+    done = events[-1]
+    assert done["type"] == "done" and done["version"] == 2 and done["mode"] == "full"
+    assert "".join(e["content"] for e in events if e["type"] == "delta") == "".join(REWRITE)
+    assert sessions.get(session["id"])["code"] == "".join(REWRITE)
+
+
+def test_conflict_carries_current_version():
+    sessions = new_sessions()
+    session = _create(sessions)
+
+    async def another_tab_wins():
+        await sessions.record(session["id"], 1, "elsewhere", PAGE, "full")
+
+    events = run_round(channel_app(FakeLLM(another_tab_wins), sessions), session["id"])
+    assert events[-1] == {
+        "type": "conflict",
+        "error": "Session changed while this feedback was being applied",
+        "status": 409,
+        "version": 2,
+    }
+    assert sessions.get(session["id"])["history"][-1]["feedback"] == "elsewhere"
+
+
+def test_stale_version_is_a_conflict():
+    sessions = new_sessions()
+    session = _create(sessions)
+    events = run_round(channel_app(FakeLLM(), sessions), session["id"], version=7)
+    assert events[-1]["type"] == "conflict" and events[-1]["version"] == 1
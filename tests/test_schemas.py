@@ -0,0 +1,63 @@
+import os
+import sys
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import schemas  # noqa: E402
+from schemas import DeployBatchRequest, GenerateRequest, RectifyRequest, read_model  # noqa: E402
+
+
+def model_app() -> TestClient:
+    app = FastAPI()
+
+    @app.post("/generate")
+    async def generate(request: Request):
+        body = await read_model(request, GenerateRequest)
+        return {"description": body.description, "stream": body.get("stream", False)}
+
+    @app.post("/rectify")
+    async def rectify(request: Request):
+        return (await read_model(request, RectifyRequest)).model_dump(exclude_none=True)
+
+    @app.post("/deploy/batch")
+    async def deploy_batch(request: Request):
+        return {"items": len((await read_model(request, DeployBatchRequest)).items or [])}
+
+    return TestClient(app)
+
+
+def test_valid_bodies_ignore_unknown_fields():
+    client = model_app()
+    response = client.post("/generate", json={"description": "a timer", "stream": "ndjson", "extra": 1})
+    assert response.status_code == 200 and response.json() == {"description": "a timer", "stream": "ndjson"}
+    # an empty body reads as {}
+    assert client.post("/generate", content=b"").json() == {"description": None, "stream": False}
+
+
+def test_malformed_json_is_400():
+    response = model_app().post("/generate", content=b'{"description": "a timer"', headers={"Content-Type": "application/json"})
+    assert response.status_code == 400 and response.json()["detail"] == "Request body is not valid JSON"
+
+
+def test_wrong_types_are_422_with_the_field_named():
+    client = model_app()
+    response = client.post("/generate", json={"description": ["a", "timer"]})
+    assert response.status_code == 422 and response.json()["detail"].startswith("description: ")
+    assert client.post("/generate", json=["a timer"]).status_code == 422
+    response = client.post("/deploy/batch", json={"items": [{"code": 5}]})
+    assert response.status_code == 422 and response.json()["detail"].startswith("items.0.code: ")
+
+
+def test_oversized_fields_and_bodies_are_413(monkeypatch):
+    client = model_app()
+    response = client.post("/rectify", json={"code": "<p>", "feedback": "x" * (schemas.MAX_FEEDBACK_CHARS + 1)})
+    assert response.status_code == 413 and response.json()["detail"].startswith("feedback: ")
+    items = [{"code": "<p>"}] * (schemas.MAX_BATCH_ITEMS + 1)
+    assert client.post("/deploy/batch", json={"items": items}).status_code == 413
+
+    monkeypatch.setattr(schemas, "MAX_BODY_BYTES", 100)
+    response = client.post("/rectify", json={"code": "x" * 200})
+    assert response.status_code == 413 and response.json()["detail"] == "Request body is larger than 100 bytes"
@@ -0,0 +1,110 @@
+import asyncio
+import os
+import sqlite3
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from artifacts import ArtifactStore  # noqa: E402
+from shared_state import MemorySharedState, SharedState, SQLiteSharedState, StateBusy, lease  # noqa: E402
+from sqlite_db import transaction  # noqa: E402
+
+
+def held_lock(path: str) -> sqlite3.Connection:
+    """A second connection holding the write lock, as another worker would."""
+    holder = sqlite3.connect(path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    return holder
+
+
+def test_lease_excludes_second_holder():
+    shared = MemorySharedState()
+
+    async def run():
+        async with lease(shared, "deploy:x", ttl=5, wait=0) as first:
+            async with lease(shared, "deploy:x", ttl=5, wait=0.1) as second:
+                return first, second
+
+    assert asyncio.run(run()) == (True, False)
+    assert shared.try_claim("deploy:x", "someone", 5)
+
+
+def test_expired_lease_can_be_taken():
+    shared = MemorySharedState()
+    assert shared.try_claim("k", "a", ttl=0.01)
+    assert not shared.try_claim("k", "b", ttl=5)
+    time.sleep(0.02)
+    assert shared.try_claim("k", "b", ttl=5)
+
+
+def test_token_buckets_charge_all_or_nothing(tmp_path):
+    for shared in (MemorySharedState(), SQLiteSharedState(str(tmp_path / "shared.db"))):
+        assert shared.take_tokens({"rpm": (1, 60), "tpm": (900, 1000)}) == 0
+        delay = shared.take_tokens({"rpm": (1, 60), "tpm": (900, 1000)})
+        assert 0 < delay <= 60
+        assert shared.available("rpm", 60) >= 58.9  # the refused request took nothing
+
+
+def test_busy_sqlite_state_does_not_wait(tmp_path):
+    path = str(tmp_path / "shared.db")
+    shared = SQLiteSharedState(path)
+    holder = held_lock(path)
+    try:
+        started = time.perf_counter()
+        assert shared.take_tokens({"rpm": (1, 60)}) == shared.busy_retry_seconds
+        assert not shared.try_claim("k", "a", 5)
+        assert not shared.release("k", "a")
+        shared.set("k", "v", 60)  # skipped
+        assert time.perf_counter() - started < 0.5
+        assert shared.stats()["busy"] == 4
+    finally:
+        holder.execute("ROLLBACK")
+    assert shared.try_claim("k", "a", 5)
+
+
+def test_transaction_raises_state_busy(tmp_path):
+    path = str(tmp_path / "store.db")
+    store = ArtifactStore(path)
+    holder = held_lock(path)
+    try:
+        with pytest.raises(StateBusy):
+            transaction(store._db, lambda: store._db.execute("DELETE FROM artifacts"))
+    finally:
+        holder.execute("ROLLBACK")
+
+
+def test_store_write_waits_without_blocking_the_loop(tmp_path):
+    path = str(tmp_path / "store.db")
+    store = ArtifactStore(path)
+    holder = held_lock(path)
+
+    async def run():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        asyncio.get_running_loop().call_later(0.2, holder.execute, "COMMIT")
+        artifact = await store.put("<html></html>", "generate")
+        ticker.cancel()
+        return artifact, ticks
+
+    artifact, ticks = asyncio.run(run())
+    assert store.get(artifact["id"]) is not None
+    assert ticks >= 10  # the loop kept running while the write waited for the lock
+
+
+def test_incomplete_backend_fails_when_constructed():
+    class GetOnly(SharedState):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnly()
@@ -0,0 +1,66 @@
+import asyncio
+import os
+import sys
+
+from starlette.requests import Request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from artifacts import ArtifactStore  # noqa: E402
+from similar import DescriptionIndex, similar_mode, similar_outputs  # noqa: E402
+
+
+def request_with(headers: dict) -> Request:
+    return Request({"type": "http", "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()]})
+
+
+def test_similar_mode_follows_cache_bypass(monkeypatch):
+    monkeypatch.delenv("SIMILAR_MODE", raising=False)
+    assert similar_mode(request_with({}), {}) == "off"
+    assert similar_mode(request_with({}), {"similar": "serve"}) == "serve"
+    assert similar_mode(request_with({}), {"similar": "bogus"}) == "off"
+    assert similar_mode(request_with({}), {"similar": "serve", "cache": False}) == "off"
+    for header in ("no-cache", "no-store", "max-age=0, no-store"):
+        assert similar_mode(request_with({"Cache-Control": header}), {"similar": "serve"}) == "off"
+
+
+def test_lookup_finds_rewordings_only():
+    index = DescriptionIndex(threshold=0.6)
+    asyncio.run(index.add("A pomodoro timer with start, pause and reset buttons", "a1"))
+    asyncio.run(index.add("A weather dashboard showing a 5 day forecast", "a2"))
+
+    hits = index.lookup("a pomodoro timer with start pause and reset buttons")
+    assert [hit["artifact_id"] for hit in hits] == ["a1"] and hits[0]["score"] == 1.0
+    assert index.lookup("A pomodoro timer with start, pause, reset and lap buttons")[0]["artifact_id"] == "a1"
+    assert index.lookup("A simple pomodoro timer") == []
+    assert index.lookup("A chess board") == []
+    assert index.stats()["hits"] == 2 and index.stats()["misses"] == 2
+
+
+def test_index_survives_restart_and_forgets_missing_artifacts(tmp_path):
+    path = str(tmp_path / "index.db")
+    store = ArtifactStore(path)
+
+    async def run():
+        artifact = await store.put("<html>timer</html>", "generate", "a countdown timer")
+        index = DescriptionIndex(path)
+        await index.add("a countdown timer", artifact["id"])
+        await index.add("a kanban board", "gone")
+
+        reloaded = DescriptionIndex(path)
+        found = await similar_outputs(reloaded, store, "a countdown timer")
+        missing = await similar_outputs(reloaded, store, "a kanban board")
+        return artifact, found, missing, DescriptionIndex(path)
+
+    artifact, found, missing, restarted = asyncio.run(run())
+    assert found[0]["artifact_id"] == artifact["id"] and found[0]["code"] == "<html>timer</html>"
+    assert missing == []
+    assert restarted.stats()["entries"] == 1
+
+
+def test_index_keeps_max_entries():
+    index = DescriptionIndex(max_entries=2)
+    for i, words in enumerate(("red apple", "green pear", "yellow banana")):
+        asyncio.run(index.add(words, f"a{i}"))
+    assert index.stats()["entries"] == 2 and index.stats()["evicted"] == 1
+    assert index.lookup("red apple") == []
@@ -0,0 +1,94 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from singleflight import SingleFlight  # noqa: E402
+
+
+class Upstream:
+    """An upstream call that blocks until released and records how it ended."""
+
+    def __init__(self):
+        self.calls = 0
+        self.cancelled = False
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return "page"
+
+
+def test_concurrent_callers_share_one_call():
+    async def run():
+        flight, upstream = SingleFlight(), Upstream()
+        callers = [asyncio.create_task(flight.do("key", upstream)) for _ in range(3)]
+        await asyncio.sleep(0)
+        upstream.release.set()
+        return await asyncio.gather(*callers), upstream.calls, flight.stats()
+
+    results, calls, stats = asyncio.run(run())
+    assert results == ["page"] * 3 and calls == 1
+    assert (stats["leaders"], stats["followers"], stats["in_flight"]) == (1, 2, 0)
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    async def run():
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0)
+            raise ValueError("upstream down")
+
+        async def succeed():
+            return "page"
+
+        results = await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+        return results, await flight.do("key", succeed), flight.stats()
+
+    results, retried, stats = asyncio.run(run())
+    assert [type(r) for r in results] == [ValueError, ValueError]
+    assert retried == "page" and stats["leaders"] == 2 and stats["in_flight"] == 0
+
+
+def test_call_survives_while_a_waiter_remains():
+    async def run():
+        flight, upstream = SingleFlight(), Upstream()
+        leader = asyncio.create_task(flight.do("key", upstream))
+        follower = asyncio.create_task(flight.do("key", upstream))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        assert not upstream.cancelled and flight.stats()["waiters"] == 1
+        upstream.release.set()
+        return await follower, leader.cancelled(), flight.stats()
+
+    result, leader_cancelled, stats = asyncio.run(run())
+    assert result == "page" and leader_cancelled and stats["abandoned"] == 0
+
+
+def test_last_waiter_leaving_cancels_the_call():
+    async def run():
+        flight, upstream = SingleFlight(), Upstream()
+        callers = [asyncio.create_task(flight.do("key", upstream)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.gather(*callers)
+        await asyncio.sleep(0)
+        # the key is free again: a new caller starts a fresh call
+        upstream.release.set()
+        return await flight.do("key", upstream), upstream, flight.stats()
+
+    result, upstream, stats = asyncio.run(run())
+    assert upstream.cancelled and upstream.calls == 2 and result == "page"
+    assert (stats["abandoned"], stats["leaders"], stats["in_flight"]) == (1, 2, 0)